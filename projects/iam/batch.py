@@ -0,0 +1,72 @@
+"""Batched ESLiM simulation: advances many parameter sets through a model at once"""
+
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+from projects.iam.eslim import IAM
+
+
+def create_batch(
+    system_type: str,
+    config_info: Union[str, dict],
+    pars_to_vary: List[dict],
+    parameter_matrix: np.ndarray,
+) -> IAM:
+    """creates a model (e.g., "nestedlogit" or "logit") holding one scenario per row of parameter_matrix;
+    its parameters, prices and shares carry a leading scenario axis, e.g. shares are
+    (n_samples, n_steps+1, n_sources)
+    Args:
+        system_type: name under which the model class is registered with IAM
+        config_info: baseline model configuration (path to yaml or dict)
+        pars_to_vary: list of dicts with 'key_path' into the model config; one per matrix column
+        parameter_matrix: (n_samples, n_params) array of parameter values
+    Returns:
+        batched model instance, ready to simulate
+    """
+    iam = IAM.create(system_type, config_info)
+    iam.apply_parameter_matrix(pars_to_vary, parameter_matrix)
+    return iam
+
+
+def simulate_batch(
+    config_info: Union[str, dict],
+    pars_to_vary: List[dict],
+    parameter_matrix: np.ndarray,
+    system_type: str = "nestedlogit",
+) -> np.ndarray:
+    """simulates one scenario per row of parameter_matrix
+    Args:
+        config_info: baseline model configuration (path to yaml or dict)
+        pars_to_vary: list of dicts with 'key_path' into the model config; one per matrix column
+        parameter_matrix: (n_samples, n_params) array of parameter values
+        system_type: name under which the model class is registered with IAM
+    Returns:
+        (n_samples, n_steps+1, n_sources) array of energy-source shares
+    """
+    return create_batch(
+        system_type, config_info, pars_to_vary, parameter_matrix
+    ).simulate(True)
+
+
+def batch_to_dataframe(
+    shares: np.ndarray, energy_sources: List[str], first_iteration: int = 0
+) -> pd.DataFrame:
+    """reshapes batched shares to the layout of stacked IAM.simulate(True) outputs
+    Args:
+        shares: (n_samples, n_steps+1, n_sources) array from simulate_batch
+        energy_sources: names of the energy sources, in model order
+        first_iteration: iteration number of the first scenario in the batch
+    Returns:
+        dataframe indexed by energy source with one column per timestep and an 'iteration' column
+    """
+    n_samples, n_timesteps, n_sources = shares.shape
+    df = pd.DataFrame(
+        np.moveaxis(shares, 1, 2).reshape(n_samples * n_sources, n_timesteps),
+        index=np.tile(energy_sources, n_samples),
+    )
+    df["iteration"] = np.repeat(
+        np.arange(first_iteration, first_iteration + n_samples), n_sources
+    )
+    return df
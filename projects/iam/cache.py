@@ -0,0 +1,119 @@
+"""Persistent on-disk cache of IAM simulation results, keyed by a hash of the full model configuration
+
+Entries are compressed .npz files of the model's state arrays, named by the sha256 hash of the canonical
+(sorted-key JSON) configuration, the model class, and the model version. Reading an entry refreshes its
+modification time, and the least recently used entries are evicted once the cache exceeds its size.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+
+def _to_json(value):
+    """json encoder for numpy values in configs built in code"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} in config cannot be hashed")
+
+
+def config_hash(config: dict, model_name: str, model_version: str) -> str:
+    """canonical hash of a model configuration
+    Args:
+        config: model configuration dictionary; its 'result_cache' entry is ignored
+        model_name: name of the model class (e.g., NestedLogitIAM)
+        model_version: version of the model code (see eslim.MODEL_VERSION)
+    Returns:
+        hex sha256 digest
+    """
+    canonical = json.dumps(
+        {
+            "config": {k: v for k, v in config.items() if k != "result_cache"},
+            "model_name": model_name,
+            "model_version": model_version,
+        },
+        sort_keys=True,
+        default=_to_json,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Directory of cached simulation results with a size budget"""
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        max_size_mb: float = 500,
+        max_entries: Optional[int] = None,
+    ):
+        """
+        Args:
+            directory: where cached results are stored (created if missing)
+            max_size_mb: total size above which least recently used entries are evicted
+            max_entries: optional number of entries above which least recently used entries are evicted
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_size_mb * 1e6
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.npz"
+
+    @staticmethod
+    def _touch(path: Path):
+        """marks an entry as most recently used; set explicitly in ns, as file-system clocks are coarse"""
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def load(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """cached arrays for key, or None if not cached"""
+        path = self._path(key)
+        try:
+            with np.load(path) as npz:
+                arrays = dict(npz)
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        self._touch(path)
+        self.hits += 1
+        return arrays
+
+    def store(self, key: str, arrays: Dict[str, np.ndarray]):
+        """writes arrays under key, then evicts least recently used entries beyond the size budget"""
+        path = self._path(key)
+        # write under a temporary name and rename so that readers never see a partial file
+        temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temporary_path, "wb") as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(temporary_path, path)
+        self._touch(path)
+        self.evict()
+
+    def evict(self):
+        """deletes least recently used entries until within max_size_mb and max_entries"""
+        entries = sorted(
+            (entry.stat().st_mtime_ns, entry.stat().st_size, entry)
+            for entry in self.directory.glob("*.npz")
+        )
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (
+            total_bytes > self.max_bytes
+            or (self.max_entries is not None and len(entries) > self.max_entries)
+        ):
+            _, size, entry = entries.pop(0)
+            entry.unlink(missing_ok=True)
+            total_bytes -= size
+
+    def clear(self):
+        """deletes every cached entry"""
+        for entry in self.directory.glob("*.npz"):
+            entry.unlink(missing_ok=True)
@@ -0,0 +1,257 @@
+"""This command-line script calibrates ESLiM parameters to an observed time series of energy-source shares
+
+To use:
+
+> python3 [path/to/this/file] --config [path/to/calibration_config.yml]
+
+Calibration minimizes the sum of squared differences between simulated and observed shares. Candidate
+starting points are drawn by Latin hypercube sampling and scored together in one batched simulation; the
+best few are each refined by bounded least squares, with exact (complex-step) Jacobians from
+derivatives.share_jacobian, in a pool of worker processes.
+"""
+
+import copy
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+import click
+import numpy as np
+import pandas as pd
+from scipy.optimize import least_squares
+
+from projects.iam.batch import simulate_batch
+from projects.iam.derivatives import share_jacobian
+from projects.iam.eslim import IAM
+from projects.iam.samplers import lhs
+from projects.iam.sensitivity import set_nested_value
+from utils.io import dict_to_yaml, yaml_to_dict
+
+logging.basicConfig(level=logging.INFO)
+
+
+def observation_indices(
+    config_info: Union[str, dict],
+    observed: pd.DataFrame,
+    system_type: str = "nestedlogit",
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """locates observed shares in the model's (n_steps+1, n_sources) share arrays
+    Args:
+        config_info: model configuration (path to yaml or dict)
+        observed: dataframe with columns year, energy_source, share; years must be model years
+        system_type: name under which the model class is registered with IAM
+    Returns:
+        steps: (n_obs,) timestep of each observation
+        sources: (n_obs,) energy-source column of each observation
+        values: (n_obs,) observed shares
+    """
+    iam = IAM.create(system_type, config_info)
+    unknown_years = set(observed["year"]) - set(iam.years)
+    if unknown_years:
+        raise ValueError(
+            f"observed years {sorted(unknown_years)} are not model years: {iam.years}"
+        )
+    steps = np.array([iam.years.index(y) for y in observed["year"]])
+    sources = np.array([iam.energy_sources.index(s) for s in observed["energy_source"]])
+    return steps, sources, observed["share"].to_numpy(dtype=float)
+
+
+def calibration_residuals(
+    config_info: Union[str, dict],
+    pars_to_vary: List[dict],
+    parameter_matrix: np.ndarray,
+    observations: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    system_type: str = "nestedlogit",
+) -> np.ndarray:
+    """simulated minus observed shares for every row of parameter_matrix, from one batched run
+    Args:
+        config_info: baseline model configuration (path to yaml or dict)
+        pars_to_vary: list of dicts with 'key_path' into the model config; one per matrix column
+        parameter_matrix: (n_samples, n_params) array of parameter values
+        observations: steps, sources and values from observation_indices
+        system_type: name under which the model class is registered with IAM
+    Returns:
+        (n_samples, n_obs) array of residuals
+    """
+    steps, sources, values = observations
+    shares = simulate_batch(config_info, pars_to_vary, parameter_matrix, system_type)
+    return shares[:, steps, sources] - values
+
+
+def calibration_loss(
+    config_info: Union[str, dict],
+    pars_to_vary: List[dict],
+    parameter_matrix: np.ndarray,
+    observations: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    system_type: str = "nestedlogit",
+) -> np.ndarray:
+    """sum of squared residuals for every row of parameter_matrix (see calibration_residuals)
+    Returns:
+        (n_samples,) array of losses
+    """
+    return np.sum(
+        calibration_residuals(
+            config_info, pars_to_vary, parameter_matrix, observations, system_type
+        )
+        ** 2,
+        axis=-1,
+    )
+
+
+def fit_from(
+    start: np.ndarray,
+    config_info: Union[str, dict],
+    pars_to_vary: List[dict],
+    observations: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    system_type: str = "nestedlogit",
+) -> dict:
+    """refines one starting point by bounded least squares
+    Args:
+        start: (n_params,) starting parameter values, within the bounds in pars_to_vary
+        config_info, pars_to_vary, observations, system_type: as in calibration_residuals
+    Returns:
+        dictionary with fitted 'values', their 'loss', and optimizer 'success'
+    """
+    steps, sources, values = observations
+    last = {}
+
+    def evaluate(x):
+        # residuals and their jacobian come from the same batched run; keep both for the next call
+        if "x" not in last or not np.array_equal(last["x"], x):
+            shares, jacobian = share_jacobian(config_info, pars_to_vary, x, system_type)
+            last["x"] = np.copy(x)
+            last["residuals"] = shares[steps, sources] - values
+            last["jacobian"] = jacobian[:, steps, sources].T
+        return last
+
+    fit = least_squares(
+        lambda x: evaluate(x)["residuals"],
+        start,
+        jac=lambda x: evaluate(x)["jacobian"],
+        bounds=(
+            [p["bounds"][0] for p in pars_to_vary],
+            [p["bounds"][1] for p in pars_to_vary],
+        ),
+    )
+    return {"values": fit.x, "loss": 2 * fit.cost, "success": fit.success}
+
+
+def calibrate(
+    config_info: Union[str, dict],
+    pars_to_vary: List[dict],
+    observed: pd.DataFrame,
+    *,
+    num_candidates: int = 1024,
+    num_restarts: int = 4,
+    num_workers: Optional[int] = None,
+    system_type: str = "nestedlogit",
+) -> dict:
+    """fits the parameters in pars_to_vary to observed shares
+    Args:
+        config_info: baseline model configuration (path to yaml or dict)
+        pars_to_vary: list of dicts with 'name', 'key_path' and 'bounds' (as in the sensitivity configs)
+        observed: dataframe with columns year, energy_source, share
+        num_candidates: number of Latin hypercube starting candidates scored in one batch
+        num_restarts: number of best candidates refined by least squares
+        num_workers: number of worker processes for the restarts (1 to run them in this process;
+            None to use one per cpu)
+        system_type: name under which the model class is registered with IAM
+    Returns:
+        dictionary with the best fitted 'parameters' ({name: value}), their 'loss', and a dataframe of
+        all 'restarts'
+    """
+    if isinstance(config_info, str):
+        config_info = yaml_to_dict(config_info)
+    observations = observation_indices(config_info, observed, system_type)
+
+    candidates = lhs(num_candidates, [p["bounds"] for p in pars_to_vary]).to_numpy()
+    losses = calibration_loss(
+        config_info, pars_to_vary, candidates, observations, system_type
+    )
+    starts = candidates[np.argsort(losses)[:num_restarts]]
+    logging.info(
+        " Refining the best %s of %s candidates (losses %s)",
+        len(starts),
+        num_candidates,
+        np.sort(losses)[:num_restarts],
+    )
+
+    args = (config_info, pars_to_vary, observations, system_type)
+    if num_workers == 1:
+        fits = [fit_from(start, *args) for start in starts]
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            fits = list(
+                executor.map(fit_from, starts, *[[a] * len(starts) for a in args])
+            )
+
+    names = [p["name"] for p in pars_to_vary]
+    restarts_df = pd.DataFrame([f["values"] for f in fits], columns=names)
+    restarts_df["loss"] = [f["loss"] for f in fits]
+    restarts_df["success"] = [f["success"] for f in fits]
+    best = fits[int(np.argmin(restarts_df["loss"]))]
+    return {
+        "parameters": dict(zip(names, best["values"].tolist())),
+        "loss": best["loss"],
+        "restarts": restarts_df,
+    }
+
+
+def calibrated_config(
+    config_info: Union[str, dict], pars_to_vary: List[dict], parameters: dict
+) -> dict:
+    """copy of a model configuration with calibrated values set at each parameter's key_path
+    Args:
+        config_info: baseline model configuration (path to yaml or dict)
+        pars_to_vary: list of dicts with 'name' and 'key_path'
+        parameters: {name: value}, e.g. calibrate(...)["parameters"]
+    Returns:
+        calibrated model configuration
+    """
+    if isinstance(config_info, str):
+        config_info = yaml_to_dict(config_info)
+    config = copy.deepcopy(config_info)
+    for p in pars_to_vary:
+        set_nested_value(config, p["key_path"], float(parameters[p["name"]]))
+    return config
+
+
+@click.command()
+@click.option(
+    "--config",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    required=True,
+)
+def calibration(config: str):
+    """Calibrates mini IAM parameters to observed energy-source shares"""
+
+    # get configuration for calibration
+    config_info = yaml_to_dict(config)
+    baseline_config = yaml_to_dict(config_info["baseline_model_config"])
+    observed = pd.read_csv(config_info["observed_shares"])
+
+    result = calibrate(
+        baseline_config,
+        config_info["pars_to_vary"],
+        observed,
+        num_candidates=config_info.get("num_candidates", 1024),
+        num_restarts=config_info.get("num_restarts", 4),
+        num_workers=config_info.get("num_workers"),
+        system_type=config_info.get("system_type", "nestedlogit"),
+    )
+    logging.info(
+        " Calibrated parameters %s (loss %s)", result["parameters"], result["loss"]
+    )
+
+    dict_to_yaml(
+        calibrated_config(
+            baseline_config, config_info["pars_to_vary"], result["parameters"]
+        ),
+        config_info["calibrated_model_config"],
+    )
+    if "restarts_csv" in config_info:
+        result["restarts"].to_csv(config_info["restarts_csv"], index=False)
+
+
+if __name__ == "__main__":
+    calibration()
@@ -0,0 +1,155 @@
+"""On-disk state of a sensitivity run (see sensitivity.py), which is what lets it be resumed or split into shards
+
+The results of each finished chunk of instances are written as their own parquet file (a partition, named by
+the chunk's first instance), so that a chunk's results exist only once it is complete; the parameter
+samples, chunk size, and result settings of the run are checkpointed before any instance runs.
+"""
+
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.io import dict_to_yaml, yaml_to_dict
+
+
+def partition_path(dataset_dir: Path, first_instance: int) -> Path:
+    """file holding the results of the chunk that starts at first_instance"""
+    return Path(dataset_dir) / f"part-{first_instance:012d}.parquet"
+
+
+def write_partition(
+    df: pd.DataFrame,
+    dataset_dir: Path,
+    first_instance: int,
+    row_group_size: Optional[int] = None,
+):
+    """writes one chunk of results to its own parquet file in a dataset directory
+    Args:
+        df: results from run_instances, with energy source (if any) as a column
+        dataset_dir: directory holding one file per chunk, named by the chunk's first instance so that
+            sorted file names follow sample order
+        first_instance: number (iteration) of the chunk's first instance
+        row_group_size: maximum rows per parquet row group
+    Returns:
+        None
+    """
+    # parquet column names are strings: timestep columns become "0", "1", ...
+    df.columns = [str(c) for c in df.columns]
+    path = partition_path(dataset_dir, first_instance)
+    # write under a temporary name and rename, so that a file exists only for a finished chunk
+    temporary_path = path.with_suffix(".tmp")
+    pq.write_table(
+        pa.Table.from_pandas(df, preserve_index=False),
+        temporary_path,
+        row_group_size=row_group_size,
+    )
+    os.replace(temporary_path, path)
+
+
+def read_partitions(
+    dataset_dir: Path, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """reads the chunks in a dataset directory back in sample order
+    Args:
+        dataset_dir: directory written by write_partition
+        columns: optional subset of columns to read
+    Returns:
+        dataframe of results
+    """
+    return pd.concat(
+        [
+            pq.read_table(path, columns=columns).to_pandas()
+            for path in sorted(Path(dataset_dir).glob("part-*.parquet"))
+        ],
+        ignore_index=True,
+    )
+
+
+def checkpoint_options(config_info: dict) -> dict:
+    """settings of a run that its saved results depend on, and so must not change when it is resumed (or
+    its shards are run and merged)"""
+    return {
+        "reducers": config_info.get("reducers"),
+        "output_format": config_info.get("output_format", "csv").lower(),
+    }
+
+
+def save_checkpoint(
+    checkpoint_dir: Path,
+    parameter_samples_df: pd.DataFrame,
+    chunk_size: int,
+    run_options: dict,
+):
+    """saves the sampled parameter matrix (exactly, as .npy), the chunking, and the result settings (see
+    checkpoint_options) of a run, so that an interrupted run can be resumed with the same samples
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    np.save(
+        checkpoint_dir / Path("parameter_samples.npy"), parameter_samples_df.to_numpy()
+    )
+    dict_to_yaml(
+        {
+            "parameter_names": list(parameter_samples_df.columns),
+            "num_instances": len(parameter_samples_df),
+            "chunk_size": chunk_size,
+            **run_options,
+        },
+        checkpoint_dir / Path("checkpoint.yml"),
+    )
+
+
+def load_checkpoint(
+    checkpoint_dir: Path, parameter_names: List[str], run_options: dict
+) -> Tuple[pd.DataFrame, int]:
+    """reads the parameter samples and chunk size saved by save_checkpoint
+    Args:
+        checkpoint_dir: directory written by save_checkpoint
+        parameter_names: names of the parameters in pars_to_vary, which must match the checkpoint's
+        run_options: settings (e.g., from checkpoint_options, and chunk_size if given), each of which must
+            match the checkpoint's
+    Returns:
+        parameter_samples_df: the run's parameter samples
+        chunk_size: the run's number of instances per chunk
+    """
+    if not (checkpoint_dir / Path("checkpoint.yml")).exists():
+        raise FileNotFoundError(f"No checkpoint to resume in {checkpoint_dir}")
+    checkpoint_info = yaml_to_dict(checkpoint_dir / Path("checkpoint.yml"))
+    if checkpoint_info["parameter_names"] != parameter_names:
+        raise ValueError(
+            f"Checkpoint in {checkpoint_dir} varies {checkpoint_info['parameter_names']}, "
+            f"not {parameter_names}"
+        )
+    for name, value in run_options.items():
+        # results saved under other settings cannot be mixed with new ones
+        if checkpoint_info.get(name) != value:
+            raise ValueError(
+                f"Checkpoint in {checkpoint_dir} was run with {name} {checkpoint_info.get(name)}, "
+                f"not {value}"
+            )
+    parameter_samples_df = pd.DataFrame(
+        np.load(checkpoint_dir / Path("parameter_samples.npy")),
+        columns=parameter_names,
+    )
+    return parameter_samples_df, checkpoint_info["chunk_size"]
+
+
+def read_metric(
+    dataset_dir: Path, metric_column: str, source: Optional[str] = None
+) -> np.ndarray:
+    """values of the analyzed metric for every instance saved in dataset_dir, in sample order
+    Args:
+        dataset_dir: directory written by write_partition
+        metric_column: column holding the metric
+        source: for share trajectories, the energy source whose rows hold the metric
+    Returns:
+        (n_instances,) array of metric values
+    """
+    if source is None:
+        return read_partitions(dataset_dir, [metric_column])[metric_column].to_numpy()
+    df = read_partitions(dataset_dir, ["energy_source", metric_column])
+    return df.loc[df["energy_source"] == source, metric_column].to_numpy()
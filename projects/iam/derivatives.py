@@ -0,0 +1,84 @@
+"""Forward-mode sensitivities (Jacobians) of ESLiM energy-source shares with respect to varied parameters
+
+Derivatives are carried alongside the state by complex-step differentiation: each varied parameter gets
+its own scenario in a batched run in which that parameter is perturbed by a tiny imaginary step. Every
+model operation is analytic in the varied parameters, so the imaginary part of each state array is then
+d(state)/d(parameter) to machine precision, without the step-size tuning and subtractive cancellation of
+finite differences. One batched run of n_params scenarios gives the full local gradient.
+n.b.: see Martins, Sturdza & Alonso (2003), https://doi.org/10.1145/838250.838251
+"""
+
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from projects.iam.batch import create_batch
+from projects.iam.eslim import IAM
+
+COMPLEX_STEP = 1e-100
+
+
+def share_jacobian(
+    config_info: Union[str, dict],
+    pars_to_vary: List[dict],
+    parameter_values: Optional[np.ndarray] = None,
+    system_type: str = "nestedlogit",
+    complex_step: float = COMPLEX_STEP,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """computes shares and their derivatives with respect to every parameter in pars_to_vary
+    Args:
+        config_info: baseline model configuration (path to yaml or dict)
+        pars_to_vary: list of dicts with 'key_path' into the model config (as in the sensitivity configs)
+        parameter_values: (n_params,) point at which to differentiate, or (n_points, n_params) for several
+            points at once; defaults to the values in the configuration
+        system_type: name under which the model class is registered with IAM
+        complex_step: size of the imaginary perturbation
+    Returns:
+        shares: (n_steps+1, n_sources) shares, or (n_points, n_steps+1, n_sources)
+        jacobian: (n_params, n_steps+1, n_sources) d(share)/d(parameter), or
+            (n_points, n_params, n_steps+1, n_sources)
+    """
+    if parameter_values is None:
+        parameter_values = IAM.create(system_type, config_info).varied_values(
+            pars_to_vary
+        )
+    points = np.atleast_2d(np.asarray(parameter_values, dtype=float))
+    n_points, n_params = points.shape
+
+    # one scenario per (point, parameter), perturbing that parameter along the imaginary axis
+    perturbed = points[:, np.newaxis, :] + 1j * complex_step * np.eye(n_params)
+    shares = create_batch(
+        system_type,
+        config_info,
+        pars_to_vary,
+        perturbed.reshape(n_points * n_params, n_params),
+    ).simulate(True)
+    shares = shares.reshape((n_points, n_params) + shares.shape[1:])
+
+    values, jacobian = shares[:, 0].real, shares.imag / complex_step
+    if np.ndim(parameter_values) == 1:
+        return values[0], jacobian[0]
+    return values, jacobian
+
+
+def jacobian_to_dataframe(
+    jacobian: np.ndarray,
+    pars_to_vary: List[dict],
+    energy_sources: List[str],
+    years: List[int],
+) -> pd.DataFrame:
+    """reshapes a single-point (n_params, n_steps+1, n_sources) jacobian to a long-format dataframe
+    Args:
+        jacobian: derivatives from share_jacobian
+        pars_to_vary: list of dicts with the 'name' of each parameter, in jacobian order
+        energy_sources: names of the energy sources, in model order
+        years: year of each timestep (e.g., IAM.years)
+    Returns:
+        dataframe with columns parameter, year, energy_source, derivative
+    """
+    index = pd.MultiIndex.from_product(
+        [[p["name"] for p in pars_to_vary], years, energy_sources],
+        names=["parameter", "year", "energy_source"],
+    )
+    return pd.DataFrame({"derivative": jacobian.ravel()}, index=index).reset_index()
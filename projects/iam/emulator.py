@@ -0,0 +1,245 @@
+"""Gaussian-process emulator of ESLiM share trajectories, for answering parameter queries without running
+the model
+
+To use:
+
+> python3 [path/to/this/file] --config [path/to/emulator_config.yml]
+
+which trains an emulator on model runs drawn with the LHS or Saltelli samplers in samplers.py, reports
+its accuracy on held-out runs, and saves it to disk. Then, e.g.,
+
+> emulator = ShareEmulator.load(path)
+> mean, std = emulator.predict_share(parameter_matrix, "fossil_fuels_with_CCS", 2050)
+"""
+
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import List, Tuple, Union
+
+import click
+import numpy as np
+import pandas as pd
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.gaussian_process.kernels import RBF, ConstantKernel, WhiteKernel
+
+from projects.iam.batch import simulate_batch
+from projects.iam.eslim import IAM
+from projects.iam.samplers import lhs, saltelli_sample
+from utils.io import yaml_to_dict
+
+logging.basicConfig(level=logging.INFO)
+
+
+class ShareEmulator:
+    """Gaussian-process surrogate for the (n_steps+1, n_sources) shares simulated by an ESLiM model as a
+    function of the parameters in pars_to_vary; all share outputs share one anisotropic RBF kernel
+    """
+
+    def __init__(
+        self,
+        pars_to_vary: List[dict],
+        energy_sources: List[str],
+        years: List[int],
+        n_restarts_optimizer: int = 2,
+    ):
+        """
+        Args:
+            pars_to_vary: list of dicts with 'name', 'key_path' and 'bounds' (as in the sensitivity configs)
+            energy_sources: names of the energy sources, in model order
+            years: year of each timestep (e.g., IAM.years)
+            n_restarts_optimizer: restarts of the kernel hyperparameter optimization
+        """
+        self.pars_to_vary = pars_to_vary
+        self.energy_sources = energy_sources
+        self.years = years
+        self.lower = np.array([p["bounds"][0] for p in pars_to_vary], dtype=float)
+        self.upper = np.array([p["bounds"][1] for p in pars_to_vary], dtype=float)
+        kernel = ConstantKernel(1.0) * RBF(
+            length_scale=np.ones(len(pars_to_vary)), length_scale_bounds=(1e-2, 1e2)
+        ) + WhiteKernel(noise_level=1e-6, noise_level_bounds=(1e-12, 1e-2))
+        self.gp = GaussianProcessRegressor(
+            kernel=kernel,
+            normalize_y=True,
+            n_restarts_optimizer=n_restarts_optimizer,
+            random_state=0,
+        )
+
+    def _unit(self, parameter_matrix: np.ndarray) -> np.ndarray:
+        """scales parameter values to [0, 1] by their bounds"""
+        return (np.atleast_2d(parameter_matrix) - self.lower) / (
+            self.upper - self.lower
+        )
+
+    def fit(self, parameter_matrix: np.ndarray, shares: np.ndarray):
+        """fits the emulator to simulated shares
+        Args:
+            parameter_matrix: (n_runs, n_params) parameter values of the training runs
+            shares: (n_runs, n_steps+1, n_sources) shares simulated for each run
+        Returns:
+            self
+        """
+        self.gp.fit(self._unit(parameter_matrix), shares.reshape(len(shares), -1))
+        logging.info(" Fitted emulator kernel: %s", self.gp.kernel_)
+        return self
+
+    def predict(self, parameter_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """emulated shares and their standard deviations
+        Args:
+            parameter_matrix: (n_queries, n_params) parameter values
+        Returns:
+            mean: (n_queries, n_steps+1, n_sources) emulated shares
+            std: (n_queries, n_steps+1, n_sources) standard deviation of the emulated shares
+        """
+        mean, std = self.gp.predict(self._unit(parameter_matrix), return_std=True)
+        shape = (len(mean), len(self.years), len(self.energy_sources))
+        return mean.reshape(shape), std.reshape(shape)
+
+    def predict_share(
+        self, parameter_matrix: np.ndarray, source: str, year: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """emulated share of one energy source in one year (see predict)
+        Returns:
+            mean: (n_queries,) emulated shares
+            std: (n_queries,) standard deviation of the emulated shares
+        """
+        mean, std = self.predict(parameter_matrix)
+        index = (slice(None), self.years.index(year), self.energy_sources.index(source))
+        return mean[index], std[index]
+
+    def save(self, path: Union[str, Path]):
+        """pickles the fitted emulator to path"""
+        with open(path, "wb") as file:
+            pickle.dump(self, file)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "ShareEmulator":
+        """reads an emulator pickled by save"""
+        with open(path, "rb") as file:
+            fitted_emulator = pickle.load(file)
+        if not isinstance(fitted_emulator, cls):
+            raise TypeError(f"{path} does not contain a {cls.__name__}")
+        return fitted_emulator
+
+
+def training_runs(
+    config_info: Union[str, dict],
+    pars_to_vary: List[dict],
+    num_samples: int,
+    sampler: str = "lhs",
+    system_type: str = "nestedlogit",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """draws parameter samples with the sensitivity-analysis samplers and simulates them in one batch
+    Args:
+        config_info: baseline model configuration (path to yaml or dict)
+        pars_to_vary: list of dicts with 'name', 'key_path' and 'bounds'
+        num_samples: number of LHS samples, or the Saltelli base sample size N
+        sampler: 'lhs' or 'saltelli'
+        system_type: name under which the model class is registered with IAM
+    Returns:
+        parameter_matrix: (n_runs, n_params) sampled parameter values
+        shares: (n_runs, n_steps+1, n_sources) simulated shares
+    """
+    if sampler.lower() == "saltelli":
+        problem_definition = {
+            "num_vars": len(pars_to_vary),
+            "names": [p["name"] for p in pars_to_vary],
+            "bounds": [p["bounds"] for p in pars_to_vary],
+        }
+        parameter_matrix = saltelli_sample(
+            num_samples, problem_definition, False
+        ).to_numpy()
+    else:
+        parameter_matrix = lhs(
+            num_samples, [p["bounds"] for p in pars_to_vary]
+        ).to_numpy()
+    return parameter_matrix, simulate_batch(
+        config_info, pars_to_vary, parameter_matrix, system_type
+    )
+
+
+def validation_report(
+    fitted_emulator: ShareEmulator, parameter_matrix: np.ndarray, shares: np.ndarray
+) -> pd.DataFrame:
+    """compares emulated with simulated shares for held-out runs
+    Args:
+        fitted_emulator: emulator to validate
+        parameter_matrix: (n_runs, n_params) parameter values of the held-out runs
+        shares: (n_runs, n_steps+1, n_sources) shares simulated for each held-out run
+    Returns:
+        dataframe with one row per year & energy source: rmse and max_abs_error of the emulated shares,
+        r2, and coverage95 (fraction of held-out shares within 1.96 standard deviations of the emulation)
+    """
+    mean, std = fitted_emulator.predict(parameter_matrix)
+    error = mean - shares
+    variance = np.var(shares, axis=0)
+    r2 = 1 - np.mean(error**2, axis=0) / np.where(variance > 0, variance, np.nan)
+    index = pd.MultiIndex.from_product(
+        [fitted_emulator.years, fitted_emulator.energy_sources],
+        names=["year", "energy_source"],
+    )
+    return pd.DataFrame(
+        {
+            "rmse": np.sqrt(np.mean(error**2, axis=0)).ravel(),
+            "max_abs_error": np.max(np.abs(error), axis=0).ravel(),
+            "r2": r2.ravel(),
+            "coverage95": np.mean(np.abs(error) <= 1.96 * std, axis=0).ravel(),
+        },
+        index=index,
+    ).reset_index()
+
+
+@click.command()
+@click.option(
+    "--config",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    required=True,
+)
+def emulator(config: str):
+    """Trains, validates, and saves an emulator of the mini IAM"""
+
+    # get configuration for the emulator
+    config_info = yaml_to_dict(config)
+    output_dir = Path(".")
+    if "output_dir" in config_info:
+        output_dir = Path(config_info["output_dir"])
+    os.makedirs(output_dir, exist_ok=True)
+
+    baseline_config = yaml_to_dict(config_info["baseline_model_config"])
+    system_type = config_info.get("system_type", "nestedlogit")
+    pars_to_vary = config_info["pars_to_vary"]
+
+    logging.info(" Simulating training and held-out runs")
+    train_parameters, train_shares = training_runs(
+        baseline_config,
+        pars_to_vary,
+        config_info["num_samples"],
+        config_info.get("sampler", "lhs"),
+        system_type,
+    )
+    test_parameters, test_shares = training_runs(
+        baseline_config,
+        pars_to_vary,
+        config_info["num_validation_samples"],
+        "lhs",
+        system_type,
+    )
+
+    iam = IAM.create(system_type, baseline_config)
+    share_emulator = ShareEmulator(pars_to_vary, iam.energy_sources, iam.years).fit(
+        train_parameters, train_shares
+    )
+    report = validation_report(share_emulator, test_parameters, test_shares)
+    logging.info(
+        " Held-out rmse: max %s; 95%% interval coverage: min %s",
+        report["rmse"].max(),
+        report["coverage95"].min(),
+    )
+
+    report.to_csv(output_dir / Path("emulator_validation.csv"), index=False)
+    share_emulator.save(output_dir / Path("emulator.pkl"))
+
+
+if __name__ == "__main__":
+    emulator()
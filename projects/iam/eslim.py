@@ -1,18 +1,23 @@
 """Energy system model class (abstract base class + variations) to simulate energy-source shares"""
 
-# pylint: disable=too-many-positional-arguments,too-many-instance-attributes
+# pylint: disable=too-many-positional-arguments,too-many-instance-attributes,too-many-public-methods
+import hashlib
 import logging
 from abc import ABC, abstractmethod
-from pathlib import PosixPath
-from typing import Union
+from pathlib import Path, PosixPath
+from typing import List, Optional, Union
 
 import numpy as np
 import pandas as pd
 
+from projects.iam.cache import ResultCache, config_hash
 from utils.io import yaml_to_dict
 
 logging.basicConfig(level=logging.INFO)
 
+# version of the model code, part of the key of cached results: any edit to this file invalidates them
+MODEL_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
+
 
 class IAM(ABC):
     """Parent class for miniature representation of energy system"""
@@ -54,18 +59,38 @@ class IAM(ABC):
         self.energy_demand_growth_rate_per_timestep = config[
             "energy_demand_growth_rate_per_timestep"
         ]
+        # retire capacity by build cohort (see _compute_vintage_retirement) rather than as a fixed
+        # fraction of current share
+        self.vintage_tracking = config.get("vintage_tracking", False)
+        # lifespan of each source in steps, and capacity built at each step, held in a ring buffer (see
+        # _allocate_vintages); None without vintage tracking
+        self._lifespan_steps = None
+        self._vintages = None
+        # lower generation prices with deployment (summed across regions) rather than with time
+        # (see _compute_learning_by_deployment)
+        self.shared_learning = config.get("shared_learning", False)
+
+        # optional persistent cache of simulated shares, e.g. {directory: ..., max_size_mb: 500}
+        self.result_cache = None
+        if "result_cache" in config:
+            self.result_cache = ResultCache(**config["result_cache"])
+            self._cache_key = config_hash(config, type(self).__name__, MODEL_VERSION)
+            self._config_cache_key = self._cache_key
 
         # get price data
+        self.price_curve = None
         if "usd_per_tco2" in config:
             self.usd_per_tco2 = config["usd_per_tco2"]
         elif "price_curve" in config:
+            # copy so that varying curve parameters never touches the config dict
+            self.price_curve = dict(config["price_curve"])
             # assigns value to self.usd_per_tco2
-            self._compute_carbon_price_curve(config["price_curve"])
+            self._compute_carbon_price_curve(self.price_curve)
         else:
             logging.info(
                 "No CO2 price information provided in config. Assuming price is $0/tCO2"
             )
-            self.usd_per_tco2 = [0] * self.n_steps
+            self.usd_per_tco2 = [0] * (self.n_steps + 1)
 
         self.years = [
             int(self.start_yr + s * self.timestep_yr) for s in range(self.n_steps + 1)
@@ -75,198 +100,643 @@ class IAM(ABC):
             config["parameters"]
         )  # format is multilayered dict with [non-time-varying parameter names][energy source name]
 
-        self.step_count = 0
-        self.shares = {0: self.df["starting_share"].to_dict()}
+        # numeric parameters as one (n_parameters, n_sources) array, rows ordered as in self.df
+        numeric_df = self.df.reindex(self.energy_sources).select_dtypes("number")
+        self.parameter_names = list(numeric_df.columns)
+        self.parameter_values = numeric_df.T.to_numpy(dtype=float, copy=True)
+
+        # optional regions, each with its own starting shares (or other parameters), demand growth and
+        # carbon price, advanced together along a leading (n_regions,) axis
+        self.regions = None
+        if "regions" in config:
+            self._apply_regions(config["regions"])
 
-        self.retirement_share = {}
-        self.frac_for_allocation = {}
-        self.share_of_new = {}
+        self._allocate_state()
 
         # self.adjust_co2_emission_rates()
-        self.compute_price_of_energy_generation()
-        self.compute_base_price_of_cdr()
-        self.compute_price_of_net_carbon_emissions()
-        self.compute_adjusted_prices()
+        self._compute_prices()
+
+    @property
+    def _batch_shape(self) -> tuple:
+        """shape of the leading scenario axes; () for a single scenario, (n_samples,) for a batch"""
+        return self.parameter_values.shape[:-2]
+
+    def _allocate_state(self):
+        """preallocates state arrays: row = timestep, column = energy source (same order as energy_sources),
+        with any batch axes leading"""
+        shape = self._batch_shape + (self.n_steps + 1, len(self.energy_sources))
+        # complex when derivatives are carried by complex-step perturbations (see projects/iam/derivatives.py)
+        dtype = self.parameter_values.dtype
+        self.step_count = 0
+        self._shares = np.full(shape, np.nan, dtype=dtype)
+        self._shares[..., 0, :] = self.parameter("starting_share")
+        self._retirement_share = np.full(shape, np.nan, dtype=dtype)
+        self._share_of_new = np.full(shape, np.nan, dtype=dtype)
+        self._frac_for_allocation = np.full(shape[:-1], np.nan, dtype=dtype)
+        # greatest deployment of each source so far relative to its starting deployment
+        self._experience = np.ones(shape[:-2] + shape[-1:], dtype=dtype)
+        # prices, filled by _compute_prices (complex also if only the CO2 price is)
+        price_dtype = np.result_type(dtype, np.asarray(self.usd_per_tco2))
+        self._price_of_cdr = np.full(shape, np.nan, dtype=price_dtype)
+        self._price_of_energy_generation = np.full(shape, np.nan, dtype=price_dtype)
+        self._net_price_of_carbon_emissions = np.full(shape, np.nan, dtype=price_dtype)
+        self._usd_per_mwh = np.full(shape, np.nan, dtype=price_dtype)
+        if self.vintage_tracking:
+            self._allocate_vintages()
+
+    def _allocate_vintages(self):
+        """sizes the ring buffer of capacity built at each step, (..., max_lifespan_steps, n_sources), to the
+        current lifespans, and empties it; the cohort built at step t sits in row t % max_lifespan_steps until
+        it retires
+        """
+        self._lifespan_steps = np.maximum(
+            np.rint(np.real(self.parameter("lifespan_yr")) / self.timestep_yr).astype(
+                int
+            ),
+            1,
+        )
+        self._vintages = np.zeros(
+            self._batch_shape
+            + (int(self._lifespan_steps.max()), len(self.energy_sources)),
+            dtype=self.parameter_values.dtype,
+        )
+
+    def parameter(self, name: str) -> np.ndarray:
+        """returns the values of a numeric parameter (from config['parameters']) for each energy source"""
+        return self.parameter_values[..., self.parameter_names.index(name), :]
+
+    def compile_parameter_plan(self, pars_to_vary: List[dict]) -> dict:
+        """resolves each par's key_path once to where this model holds its value, so that samples are applied
+        (see set_parameter_values and apply_parameter_matrix) by writing to arrays rather than walking and
+        copying config dicts
+        Args:
+            pars_to_vary: list of dicts with a 'key_path' into the model config (as in the sensitivity configs)
+        Returns:
+            plan: 'key_paths'; for pars held in parameter_values, their sample 'columns' with the matching
+            parameter 'rows' and energy 'sources'; and (sample column, key_path) of the 'other' pars
+        """
+        if self._batch_shape:
+            raise ValueError("compile_parameter_plan requires a single-scenario model")
+        columns, rows, sources, other = [], [], [], []
+        for column, par in enumerate(pars_to_vary):
+            key_path = par["key_path"]
+            if key_path[0] == "parameters" and len(key_path) == 3:
+                columns.append(column)
+                rows.append(self.parameter_names.index(key_path[1]))
+                sources.append(self.energy_sources.index(key_path[2]))
+            else:
+                # raises ValueError for entries that the model does not hold in arrays
+                self._get_varied_value(key_path)
+                other.append((column, key_path))
+        return {
+            "key_paths": [list(par["key_path"]) for par in pars_to_vary],
+            "columns": np.array(columns, dtype=int),
+            "rows": np.array(rows, dtype=int),
+            "sources": np.array(sources, dtype=int),
+            "other": other,
+        }
+
+    def _write_parameter_plan(self, plan: dict, values: np.ndarray):
+        """writes (..., n_params) parameter values to the arrays compiled into plan"""
+        self.parameter_values[..., plan["rows"], plan["sources"]] = values[
+            ..., plan["columns"]
+        ]
+        for column, key_path in plan["other"]:
+            self._set_varied_value(key_path, values[..., column])
+
+    def set_parameter_values(self, plan: dict, values: np.ndarray):
+        """sets the varied entries of this single-scenario model to one sample and returns it to its starting
+        state, ready to simulate again
+        Args:
+            plan: from compile_parameter_plan
+            values: (n_params,) parameter values, one per par compiled into plan
+        Returns:
+            None
+        """
+        values = np.asarray(values, dtype=float)
+        if values.shape != (len(plan["key_paths"]),):
+            raise ValueError(
+                f"expected {len(plan['key_paths'])} parameter values but got shape {values.shape}"
+            )
+        if self._batch_shape:
+            raise ValueError("set_parameter_values requires a single-scenario model")
+
+        self._write_parameter_plan(plan, values)
+        if self.price_curve is not None:
+            self._compute_carbon_price_curve(self.price_curve)
+        self._allocate_state()
+        self._compute_prices()
+        if self.result_cache is not None:
+            self._cache_key = config_hash(
+                {
+                    "config": self._config_cache_key,
+                    "key_paths": plan["key_paths"],
+                    "values": values,
+                },
+                type(self).__name__,
+                MODEL_VERSION,
+            )
+
+    def apply_parameter_matrix(
+        self, pars_to_vary: List[dict], parameter_matrix: np.ndarray
+    ):
+        """turns this single-scenario instance into a batch of scenarios, one per row of parameter_matrix
+        Args:
+            pars_to_vary: list of dicts with a 'key_path' into the model config (as in the
+                sensitivity configs); one per column of parameter_matrix
+            parameter_matrix: (n_samples, n_params) array of parameter values (may be complex)
+        Returns:
+            None: parameter, price and state arrays gain a leading (n_samples,) axis
+        """
+        parameter_matrix = np.atleast_2d(np.asarray(parameter_matrix))
+        parameter_matrix = parameter_matrix.astype(
+            np.result_type(parameter_matrix, float)
+        )
+        if parameter_matrix.shape[1] != len(pars_to_vary):
+            raise ValueError(
+                f"""parameter_matrix has {parameter_matrix.shape[1]} columns but there are
+                {len(pars_to_vary)} pars_to_vary"""
+            )
+        if self._batch_shape:
+            raise ValueError("apply_parameter_matrix requires a single-scenario model")
+        plan = self.compile_parameter_plan(pars_to_vary)
+        self._broadcast_to_batch(parameter_matrix.shape[0], parameter_matrix.dtype)
+        self._write_parameter_plan(plan, parameter_matrix)
+
+        if self.price_curve is not None:
+            self._compute_carbon_price_curve(self.price_curve)
+        self._allocate_state()
+        self._compute_prices()
+
+    def apply_price_paths(self, usd_per_tco2_paths: np.ndarray):
+        """turns this single-scenario instance into a batch of scenarios, one per carbon-price path
+        Args:
+            usd_per_tco2_paths: (n_paths, n_steps+1) carbon price at each timestep of each path
+                (e.g., from projects/iam/stochastic.py)
+        Returns:
+            None: parameter, price and state arrays gain a leading (n_paths,) axis
+        """
+        paths = np.atleast_2d(np.asarray(usd_per_tco2_paths, dtype=float))
+        if paths.shape[1] != self.n_steps + 1:
+            raise ValueError(
+                f"price paths have {paths.shape[1]} timesteps but the model has {self.n_steps + 1}"
+            )
+        if self._batch_shape:
+            raise ValueError("apply_price_paths requires a single-scenario model")
+
+        self._broadcast_to_batch(paths.shape[0])
+        # prices no longer follow the configured curve
+        self.price_curve = None
+        self.usd_per_tco2 = paths
+        self._allocate_state()
+        self._compute_prices()
+
+    def _apply_regions(self, regions: dict):
+        """gives parameter, price and state arrays a leading (n_regions,) axis
+        Args:
+            regions: {region name: overrides}, where overrides may hold 'size' (starting generation
+                relative to the other regions; default 1), 'parameters' ({parameter: {energy source: value}}),
+                'energy_demand_growth_rate_per_timestep', and 'usd_per_tco2' or 'price_curve'
+        Returns:
+            None
+        """
+        self.regions = list(regions)
+        # the base class's broadcast only: subclass variables (e.g., logit exponents) are shared by all
+        # regions and broadcast against the region axis as they are
+        IAM._broadcast_to_batch(self, len(self.regions))
+        self.region_size = np.ones(len(self.regions))
+        for r, overrides in enumerate(regions.values()):
+            overrides = overrides or {}
+            self.region_size[r] = overrides.get("size", 1.0)
+            for name, values in overrides.get("parameters", {}).items():
+                for source, value in values.items():
+                    self.parameter_values[
+                        r,
+                        self.parameter_names.index(name),
+                        self.energy_sources.index(source),
+                    ] = value
+            if "energy_demand_growth_rate_per_timestep" in overrides:
+                self.energy_demand_growth_rate_per_timestep[r] = overrides[
+                    "energy_demand_growth_rate_per_timestep"
+                ]
+            if "usd_per_tco2" in overrides:
+                self.usd_per_tco2[r] = overrides["usd_per_tco2"]
+            elif "price_curve" in overrides:
+                self.usd_per_tco2[r] = self._carbon_price_curve(
+                    overrides["price_curve"]
+                )
+
+    def _broadcast_to_batch(self, n_samples: int, dtype=float):
+        """gives every variable that can be varied a leading (n_samples,) axis"""
+        self.parameter_values = np.repeat(
+            self.parameter_values[np.newaxis], n_samples, axis=0
+        ).astype(dtype)
+        self.usd_per_tco2 = np.repeat(
+            np.asarray(self.usd_per_tco2, dtype=dtype)[np.newaxis], n_samples, axis=0
+        )
+        self.energy_demand_growth_rate_per_timestep = np.full(
+            n_samples, self.energy_demand_growth_rate_per_timestep, dtype=dtype
+        )
+
+    def _set_varied_value(self, key_path: List[str], values: np.ndarray):
+        """writes one value per scenario to the array that holds the config entry at key_path"""
+        if key_path[0] == "parameters" and len(key_path) == 3:
+            self.parameter_values[
+                ...,
+                self.parameter_names.index(key_path[1]),
+                self.energy_sources.index(key_path[2]),
+            ] = values
+        elif key_path[0] == "price_curve" and len(key_path) == 2:
+            if self.price_curve is None:
+                raise ValueError(f"Cannot vary {key_path}: model has no price_curve")
+            self.price_curve[key_path[1]] = np.expand_dims(values, -1)
+        elif list(key_path) == ["energy_demand_growth_rate_per_timestep"]:
+            self.energy_demand_growth_rate_per_timestep = values.copy()
+        else:
+            raise ValueError(
+                f"Cannot vary {key_path} in a batch of {type(self).__name__} scenarios"
+            )
+
+    def varied_values(self, pars_to_vary: List[dict]) -> np.ndarray:
+        """current values of the config entries at each par's key_path, (..., n_params)"""
+        return np.stack(
+            [self._get_varied_value(par["key_path"]) for par in pars_to_vary], axis=-1
+        )
+
+    def _get_varied_value(self, key_path: List[str]) -> np.ndarray:
+        """reads the value(s) of the config entry at key_path from the array that holds it"""
+        if key_path[0] == "parameters" and len(key_path) == 3:
+            return self.parameter_values[
+                ...,
+                self.parameter_names.index(key_path[1]),
+                self.energy_sources.index(key_path[2]),
+            ]
+        if key_path[0] == "price_curve" and len(key_path) == 2:
+            if self.price_curve is None:
+                raise ValueError(f"Cannot read {key_path}: model has no price_curve")
+            # varied curve parameters are stored as (n_samples, 1) columns
+            value = np.asarray(self.price_curve[key_path[1]])
+            return np.broadcast_to(
+                value[..., 0] if value.ndim else value, self._batch_shape
+            )
+        if list(key_path) == ["energy_demand_growth_rate_per_timestep"]:
+            return np.asarray(self.energy_demand_growth_rate_per_timestep)
+        raise ValueError(f"Cannot read {key_path} from {type(self).__name__}")
+
+    def _to_timestep_dict(self, values: np.ndarray, n_rows: int) -> dict:
+        """converts the first n_rows rows of a (timestep, energy source) array to {timestep: {energy_source: value}}
+        n.b.: for a batch, each value is an array with one entry per scenario"""
+        return {
+            ts: dict(zip(self.energy_sources, np.moveaxis(values[..., ts, :], -1, 0)))
+            for ts in range(n_rows)
+        }
+
+    # dict views of the state arrays (built on access; used in notebooks)
+    @property
+    def shares(self) -> dict:
+        """energy-source shares of total generation, {timestep: {energy_source: share}}"""
+        return self._to_timestep_dict(self._shares, self.step_count + 1)
+
+    @property
+    def retirement_share(self) -> dict:
+        """share of total generation retired at each completed timestep"""
+        return self._to_timestep_dict(self._retirement_share, self.step_count)
+
+    @property
+    def share_of_new(self) -> dict:
+        """share of newly allocated generation assigned to each source at each completed timestep"""
+        return self._to_timestep_dict(self._share_of_new, self.step_count)
+
+    @property
+    def frac_for_allocation(self) -> dict:
+        """fraction of total generation up for allocation at each completed timestep"""
+        return dict(
+            enumerate(
+                np.moveaxis(self._frac_for_allocation[..., : self.step_count], -1, 0)
+            )
+        )
+
+    @property
+    def price_of_cdr_usd_per_mwh(self) -> dict:
+        """base price of carbon removal, {timestep: {energy_source: usd_per_mwh}}"""
+        return self._to_timestep_dict(self._price_of_cdr, self.n_steps + 1)
+
+    @property
+    def price_of_energy_generation_usd_per_mwh(self) -> dict:
+        """price of energy generation, {timestep: {energy_source: usd_per_mwh}}"""
+        return self._to_timestep_dict(
+            self._price_of_energy_generation, self.n_steps + 1
+        )
+
+    @property
+    def net_price_of_carbon_emissions_usd_per_mwh(self) -> dict:
+        """net price of carbon removal and emissions, {timestep: {energy_source: usd_per_mwh}}"""
+        return self._to_timestep_dict(
+            self._net_price_of_carbon_emissions, self.n_steps + 1
+        )
+
+    @property
+    def current_shares(self) -> np.ndarray:
+        """(..., n_sources) shares at the current step"""
+        return self._shares[..., self.step_count, :]
+
+    @property
+    def current_prices(self) -> np.ndarray:
+        """(..., n_sources) total price per MWh at the current step"""
+        return self._usd_per_mwh[..., self.step_count, :]
+
+    @property
+    def usd_per_mwh(self) -> dict:
+        """total price of each energy source, {timestep: {energy_source: usd_per_mwh}}"""
+        return self._to_timestep_dict(self._usd_per_mwh, self.n_steps + 1)
 
     def _sigmoid_curve(self, x, ub, lb, inflection, steepness):
         return ub + (lb - ub) / (1 + (x / inflection) ** steepness)
 
     def _compute_carbon_price_curve(self, price_curve):
-        """computes a price curve from input parameters"""
+        """computes a price curve from input parameters and assigns it to usd_per_tco2"""
+        self.usd_per_tco2 = self._carbon_price_curve(price_curve)
+
+    def _carbon_price_curve(self, price_curve) -> np.ndarray:
+        """CO2 price at each timestep from price-curve parameters
+        n.b.: curve parameters may be (n_samples, 1) arrays, giving one curve per row"""
 
         # get integer-valued timesteps
-        times = list(range(self.n_steps + 1))
+        times = np.arange(self.n_steps + 1)
 
         # compute prices
         if price_curve["type"] == "sigmmoid":
-            self.usd_per_tco2 = [
-                self._sigmoid_curve(
-                    t,
-                    price_curve["upper_bound"],
-                    price_curve["lower_bound"],
-                    price_curve["inflection"] * self.n_steps,
-                    price_curve["steepness"],
-                )
-                for t in times
-            ]
-        elif price_curve["type"] == "line":
-            self.usd_per_tco2 = [
-                price_curve["slope"] * t + price_curve["intercept"] for t in times
-            ]
-        elif price_curve["type"] == "minmax":
+            return self._sigmoid_curve(
+                times,
+                price_curve["upper_bound"],
+                price_curve["lower_bound"],
+                np.multiply(price_curve["inflection"], self.n_steps),
+                price_curve["steepness"],
+            )
+        if price_curve["type"] == "line":
+            return np.multiply(price_curve["slope"], times) + price_curve["intercept"]
+        if price_curve["type"] == "minmax":
             increment = (
-                price_curve["total_increase_in_price"] - price_curve["starting_price"]
-            ) / self.n_steps
-            self.usd_per_tco2 = [
-                price_curve["starting_price"] + increment * t
-                for t in range(self.n_steps + 1)
-            ]
+                np.subtract(
+                    price_curve["total_increase_in_price"],
+                    price_curve["starting_price"],
+                )
+                / self.n_steps
+            )
+            return price_curve["starting_price"] + increment * times
+        return None
 
-    def compute_base_price_of_cdr(self):
+    def _timesteps(self) -> np.ndarray:
+        """column vector of integer timesteps for broadcasting against (..., n_steps+1, n_sources) arrays"""
+        return np.arange(self.n_steps + 1)[:, np.newaxis]
+
+    def _parameter_by_timestep(self, name: str) -> np.ndarray:
+        """parameter values with a length-1 timestep axis, for broadcasting against the timestep axis"""
+        return self.parameter(name)[..., np.newaxis, :]
+
+    def _compute_prices(self):
+        """fills all (..., n_steps+1, n_sources) price arrays (see _allocate_state) from the parameters and
+        CO2 price"""
+        self._compute_price_of_energy_generation()
+        self._compute_base_price_of_cdr()
+        self._compute_price_of_net_carbon_emissions()
+        self._compute_adjusted_prices()
+
+    def _compute_base_price_of_cdr(self):
         """computes base price to implementcarbon removal for each timestep"""
-        self.price_of_cdr_usd_per_mwh = {
-            ts: dict(
-                zip(
-                    self.energy_sources,
-                    [
-                        self.df.loc[e, "starting_carbon_removal_price_fraction"]
-                        * self.df.loc[e, "starting_energy_generation_price_usd_per_mwh"]
-                        * (1 - self.df.loc[e, "frac_cdr_cost_decrease_per_timestep"])
-                        ** ts
-                        for e in self.energy_sources
-                    ],
-                )
+        self._price_of_cdr[...] = (
+            self._parameter_by_timestep("starting_carbon_removal_price_fraction")
+            * self._parameter_by_timestep(
+                "starting_energy_generation_price_usd_per_mwh"
             )
-            for ts in range(self.n_steps + 1)
-        }
+            * (1 - self._parameter_by_timestep("frac_cdr_cost_decrease_per_timestep"))
+            ** self._timesteps()
+        )
 
-    def compute_price_of_energy_generation(self):
+    def _compute_price_of_energy_generation(self):
         """adjusts prices for energy for each time step using the starting price and the learning curve"""
-        self.price_of_energy_generation_usd_per_mwh = {
-            ts: dict(
-                zip(
-                    self.energy_sources,
-                    [
-                        self.df.loc[e, "starting_energy_generation_price_usd_per_mwh"]
-                        * (
-                            1
-                            - self.df.loc[
-                                e, "frac_energy_generation_cost_decrease_per_timestep"
-                            ]
-                        )
-                        ** ts
-                        for e in self.energy_sources
-                    ],
+        # with shared learning, prices start flat and fall as the simulation deploys each source
+        learning_steps = self._timesteps() * (not self.shared_learning)
+        self._price_of_energy_generation[...] = (
+            self._parameter_by_timestep("starting_energy_generation_price_usd_per_mwh")
+            * (
+                1
+                - self._parameter_by_timestep(
+                    "frac_energy_generation_cost_decrease_per_timestep"
                 )
             )
-            for ts in range(self.n_steps + 1)
-        }
+            ** learning_steps
+        )
+
+    def _deployment(self, step: int) -> np.ndarray:
+        """generation by each energy source at step, relative to step-0 demand; for a multi-region model,
+        summed across regions weighted by region size, (n_sources,)"""
+        generation = self.demand_index(step) * self._shares[..., step, :]
+        if self.regions is None:
+            return generation
+        return np.tensordot(self.region_size, generation, axes=(0, 0))
+
+    def _compute_learning_by_deployment(self):
+        """lowers generation prices at the current step by frac_energy_generation_cost_decrease_per_timestep
+        for each doubling of deployment (see _deployment) beyond starting deployment; deployment that
+        later shrinks keeps its experience, and sources with no starting deployment do not learn
+        """
+        starting_deployment = self._deployment(0)
+        deployed = starting_deployment != 0
+        self._experience = np.maximum(
+            self._experience,
+            np.where(
+                deployed,
+                self._deployment(self.step_count)
+                / np.where(deployed, starting_deployment, 1),
+                1,
+            ),
+        )
+        self._price_of_energy_generation[..., self.step_count, :] = self.parameter(
+            "starting_energy_generation_price_usd_per_mwh"
+        ) * self._experience ** np.log2(
+            1 - self.parameter("frac_energy_generation_cost_decrease_per_timestep")
+        )
+        self._usd_per_mwh[..., self.step_count, :] = (
+            self._price_of_energy_generation[..., self.step_count, :]
+            + self._net_price_of_carbon_emissions[..., self.step_count, :]
+        )
 
-    def compute_price_of_net_carbon_emissions(self):
+    def global_shares(self) -> np.ndarray:
+        """shares of total generation summed across the regions of a multi-region model, (n_steps+1, n_sources)"""
+        if self.regions is None:
+            raise ValueError("global_shares requires a model with regions")
+        generation = np.stack(
+            [self._deployment(step) for step in range(self.n_steps + 1)]
+        )
+        return generation / np.sum(generation, axis=-1, keepdims=True)
+
+    def _compute_price_of_net_carbon_emissions(self):
         """Computes the contribution to energy-source price from CDR CO2 removals and missed CO2 emissions"""
-        self.net_price_of_carbon_emissions_usd_per_mwh = {
-            ts: dict(
-                zip(
-                    self.energy_sources,
-                    [
-                        self.price_of_cdr_usd_per_mwh[ts][e]
-                        + self.usd_per_tco2[ts]
-                        * self.df.loc[e, "co2_per_mwh"]
-                        * (1 - self.df.loc[e, "capture_fraction"])
-                        for e in self.energy_sources
-                    ],
-                )
-            )
-            for ts in range(self.n_steps + 1)
-        }
+        self._net_price_of_carbon_emissions[...] = self._price_of_cdr + np.asarray(
+            self.usd_per_tco2
+        )[..., np.newaxis] * self._parameter_by_timestep("co2_per_mwh") * (
+            1 - self._parameter_by_timestep("capture_fraction")
+        )
 
-    def compute_adjusted_prices(self):
+    def _compute_adjusted_prices(self):
         """Finds total price per MWh for each energy source,
         summing cost of electricity generation and net cost of carbon emissions"""
+        self._usd_per_mwh[...] = (
+            self._price_of_energy_generation + self._net_price_of_carbon_emissions
+        )
 
-        self.usd_per_mwh = {
-            ts: dict(
-                zip(
-                    self.energy_sources,
-                    [
-                        self.price_of_energy_generation_usd_per_mwh[ts][e]
-                        + self.net_price_of_carbon_emissions_usd_per_mwh[ts][e]
-                        for e in self.energy_sources
-                    ],
-                )
-            )
-            for ts in range(self.n_steps + 1)
-        }
+    def demand_index(self, step: int) -> np.ndarray:
+        """total energy demand at step relative to step 0, with a length-1 energy-source axis"""
+        return np.expand_dims(
+            np.power(1 + np.asarray(self.energy_demand_growth_rate_per_timestep), step),
+            -1,
+        )
 
-    def compute_retirement_fraction(self):
+    def _compute_vintage_retirement(self):
+        """retire, as a share of current total generation, the capacity that reaches the end of its life:
+        the cohort built lifespan steps ago, plus an equal 1/lifespan slice of the starting stock in each
+        of the lifespan steps that follow retire_timestep"""
+        steps_since_start = self.step_count - np.real(self.parameter("retire_timestep"))
+        starting_stock_retired = (
+            self.parameter("starting_share")
+            / self._lifespan_steps
+            * ((steps_since_start >= 0) & (steps_since_start < self._lifespan_steps))
+        )
+        # one row per energy source; zeros until a cohort has been written there
+        slot = (self.step_count - self._lifespan_steps) % self._vintages.shape[-2]
+        cohort_retired = np.take_along_axis(
+            self._vintages, np.expand_dims(slot, -2), axis=-2
+        )[..., 0, :]
+
+        self._retirement_share[..., self.step_count, :] = (
+            starting_stock_retired + cohort_retired
+        ) / self.demand_index(self.step_count)
+
+    def _compute_retirement_fraction(self):
         """compute the fraction of total energy generation that is retired at end of project life"""
-        # temporary variables for ease of reading code below
-        current_shares = [self.shares[self.step_count][e] for e in self.energy_sources]
-        lifespans = [self.df.loc[e, "lifespan_yr"] for e in self.energy_sources]
-        retire_yet = [
-            1 if self.step_count >= self.df.loc[e, "retire_timestep"] else 0
-            for e in self.energy_sources
-        ]
-        self.retirement_share[self.step_count] = dict(
-            zip(
-                self.energy_sources,
-                [
-                    r * s * y
-                    for r, s, y in zip(
-                        [self.timestep_yr / l for l in lifespans],
-                        current_shares,
-                        retire_yet,
-                    )
-                ],
-            )
+        if self.vintage_tracking:
+            self._compute_vintage_retirement()
+            return
+        retire_yet = self.step_count >= np.real(self.parameter("retire_timestep"))
+        self._retirement_share[..., self.step_count, :] = (
+            self.timestep_yr
+            / self.parameter("lifespan_yr")
+            * self._shares[..., self.step_count, :]
+            * retire_yet
         )
 
-    def update_shares(self):
+    def _update_shares(self):
         """update the shares of energy according to most recent calculations"""
-        # temporary variables for ease of reading code below
-
-        current_shares = [self.shares[self.step_count][e] for e in self.energy_sources]
-        share_of_new = [
-            self.share_of_new[self.step_count][e] for e in self.energy_sources
-        ]
-        retirement_share = [
-            self.retirement_share[self.step_count][e] for e in self.energy_sources
-        ]
-        remaining_shares = [
-            (c - r) / (1 + self.energy_demand_growth_rate_per_timestep)
-            for c, r in zip(current_shares, retirement_share)
-        ]
-        self.frac_for_allocation[self.step_count] = 1.0 - np.sum(remaining_shares)
+        remaining_shares = (
+            self._shares[..., self.step_count, :]
+            - self._retirement_share[..., self.step_count, :]
+        ) / (1 + np.expand_dims(self.energy_demand_growth_rate_per_timestep, -1))
+        self._frac_for_allocation[..., self.step_count] = 1.0 - np.sum(
+            remaining_shares, axis=-1
+        )
 
         # update share fractions based on fraction of facilities retiring, new share allocaiton, current shares
-        alpha_share_new = [
-            r + self.frac_for_allocation[self.step_count] * s
-            for r, s in zip(remaining_shares, share_of_new)
-        ]
+        alpha_share_new = (
+            remaining_shares
+            + self._frac_for_allocation[..., self.step_count, np.newaxis]
+            * self._share_of_new[..., self.step_count, :]
+        )
+        if self.vintage_tracking:
+            # record newly built capacity (relative to step-0 demand) in this step's cohort row
+            self._vintages[..., self.step_count % self._vintages.shape[-2], :] = (
+                self._frac_for_allocation[..., self.step_count, np.newaxis]
+                * self._share_of_new[..., self.step_count, :]
+                * self.demand_index(self.step_count + 1)
+            )
         # update the timestep
         self.step_count += 1
-        self.shares[self.step_count] = dict(zip(self.energy_sources, alpha_share_new))
+        self._shares[..., self.step_count, :] = alpha_share_new
+
+    def simulate(self, return_data=False, reducers: Optional[list] = None):
+        """simulate the shares of technology using parameters given
+        Args:
+            return_data: if True, return shares (see Returns)
+            reducers: optional list of metric reducers (see projects/iam/reducers.py), each updated as
+                the simulation advances
+        Returns:
+            if reducers are given, {reducer name: value} (one value per scenario for a batch);
+            otherwise, if return_data is True, a DataFrame of shares [energy source x timestep] for a
+            single scenario, or the (n_samples, n_steps+1, n_sources) share array for a batch
+        """
+        reducers = reducers or []
+        for reducer in reducers:
+            reducer.start(self)
+
+        # a single scenario (of one or more regions) from its starting state can be read from (and
+        # written to) the result cache
+        use_cache = (
+            self.result_cache is not None
+            and not reducers
+            and (self.regions is not None or not self._batch_shape)
+            and self.step_count == 0
+        )
+        if not (use_cache and self._load_cached_state()):
+            for _ in range(self.n_steps):
+                self._compute_new_shares()
 
-    def simulate(self, return_data=False):
-        """simulate the shares of technology using parameters given"""
+                self._compute_retirement_fraction()
 
-        for _ in range(self.n_steps):
-            self.compute_new_shares()
+                self._update_shares()
 
-            self.compute_retirement_fraction()
+                if self.shared_learning:
+                    self._compute_learning_by_deployment()
 
-            self.update_shares()
+                for reducer in reducers:
+                    reducer.update(self)
+
+            if use_cache:
+                self.result_cache.store(
+                    self._cache_key,
+                    {name: getattr(self, name) for name in self._cached_state_names()},
+                )
 
+        if reducers:
+            return {reducer.name: reducer.result() for reducer in reducers}
         if return_data is True:
-            return pd.DataFrame(self.shares)
+            if self._batch_shape:
+                return self._shares
+            return pd.DataFrame(
+                self._shares[: self.step_count + 1].T, index=self.energy_sources
+            )
         return None
 
+    def _cached_state_names(self) -> List[str]:
+        """names of the state arrays that are stored in the result cache"""
+        names = [
+            "_shares",
+            "_retirement_share",
+            "_share_of_new",
+            "_frac_for_allocation",
+        ]
+        if self.vintage_tracking:
+            names.append("_vintages")
+        if self.shared_learning:
+            # learning by deployment lowers prices as the simulation advances
+            names += ["_experience", "_price_of_energy_generation", "_usd_per_mwh"]
+        return names
+
+    def _load_cached_state(self) -> bool:
+        """restores the simulated state from the result cache; returns False if it is not cached"""
+        arrays = self.result_cache.load(self._cache_key)
+        if arrays is None:
+            return False
+        for name in self._cached_state_names():
+            setattr(self, name, arrays[name])
+        self.step_count = self.n_steps
+        return True
+
     def report(self):
         """Placeholder for a reporting function"""
         print(self.usd_per_mwh)
 
     @abstractmethod
-    def compute_new_shares(self):
+    def _compute_new_shares(self):
         """abstract method that can change how shares are allocated (e.g., modified logit)"""
 
 
@@ -286,137 +756,146 @@ class NestedLogitIAM(IAM):
         self.system_type = "nestedlogit"
         self.logit_exponents = config[
             "logit_exponents"
-        ]  # nested list of sectors and exponents
-        # TODO  error checking
-
-    def _modified_logit_shares(self, current_shares, current_prices, logit_exponent):
-        """compute modified logit share according to GCAM documenation
-        n.b.: see: https://jgcri.github.io/gcam-doc/choice.html"""
-        denominator = np.dot(
-            current_shares,
-            [p**logit_exponent for p in current_prices],
-        )
-
-        return [
-            (a * p**logit_exponent) / denominator
-            for a, p in zip(current_shares, current_prices)
-        ]
-
-    def compute_new_shares(self):
-        """nested modified logit for computing new shares"""
-        current_shares = self.shares[self.step_count]
-        if self.step_count == 0:
-            current_shares = self.df["starting_share"].to_dict()
-        calc_df = pd.DataFrame(
-            [
-                self.df["subsector"].to_dict(),
-                current_shares,
-                self.usd_per_mwh[self.step_count],
-            ],
-            index=["subsector", "source_share_of_total", "price"],
-        ).T
-
-        calc_df.index.name = "energy_source"
-
-        calc_subsec_totals_df = (
-            calc_df[["subsector", "source_share_of_total"]]
-            .groupby("subsector")
-            .sum()
-            .reset_index()
-        )
-
-        calc_subsec_totals_df.columns = [
-            "subsector",
-            "subsector_share_of_total",
-        ]
-
-        calc_df = calc_df.reset_index().merge(
-            calc_subsec_totals_df[
-                [
-                    "subsector",
-                    "subsector_share_of_total",
-                ]
-            ],
-            on="subsector",
-        )
-        calc_df["share_of_subsector"] = (
-            calc_df["source_share_of_total"] / calc_df["subsector_share_of_total"]
-        )
-
-        # compute subsector shares
-        share_of_subsector_allocatable_dict = {}
+        ]  # {nest level: {nest name: exponent}}
+        # nesting levels, bottom (closest to energy sources) first; each names a column of config['parameters']
+        self.nest_levels = config.get("nest_levels", list(self.logit_exponents))
+        # exponent for the choice among top-level nests; only needed when there is more than one
+        self.root_logit_exponent = config.get("root_logit_exponent")
+        self._compile_nests()
+
+    def _compile_nests(self):
+        """compiles the choice tree into per-level integer index, segment and exponent arrays
+        (done once, so that each timestep needs only array arithmetic)"""
+        # [level][nest]
+        self.nest_names = []
+        # [level]: (..., n_nests) exponent for the choice among the nest's children
+        self.nest_exponents = []
+        # [level]: nest index of each child (energy sources at level 0)
+        self._nest_parent = []
+        # [level]: child order that makes each nest a contiguous segment
+        self._nest_order = []
+        # [level]: where each nest's segment starts
+        self._nest_starts = []
+
+        source_nest = None
+        for level in self.nest_levels:
+            source_nest_names = list(self.df[level].reindex(self.energy_sources))
+            missing = set(source_nest_names) - set(self.logit_exponents[level])
+            if missing:
+                raise ValueError(f"No {level} logit exponent given for {missing}")
+
+            # nests that contain at least one energy source, ordered as in logit_exponents
+            names = [n for n in self.logit_exponents[level] if n in source_nest_names]
+            child_source_nest = source_nest
+            source_nest = np.array([names.index(n) for n in source_nest_names])
+
+            if child_source_nest is None:
+                parent = source_nest
+            else:
+                # each nest one level down must sit entirely inside a single nest at this level
+                parent = np.full(len(self.nest_names[-1]), -1)
+                for child, nest in zip(child_source_nest, source_nest):
+                    if parent[child] not in (-1, nest):
+                        raise ValueError(
+                            f"{self.nest_levels[len(self.nest_names) - 1]} nest "
+                            f"{self.nest_names[-1][child]} spans more than one {level} nest"
+                        )
+                    parent[child] = nest
 
-        subset_list = []
-        for subsector in self.logit_exponents["subsector"].keys():
-            calc_subset_df = calc_df.loc[calc_df.subsector == subsector].set_index(
-                "energy_source"
+            order = np.argsort(parent, kind="stable")
+            self.nest_names.append(names)
+            self.nest_exponents.append(
+                np.array([self.logit_exponents[level][n] for n in names], dtype=float)
             )
-            calc_subset_df[
-                "share_of_subsector_allocatable"
-            ] = self._modified_logit_shares(
-                calc_subset_df["share_of_subsector"],
-                calc_subset_df["price"],
-                self.logit_exponents["subsector"][subsector],
+            self._nest_parent.append(parent)
+            self._nest_order.append(order)
+            self._nest_starts.append(
+                np.searchsorted(parent[order], np.arange(len(names)))
             )
-            subset_list.append(calc_subset_df)
 
-            share_of_subsector_allocatable_dict = (
-                share_of_subsector_allocatable_dict
-                | (calc_subset_df["share_of_subsector_allocatable"].to_dict())
+        if len(self.nest_names[-1]) > 1 and self.root_logit_exponent is None:
+            raise ValueError(
+                f"root_logit_exponent is required to choose among {self.nest_names[-1]}"
             )
 
-        calc_df = pd.concat(subset_list)
-
-        calc_df["share_times_price"] = (
-            calc_df["share_of_subsector_allocatable"] * calc_df["price"]
-        )
-        subsector_avg_price_dict = (
-            calc_df[["share_times_price", "subsector"]]
-            .groupby("subsector")
-            .sum()
-            .to_dict()["share_times_price"]
-        )
-
-        calc_df["subsector_avg_price"] = [
-            subsector_avg_price_dict[s] for s in calc_df["subsector"]
+    def _broadcast_to_batch(self, n_samples: int, dtype=float):
+        """gives every variable that can be varied (including logit exponents) a leading (n_samples,) axis"""
+        super()._broadcast_to_batch(n_samples, dtype)
+        self.nest_exponents = [
+            np.repeat(e[np.newaxis], n_samples, axis=0).astype(dtype)
+            for e in self.nest_exponents
         ]
+        if self.root_logit_exponent is not None:
+            self.root_logit_exponent = np.full(
+                n_samples, self.root_logit_exponent, dtype=dtype
+            )
 
-        calc_grouped_subset_df = (
-            calc_df.groupby("subsector")
-            .first()[["subsector_avg_price", "subsector_share_of_total"]]
-            .copy()
+    def _set_varied_value(self, key_path: List[str], values: np.ndarray):
+        """writes one value per scenario to the array that holds the config entry at key_path"""
+        if key_path[0] == "logit_exponents" and len(key_path) == 3:
+            level = self.nest_levels.index(key_path[1])
+            self.nest_exponents[level][
+                ..., self.nest_names[level].index(key_path[2])
+            ] = values
+        elif list(key_path) == ["root_logit_exponent"]:
+            self.root_logit_exponent = values.copy()
+        else:
+            super()._set_varied_value(key_path, values)
+
+    def _get_varied_value(self, key_path: List[str]) -> np.ndarray:
+        """reads the value(s) of the config entry at key_path from the array that holds it"""
+        if key_path[0] == "logit_exponents" and len(key_path) == 3:
+            level = self.nest_levels.index(key_path[1])
+            return self.nest_exponents[level][
+                ..., self.nest_names[level].index(key_path[2])
+            ]
+        if list(key_path) == ["root_logit_exponent"]:
+            return np.asarray(self.root_logit_exponent)
+        return super()._get_varied_value(key_path)
+
+    def _nest_sum(self, level: int, values: np.ndarray) -> np.ndarray:
+        """sums (..., n_children) values within each nest of a level, giving (..., n_nests)"""
+        return np.add.reduceat(
+            values[..., self._nest_order[level]], self._nest_starts[level], axis=-1
         )
 
-        # compute the shares across top-level sectors
-        grouped_dict = {}
-        for sector in self.logit_exponents["sector"].keys():
-            calc_grouped_subset_df["new_sector_share"] = self._modified_logit_shares(
-                calc_grouped_subset_df["subsector_share_of_total"],
-                calc_grouped_subset_df["subsector_avg_price"],
-                self.logit_exponents["sector"][sector],
-            )
-            grouped_dict = (
-                grouped_dict | calc_grouped_subset_df["new_sector_share"].to_dict()
+    def _modified_logit_shares(self, current_shares, current_prices, logit_exponent):
+        """compute modified logit share according to GCAM documenation
+        n.b.: see: https://jgcri.github.io/gcam-doc/choice.html"""
+        weights = current_shares * current_prices**logit_exponent
+        return weights / np.sum(weights, axis=-1, keepdims=True)
+
+    def _compute_new_shares(self):
+        """nested modified logit for computing new shares, evaluated bottom-up one level at a time"""
+        shares = self._shares[..., self.step_count, :]
+        prices = self._usd_per_mwh[..., self.step_count, :]
+
+        # modified logit among the children of each nest; nests then compete one level up with
+        # their summed share and allocation-weighted average price
+        share_of_nest_allocatable = []
+        for level, parent in enumerate(self._nest_parent):
+            weights = shares * prices ** self.nest_exponents[level][..., parent]
+            allocatable = weights / self._nest_sum(level, weights)[..., parent]
+            share_of_nest_allocatable.append(allocatable)
+            shares = self._nest_sum(level, shares)
+            prices = self._nest_sum(level, allocatable * prices)
+
+        if shares.shape[-1] > 1:
+            new_share = self._modified_logit_shares(
+                shares, prices, np.expand_dims(self.root_logit_exponent, -1)
             )
+        else:
+            new_share = np.ones_like(shares)
 
-        calc_df["new_sector_share"] = [grouped_dict[s] for s in calc_df.subsector]
+        # multiply allocations back down the tree
+        for parent, allocatable in zip(
+            reversed(self._nest_parent), reversed(share_of_nest_allocatable)
+        ):
+            new_share = new_share[..., parent] * allocatable
 
-        calc_df = pd.merge(
-            calc_df,
-            pd.DataFrame(
-                [share_of_subsector_allocatable_dict],
-                index=["new_source_share_of_total"],
-            ).T,
-            left_index=True,
-            right_index=True,
-        )
-        calc_df["new_share"] = (
-            calc_df["new_sector_share"] * calc_df["new_source_share_of_total"]
-        )
-        self.share_of_new[self.step_count] = calc_df["new_share"].to_dict()
+        self._share_of_new[..., self.step_count, :] = new_share
 
 
-# TODO finish this subclass
 @IAM.register_subclass("logit")
 class LogitIAM(IAM):
     """Energy system class that uses a logit function to update shares of primary energy by source"""
@@ -429,24 +908,35 @@ class LogitIAM(IAM):
         else:
             config = config_info
         self.system_type = "logit"
+        if "logit_exponent" not in config:
+            raise ValueError(
+                "LogitIAM requires a single 'logit_exponent' in the configuration"
+            )
         self.logit_exponent = config["logit_exponent"]  # single exponent for everything
-        # TODO  error checking
-
 
-def compute_new_shares(self):
-    """modified logit for computing new shares"""
-    # temporary variables for ease of reading code below
-    current_shares = [self.shares[self.step_count][e] for e in self.energy_sources]
-    current_prices = [self.usd_per_mwh[self.step_count][e] for e in self.energy_sources]
+    def _broadcast_to_batch(self, n_samples: int, dtype=float):
+        """gives every variable that can be varied (including the logit exponent) a leading (n_samples,) axis"""
+        super()._broadcast_to_batch(n_samples, dtype)
+        self.logit_exponent = np.full(n_samples, self.logit_exponent, dtype=dtype)
 
-    denom = np.dot(current_shares, [p**self.logit_exponent for p in current_prices])
-
-    self.share_of_new[self.step_count] = dict(
-        zip(
-            self.energy_sources,
-            [
-                (a * p**self.logit_exponent) / denom
-                for a, p in zip(current_shares, current_prices)
-            ],
+    def _set_varied_value(self, key_path: List[str], values: np.ndarray):
+        """writes one value per scenario to the array that holds the config entry at key_path"""
+        if list(key_path) == ["logit_exponent"]:
+            self.logit_exponent = values.copy()
+        else:
+            super()._set_varied_value(key_path, values)
+
+    def _get_varied_value(self, key_path: List[str]) -> np.ndarray:
+        """reads the value(s) of the config entry at key_path from the array that holds it"""
+        if list(key_path) == ["logit_exponent"]:
+            return np.asarray(self.logit_exponent)
+        return super()._get_varied_value(key_path)
+
+    def _compute_new_shares(self):
+        """modified logit for computing new shares"""
+        weights = self._shares[..., self.step_count, :] * self._usd_per_mwh[
+            ..., self.step_count, :
+        ] ** np.expand_dims(self.logit_exponent, -1)
+        self._share_of_new[..., self.step_count, :] = weights / np.sum(
+            weights, axis=-1, keepdims=True
         )
-    )
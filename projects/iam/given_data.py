@@ -0,0 +1,233 @@
+"""This command-line script estimates sensitivity indices from the runs of an existing sensitivity analysis,
+e.g., an LHS study, for which Sobol indices cannot be computed
+
+To use:
+
+> python3 [path/to/this/file] --config [path/to/lhs_config.yml]
+
+which reads simulation_parameters and simulation_outputs (or simulation_metrics) from the config's
+output_dir. Each parameter's range is cut into num_slices equal-count slices of the samples. Per slice,
+  * the first-order index S1 (correlation ratio) is the variance of the slice means of an output over its
+    total variance, and
+  * the PAWN index is the Kolmogorov-Smirnov distance between the output's distribution within the slice
+    and its unconditional distribution; PAWN_median, PAWN_mean and PAWN_max summarize it over slices.
+Both are computed for every output (each energy source's share at every timestep, or every metric) at once.
+n.b.: S1 is biased upward by about (num_slices - 1) / n_samples, and downward if slices are too coarse to
+resolve how an output responds to a parameter. See Pianosi & Wagener (2015),
+https://doi.org/10.1016/j.envsoft.2015.01.004, for PAWN
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import List
+
+import click
+import numpy as np
+import pandas as pd
+
+from projects.iam.eslim import IAM
+from utils.io import yaml_to_dict
+
+logging.basicConfig(level=logging.INFO)
+
+
+def slice_labels(parameter_values: np.ndarray, num_slices: int) -> np.ndarray:
+    """(n_samples, n_params) index of the equal-count slice of each parameter's samples that holds each value
+    Args:
+        parameter_values: (n_samples, n_params) sampled parameter values
+        num_slices: number of slices of each parameter's range
+    Returns:
+        (n_samples, n_params) slice indices, from 0 (lowest values) to num_slices - 1
+    """
+    inner_edges = np.quantile(
+        parameter_values, np.linspace(0, 1, num_slices + 1)[1:-1], axis=0
+    )
+    return np.stack(
+        [
+            np.searchsorted(edges, values, side="right")
+            for edges, values in zip(inner_edges.T, parameter_values.T)
+        ],
+        axis=-1,
+    )
+
+
+def first_order_indices(
+    labels: np.ndarray, outputs: np.ndarray, num_slices: int
+) -> np.ndarray:
+    """first-order indices (variance of the slice means over total variance) of every output
+    Args:
+        labels: (n_samples, n_params) slice of each sampled parameter value (see slice_labels)
+        outputs: (n_samples, n_outputs) model outputs for each sample
+        num_slices: number of slices of each parameter's samples
+    Returns:
+        (n_params, n_outputs) indices; 0 for outputs that do not vary
+    """
+    n_samples, n_params = labels.shape
+    variance = outputs.var(axis=0)
+    varies = variance > np.finfo(float).eps
+    s1 = np.zeros((n_params,) + outputs.shape[1:])
+    for p in range(n_params):
+        in_slice = labels[:, p] == np.arange(num_slices)[:, np.newaxis]
+        slice_sizes = in_slice.sum(axis=1)
+
+        # variance of the slice means, over all slices at once
+        slice_means = in_slice @ outputs / slice_sizes[:, np.newaxis]
+        s1[p] = np.divide(
+            slice_sizes @ (slice_means - outputs.mean(axis=0)) ** 2 / n_samples,
+            variance,
+            out=np.zeros_like(variance),
+            where=varies,
+        )
+    return s1
+
+
+def pawn_indices(
+    labels: np.ndarray, outputs: np.ndarray, num_slices: int
+) -> np.ndarray:
+    """PAWN indices (Kolmogorov-Smirnov distance between the conditional and unconditional distributions)
+    of every output, in every slice
+    Args:
+        labels: (n_samples, n_params) slice of each sampled parameter value (see slice_labels)
+        outputs: (n_samples, n_outputs) model outputs for each sample
+        num_slices: number of slices of each parameter's samples
+    Returns:
+        (n_params, num_slices, n_outputs) indices; 0 for outputs that do not vary
+    """
+    n_samples, n_params = labels.shape
+
+    # unconditional distribution of each output: sorted values, where each run of ties ends, and cdf
+    order = np.argsort(outputs, axis=0, kind="stable")
+    sorted_outputs = np.take_along_axis(outputs, order, axis=0)
+    ends_of_ties = np.ones_like(sorted_outputs, dtype=bool)
+    ends_of_ties[:-1] = sorted_outputs[1:] != sorted_outputs[:-1]
+    cdf = np.arange(1, n_samples + 1)[:, np.newaxis] / n_samples
+
+    pawn = np.zeros((n_params, num_slices) + outputs.shape[1:])
+    for p in range(n_params):
+        slice_sizes = np.bincount(labels[:, p], minlength=num_slices)
+        # largest distance between the conditional and unconditional cdfs, evaluated where each cdf steps
+        sorted_labels = labels[:, p][order]
+        for s in range(num_slices):
+            conditional_cdf = np.cumsum(sorted_labels == s, axis=0) / slice_sizes[s]
+            pawn[p, s] = np.max(
+                np.where(ends_of_ties, np.abs(conditional_cdf - cdf), 0), axis=0
+            )
+    varies = outputs.var(axis=0) > np.finfo(float).eps
+    pawn[..., ~varies] = 0
+    return pawn
+
+
+def given_data_indices(
+    parameter_values: np.ndarray, outputs: np.ndarray, num_slices: int = 10
+) -> dict:
+    """first-order (binned variance) and PAWN indices of every output, from any sample of parameters
+    Args:
+        parameter_values: (n_samples, n_params) sampled parameter values (e.g., a Latin hypercube)
+        outputs: (n_samples, ...) model outputs for each sample
+        num_slices: number of equal-count slices of each parameter's samples
+    Returns:
+        dictionary with 'S1', 'PAWN_median', 'PAWN_mean', 'PAWN_max', each (n_params, ...); indices of
+        outputs that do not vary are 0
+    """
+    parameter_values = np.asarray(parameter_values, dtype=float)
+    outputs = np.asarray(outputs, dtype=float)
+    shape = parameter_values.shape[1:] + outputs.shape[1:]
+    flat_outputs = outputs.reshape(len(outputs), -1)
+    labels = slice_labels(parameter_values, num_slices)
+
+    pawn = pawn_indices(labels, flat_outputs, num_slices)
+    return {
+        "S1": first_order_indices(labels, flat_outputs, num_slices).reshape(shape),
+        "PAWN_median": np.median(pawn, axis=1).reshape(shape),
+        "PAWN_mean": np.mean(pawn, axis=1).reshape(shape),
+        "PAWN_max": np.max(pawn, axis=1).reshape(shape),
+    }
+
+
+def read_study(output_dir: Path, parameter_names: List[str]) -> tuple:
+    """reads the parameters and outputs written by sensitivity.py (as csv or parquet)
+    Args:
+        output_dir: output_dir of the sensitivity analysis
+        parameter_names: names of the parameters in pars_to_vary
+    Returns:
+        parameter_values: (n_samples, n_params) parameter samples
+        outputs_df: simulation_outputs (with an energy_source column) or simulation_metrics, in sample order
+    """
+    if (output_dir / Path("simulation_parameters.parquet")).exists():
+        parameters_df = pd.read_parquet(
+            output_dir / Path("simulation_parameters.parquet")
+        ).sort_values("iteration")
+    else:
+        parameters_df = pd.read_csv(output_dir / Path("simulation_parameters.csv"))
+    for outputs_name in ["simulation_outputs", "simulation_metrics"]:
+        if (output_dir / Path(f"{outputs_name}.parquet")).exists():
+            outputs_df = pd.read_parquet(output_dir / Path(f"{outputs_name}.parquet"))
+            break
+        if (output_dir / Path(f"{outputs_name}.csv")).exists():
+            outputs_df = pd.read_csv(output_dir / Path(f"{outputs_name}.csv"))
+            break
+    else:
+        raise FileNotFoundError(f"No simulation outputs or metrics in {output_dir}")
+    return (
+        parameters_df[parameter_names].to_numpy(),
+        outputs_df.sort_values("iteration", kind="stable"),
+    )
+
+
+@click.command()
+@click.option(
+    "--config",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    required=True,
+)
+def given_data(config: str):
+    """Estimates first-order and PAWN sensitivity indices from existing mini IAM runs"""
+
+    # get configuration of the sensitivity analysis whose runs are analyzed
+    config_info = yaml_to_dict(config)
+    output_dir = Path(".")
+    if "output_dir" in config_info:
+        output_dir = Path(config_info["output_dir"])
+    os.makedirs(output_dir, exist_ok=True)
+    parameter_names = [p["name"] for p in config_info["pars_to_vary"]]
+
+    parameter_values, outputs_df = read_study(output_dir, parameter_names)
+    if "energy_source" in outputs_df.columns:
+        # share trajectories: (n_samples, n_sources, n_steps+1)
+        iam = IAM.create(
+            config_info.get("system_type", "nestedlogit"),
+            yaml_to_dict(config_info["baseline_model_config"]),
+        )
+        outputs = (
+            outputs_df.drop(columns=["energy_source", "iteration"])
+            .to_numpy()
+            .reshape(len(parameter_values), len(iam.energy_sources), -1)
+        )
+        index = pd.MultiIndex.from_product(
+            [parameter_names, iam.energy_sources, iam.years],
+            names=["parameter", "energy_source", "year"],
+        )
+    else:
+        # one column per metric
+        metrics_df = outputs_df.drop(columns="iteration").select_dtypes("number")
+        outputs = metrics_df.to_numpy()
+        index = pd.MultiIndex.from_product(
+            [parameter_names, list(metrics_df.columns)], names=["parameter", "metric"]
+        )
+    logging.info(
+        " Estimating indices of %s outputs from %s samples",
+        outputs[0].size,
+        len(parameter_values),
+    )
+
+    indices = given_data_indices(
+        parameter_values, outputs, config_info.get("num_slices", 10)
+    )
+    pd.DataFrame(
+        {name: values.ravel() for name, values in indices.items()}, index=index
+    ).reset_index().to_csv(output_dir / Path("given_data_indices.csv"), index=False)
+
+
+if __name__ == "__main__":
+    given_data()
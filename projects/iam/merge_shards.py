@@ -0,0 +1,168 @@
+"""This command-line script combines the shards of a sensitivity analysis run with sensitivity.py --shard and
+analyzes the whole study
+
+To use, once every shard has finished:
+
+> python3 [path/to/this/file] --config [path/to/sensitivity_config.yml]
+
+Shards coordinate only through files in output_dir (e.g., on a shared filesystem), so they may run on any
+machines, under any (or no) scheduler. Before anything is moved, every shard 0...N-1 must have recorded that
+it finished, and its results must hold exactly the instances of its slice of the saved samples, in the
+chunks it recorded. The shards' partitions are then moved (not copied) into the study's results, which are
+analyzed as by sensitivity.py; the shard records are removed once the analysis succeeds, so that a merge
+that fails can be rerun.
+"""
+
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import List
+
+import click
+import numpy as np
+import pyarrow.parquet as pq
+
+from projects.iam.checkpoint import checkpoint_options, load_checkpoint, partition_path
+from projects.iam.samplers import Sampler
+from projects.iam.sensitivity import (
+    analyze_outputs,
+    chunk_ranges,
+    output_settings,
+    results_dir,
+    shard_dir,
+    shard_range,
+)
+from utils.io import yaml_to_dict
+
+logging.basicConfig(level=logging.INFO)
+
+
+def check_shards(output_dir: Path, num_instances: int, dataset_dir: Path) -> List[Path]:
+    """checks that the shards in output_dir together hold the results of every instance, once each
+    Args:
+        output_dir: output_dir of the sharded sensitivity analysis
+        num_instances: number of saved parameter samples
+        dataset_dir: directory into which the shards are merged; partitions found there (moved by an
+            earlier merge that did not finish) count as their shard's
+    Returns:
+        paths of the partitions of every shard, in sample order
+    """
+    records = [
+        yaml_to_dict(path)
+        for path in (Path(output_dir) / Path("shards")).glob("shard-*-of-*.yml")
+    ]
+    num_shards = {record["num_shards"] for record in records}
+    if len(num_shards) != 1:
+        raise ValueError(
+            f"Expected finished shards of one split of the samples in {output_dir}, found "
+            f"{len(records)} of splits into {sorted(num_shards)} shards"
+        )
+    num_shards = num_shards.pop()
+    missing = sorted(set(range(num_shards)) - {record["shard"] for record in records})
+    if missing:
+        raise ValueError(f"Shards {missing} of {num_shards} have not finished")
+
+    partitions = []
+    for record in sorted(records, key=lambda record: record["shard"]):
+        shard = record["shard"]
+        first_instance, last_instance = shard_range(shard, num_shards, num_instances)
+        if [record["first_instance"], record["last_instance"]] != [
+            first_instance,
+            last_instance,
+        ]:
+            raise ValueError(
+                f"Shard {shard} of {num_shards} ran instances {record['first_instance']} to "
+                f"{record['last_instance']}, not {first_instance} to {last_instance} of the "
+                f"{num_instances} saved samples"
+            )
+
+        # the shard's partitions must be exactly those of its recorded chunking: a shard rerun with
+        # another chunk_size leaves partitions that overlap them
+        path = shard_dir(output_dir, shard, num_shards)
+        chunks = chunk_ranges([first_instance, last_instance], record["chunk_size"])
+        expected = {partition_path(path, first).name for first, _ in chunks}
+        unexpected = sorted(
+            part.name
+            for part in path.glob("part-*.parquet")
+            if part.name not in expected
+        )
+        if unexpected:
+            raise ValueError(
+                f"Shard {shard} of {num_shards} holds partitions {unexpected} that are not chunks of "
+                f"{record['chunk_size']} instances: remove {path} and rerun the shard"
+            )
+        for first, last in chunks:
+            part = partition_path(path, first)
+            if not part.exists():
+                part = partition_path(dataset_dir, first)
+            # read only the iteration column of each partition
+            iterations = (
+                pq.read_table(part, columns=["iteration"])["iteration"].to_numpy()
+                if part.exists()
+                else np.array([], int)
+            )
+            if not np.array_equal(np.unique(iterations), np.arange(first, last)):
+                raise ValueError(
+                    f"Shard {shard} of {num_shards} is missing the results of instances {first} to "
+                    f"{last}: rerun the shard"
+                )
+            partitions.append(part)
+    return partitions
+
+
+@click.command()
+@click.option(
+    "--config",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    required=True,
+)
+def merge_shards(config: str):
+    """Combines and analyzes the shards of a mini IAM sensitivity analysis"""
+
+    # get configuration of the sharded sensitivity analysis
+    config_info = yaml_to_dict(config)
+    output_dir = Path(".")
+    if "output_dir" in config_info:
+        output_dir = Path(config_info["output_dir"])
+    parameter_names = [p["name"] for p in config_info["pars_to_vary"]]
+    problem_definition = {
+        "num_vars": len(config_info["pars_to_vary"]),
+        "names": parameter_names,
+        "bounds": [p["bounds"] for p in config_info["pars_to_vary"]],
+    }
+    sampler = Sampler.create(
+        config_info["sampler"].lower(), problem_definition, config_info
+    )
+    _, _, _, outputs_name = output_settings(
+        config_info, yaml_to_dict(config_info["baseline_model_config"]), False
+    )
+
+    parameter_samples_df, _ = load_checkpoint(
+        output_dir / Path("checkpoint"),
+        parameter_names,
+        checkpoint_options(config_info),
+    )
+    dataset_dir = results_dir(config_info, output_dir, outputs_name)
+    partitions = check_shards(output_dir, len(parameter_samples_df), dataset_dir)
+    logging.info(
+        " Merging %s partitions of %s instances",
+        len(partitions),
+        len(parameter_samples_df),
+    )
+
+    # partitions are named by their first instance, so those of all shards can share one directory
+    os.makedirs(dataset_dir, exist_ok=True)
+    for stale_partition in set(dataset_dir.glob("part-*.parquet")) - set(partitions):
+        stale_partition.unlink()
+    for part in partitions:
+        if part.parent != dataset_dir:
+            os.replace(part, dataset_dir / part.name)
+
+    analyze_outputs(config_info, sampler, parameter_samples_df, dataset_dir, output_dir)
+    # the shard records are kept until the analysis succeeds, so that a failed merge can be rerun
+    shutil.rmtree(output_dir / Path("shards"))
+
+
+if __name__ == "__main__":
+    merge_shards()
@@ -0,0 +1,199 @@
+"""Inverse solver for carbon-price curves: finds the cheapest price-curve parameters for which an energy
+source reaches a target share by a target year
+
+Each iteration evaluates a batch of candidate curves in one batched model run. With one free curve
+parameter, candidates form an evenly spaced grid and the bracket around the cheapest feasible candidate
+shrinks by a factor of ~n_candidates/2 per iteration. With several, candidates are scrambled-Sobol points
+in a box that is halved around the cheapest feasible candidate at each iteration.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from scipy.stats import qmc
+
+from projects.iam.batch import create_batch
+
+logging.basicConfig(level=logging.INFO)
+
+
+def price_curve_cost(usd_per_tco2: np.ndarray, timestep_yr: float, n_steps: int):
+    """cost of a carbon-price curve: price summed over the first n_steps timesteps (USD yr / tCO2)
+    Args:
+        usd_per_tco2: (..., n_steps+1) carbon price at each timestep
+        timestep_yr: years per timestep
+        n_steps: number of timesteps to include
+    Returns:
+        (...,) cost of each curve
+    """
+    return timestep_yr * np.sum(usd_per_tco2[..., :n_steps], axis=-1)
+
+
+def evaluate_price_curves(
+    config_info: Union[str, dict],
+    curve_keys: List[str],
+    candidates: np.ndarray,
+    source: str,
+    target_year: int,
+    *,
+    system_type: str = "nestedlogit",
+):
+    """simulates one scenario per candidate set of price-curve parameters
+    Args:
+        config_info: baseline model configuration (path to yaml or dict) with a price_curve
+        curve_keys: names of the price_curve entries given in each column of candidates
+        candidates: (n_candidates, len(curve_keys)) price-curve parameter values
+        source: energy source whose share is evaluated
+        target_year: year at which the share is evaluated
+        system_type: name under which the model class is registered with IAM
+    Returns:
+        shares: (n_candidates,) share of source in target_year
+        costs: (n_candidates,) cost of each curve up to target_year (see price_curve_cost)
+    """
+    iam = create_batch(
+        system_type,
+        config_info,
+        [{"key_path": ["price_curve", k]} for k in curve_keys],
+        candidates,
+    )
+    if target_year not in iam.years:
+        raise ValueError(f"target_year {target_year} is not a model year: {iam.years}")
+    target_step = iam.years.index(target_year)
+
+    shares = iam.simulate(True)[:, target_step, iam.energy_sources.index(source)]
+    return shares, price_curve_cost(iam.usd_per_tco2, iam.timestep_yr, target_step)
+
+
+@dataclass
+class SearchOptions:
+    """settings of the iterative search of solve_price_curve
+    Attributes:
+        n_candidates: candidate curves evaluated together in each iteration
+        n_iterations: maximum number of iterations
+        rtol: stop once the search box is narrower than rtol times its starting width in every dimension
+        seed: seed for the scrambled Sobol candidates (more than one free parameter)
+    """
+
+    n_candidates: int = 256
+    n_iterations: int = 20
+    rtol: float = 1e-6
+    seed: int = 0
+
+
+def _candidates(
+    sampler: qmc.Sobol,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    n_candidates: int,
+    best: Optional[dict],
+) -> np.ndarray:
+    """(n_candidates, n_free_parameters) candidates in the search box: an evenly spaced grid for one free
+    parameter, else scrambled Sobol points that include the cheapest feasible candidate so far
+    """
+    if len(lower) == 1:
+        return np.linspace(lower, upper, n_candidates)
+    candidates = qmc.scale(sampler.random(n_candidates), lower, upper)
+    if best is not None:
+        candidates[0] = best["candidate"]
+    return candidates
+
+
+def _shrink_box(
+    candidates: np.ndarray, cheapest: int, lower: np.ndarray, upper: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """narrows the search box around the cheapest feasible candidate
+    Args:
+        candidates: (n_candidates, n_free_parameters) candidates of this iteration (see _candidates)
+        cheapest: index of the cheapest feasible candidate
+        lower: (n_free_parameters,) lower corner of the search box
+        upper: (n_free_parameters,) upper corner of the search box
+    Returns:
+        lower and upper corners of the next search box
+    """
+    if candidates.shape[1] == 1:
+        # bracket the cheapest feasible grid point between its neighbours
+        return (
+            candidates[max(cheapest - 1, 0)],
+            candidates[min(cheapest + 1, len(candidates) - 1)],
+        )
+    half_width = (upper - lower) / 4
+    return (
+        np.maximum(candidates[cheapest] - half_width, lower),
+        np.minimum(candidates[cheapest] + half_width, upper),
+    )
+
+
+def solve_price_curve(
+    config_info: Union[str, dict],
+    source: str,
+    target_share: float,
+    target_year: int,
+    free_parameters: Dict[str, List[float]],
+    *,
+    below: bool = False,
+    options: Optional[SearchOptions] = None,
+    system_type: str = "nestedlogit",
+) -> dict:
+    """finds the cheapest price curve for which source's share reaches target_share by target_year
+    Args:
+        config_info: baseline model configuration (path to yaml or dict) with a price_curve; its type
+            and any price_curve entries not in free_parameters are held fixed
+        source: energy source (e.g., fossil_fuels_with_CCS or solar_pv)
+        target_share: share that source must reach
+        target_year: year by which it must be reached
+        free_parameters: {price_curve entry: [lower bound, upper bound]} to search over
+        below: if True, the share must fall to target_share or below rather than rise to it
+        options: settings of the search (SearchOptions defaults if None)
+        system_type: name under which the model class is registered with IAM
+    Returns:
+        dictionary with the cheapest feasible 'parameters', its 'cost', the 'share' it reaches,
+        and 'iterations' used
+    """
+    options = options or SearchOptions()
+    curve_keys = list(free_parameters)
+    lower = np.array([free_parameters[k][0] for k in curve_keys], dtype=float)
+    upper = np.array([free_parameters[k][1] for k in curve_keys], dtype=float)
+    width = upper - lower
+    sampler = qmc.Sobol(d=len(curve_keys), scramble=True, seed=options.seed)
+
+    best = None
+    for iteration in range(1, options.n_iterations + 1):
+        candidates = _candidates(sampler, lower, upper, options.n_candidates, best)
+        shares, costs = evaluate_price_curves(
+            config_info,
+            curve_keys,
+            candidates,
+            source,
+            target_year,
+            system_type=system_type,
+        )
+        feasible = shares <= target_share if below else shares >= target_share
+        if not feasible.any():
+            if best is None:
+                raise ValueError(
+                    f"{source} does not reach a share of {target_share} by {target_year} "
+                    f"for any price curve in {free_parameters}"
+                )
+            break
+        i = int(np.argmin(np.where(feasible, costs, np.inf)))
+        best = {"candidate": candidates[i], "cost": costs[i], "share": shares[i]}
+
+        lower, upper = _shrink_box(candidates, i, lower, upper)
+        logging.info(
+            "iteration %s: cost %.6g, %s share %.6g",
+            iteration,
+            costs[i],
+            source,
+            shares[i],
+        )
+        if np.all(upper - lower <= options.rtol * width):
+            break
+
+    return {
+        "parameters": dict(zip(curve_keys, best["candidate"].tolist())),
+        "cost": float(best["cost"]),
+        "share": float(best["share"]),
+        "iterations": iteration,
+    }
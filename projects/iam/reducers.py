@@ -0,0 +1,148 @@
+"""Metric reducers that summarize an IAM simulation as it runs, so that only scalars (one per
+scenario for a batch) need to be kept rather than full share trajectories"""
+
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+
+
+class Reducer(ABC):
+    """Parent class for metrics that are updated once per simulated step"""
+
+    subclasses = {}
+
+    @classmethod
+    def register_subclass(cls, reducer_type: str):
+        """creates decorator that automatically registers subclasses
+        To use, decorate the child class definition with @Reducer.register_subclass("[name-of-reducer]")
+        """
+
+        def decorator(subclass):
+            cls.subclasses[reducer_type] = subclass
+            return subclass
+
+        return decorator
+
+    @classmethod
+    def create(cls, reducer_type: str, **kwargs):
+        """Creates a new child class using the reducer_type (e.g., "final_share")"""
+        if reducer_type not in cls.subclasses:
+            raise ValueError(f"Bad reducer_type {reducer_type}")
+        return cls.subclasses[reducer_type](**kwargs)
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value = None
+
+    def start(self, iam):
+        """resets the metric and takes the starting (step 0) state of the model into account"""
+        self.value = None
+        self.update(iam)
+
+    @abstractmethod
+    def update(self, iam):
+        """updates the metric with the model state at iam.step_count"""
+
+    def result(self):
+        """returns the metric: a float for a single scenario, an (n_samples,) array for a batch"""
+        return self.value if np.ndim(self.value) else float(self.value)
+
+    @staticmethod
+    def _source_index(iam, source: str) -> int:
+        """column of an energy source in the model's state arrays"""
+        return iam.energy_sources.index(source)
+
+
+@Reducer.register_subclass("final_share")
+class FinalShare(Reducer):
+    """share of an energy source at the last simulated step"""
+
+    def __init__(self, source: str, name: Optional[str] = None):
+        super().__init__(name or f"final_share_{source}")
+        self.source = source
+
+    def update(self, iam):
+        self.value = np.copy(
+            iam.current_shares[..., self._source_index(iam, self.source)]
+        )
+
+
+@Reducer.register_subclass("cumulative_emissions")
+class CumulativeEmissions(Reducer):
+    """CO2 emitted (tCO2 per MWh of starting annual generation) summed over all simulated steps;
+    the shares at each step are held for the timestep_yr years that follow it"""
+
+    def __init__(self, sources: Optional[List[str]] = None, name: Optional[str] = None):
+        super().__init__(name or "cumulative_emissions")
+        self.sources = sources
+
+    def update(self, iam):
+        if iam.step_count == iam.n_steps:
+            return
+        emissions = iam.parameter("co2_per_mwh") * (
+            1 - iam.parameter("capture_fraction")
+        )
+        if self.sources is not None:
+            emissions = emissions * np.isin(iam.energy_sources, self.sources)
+        step_emissions = iam.timestep_yr * np.sum(
+            iam.demand_index(iam.step_count) * iam.current_shares * emissions, axis=-1
+        )
+        self.value = (
+            step_emissions if self.value is None else self.value + step_emissions
+        )
+
+
+@Reducer.register_subclass("threshold_year")
+class ThresholdYear(Reducer):
+    """first year in which an energy source's share is at or above (or, with below=True, at or below)
+    a threshold; NaN if it never gets there"""
+
+    def __init__(
+        self,
+        source: str,
+        threshold: float,
+        below: bool = False,
+        name: Optional[str] = None,
+    ):
+        super().__init__(
+            name or f"year_{source}_{'below' if below else 'above'}_{threshold}"
+        )
+        self.source = source
+        self.threshold = threshold
+        self.below = below
+
+    def update(self, iam):
+        share = iam.current_shares[..., self._source_index(iam, self.source)]
+        crossed = share <= self.threshold if self.below else share >= self.threshold
+        if self.value is None:
+            self.value = np.full(np.shape(share), np.nan)
+        self.value = np.where(
+            np.isnan(self.value) & crossed, iam.years[iam.step_count], self.value
+        )
+
+
+@Reducer.register_subclass("peak_price")
+class PeakPrice(Reducer):
+    """highest total price per MWh of an energy source over all simulated steps"""
+
+    def __init__(self, source: str, name: Optional[str] = None):
+        super().__init__(name or f"peak_price_{source}")
+        self.source = source
+
+    def update(self, iam):
+        price = iam.current_prices[..., self._source_index(iam, self.source)]
+        self.value = price if self.value is None else np.maximum(self.value, price)
+
+
+def reducers_from_config(reducer_specs: List[dict]) -> List[Reducer]:
+    """creates reducers from a list of config entries, e.g. {"type": "final_share", "source": "solar_pv"}
+    Args:
+        reducer_specs: list of dicts, each with a reducer 'type' and that reducer's arguments
+    Returns:
+        list of reducers
+    """
+    return [
+        Reducer.create(spec["type"], **{k: v for k, v in spec.items() if k != "type"})
+        for spec in reducer_specs
+    ]
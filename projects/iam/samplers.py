@@ -0,0 +1,322 @@
+"""Parameter samplers for sensitivity analysis, each paired with the analysis that its design supports
+
+Samplers are registered by name (the 'sampler' in sensitivity configs) with Sampler.register_subclass:
+  * lhs: Latin hypercube samples, for uncertainty analysis (no indices; see given_data.py)
+  * saltelli: Saltelli's extension of a Sobol sequence, for Sobol first-, total- (and second-) order indices
+  * sobol: a scrambled Sobol sequence (scipy.stats.qmc), filling parameter space more evenly than LHS, with
+    first-order and PAWN indices estimated from the sample (see given_data.py)
+  * morris: Morris trajectories (num_samples trajectories of d+1 runs each), for screening out parameters
+    with little effect before a Saltelli study; gives mean absolute elementary effects (mu_star)
+  * efast: extended Fourier amplitude sensitivity test (num_samples runs per parameter), for first- and
+    total-order indices from fewer runs than a Saltelli design
+"""
+
+import logging
+import warnings
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from SALib.analyze import fast, morris, sobol
+from SALib.sample import fast_sampler
+from SALib.sample import morris as morris_sampler
+from SALib.sample import saltelli
+from scipy.stats import qmc
+
+from projects.iam.given_data import given_data_indices
+
+
+def lhs(num_samples: int, param_bounds: List[List[float]]):
+    """gets latin hypercube samples for parameter space
+    Args:
+        num_samples: number of samples to generate
+        param_bounds: a list of ranges from which to sample (currently only does uniform dist)
+    Returns:
+        pandas dataframe containing scaled results for use in model"""
+    # generate latin hypercube samples in [0, 1]
+    sampler = qmc.LatinHypercube(d=len(param_bounds))
+    lhs_unit = sampler.random(n=num_samples)
+
+    # scale to parameter bounds; return to user
+    return pd.DataFrame(
+        qmc.scale(
+            lhs_unit,
+            [b[0] for b in param_bounds],
+            [b[1] for b in param_bounds],
+        )
+    )
+
+
+def saltelli_sample(
+    num_samples: int,
+    problem_definition: dict,
+    calc_second_order: bool,
+    skip_values: Optional[int] = None,
+) -> pd.DataFrame:
+    """Uses sobol sampling to get a set of parameters for model sensitivity analysis
+    n.b.: with skip_values fixed, the samples for num_samples begin with those for any smaller num_samples,
+    so that a design can be grown without discarding runs (see adaptive analysis in sensitivity)
+    """
+
+    # generate samples, return
+    try:
+        with warnings.catch_warnings():
+            if skip_values is not None:
+                # SALib warns when num_samples outgrows skip_values, as it must for a growing design
+                warnings.simplefilter("ignore", UserWarning)
+            pars = saltelli.sample(
+                problem_definition,
+                N=num_samples,
+                calc_second_order=calc_second_order,
+                skip_values=skip_values,
+            )
+        return pd.DataFrame(pars)
+    except Exception as e:
+        raise RuntimeError(" Sobol sampling failed ") from e
+
+
+def si_to_dataframes(
+    si_matrix: np.array, param_names: List[str], calc_second_order: bool = False
+):
+    """Convert SALib sobol Si matrix and parameter names into dfs."""
+    n = len(param_names)
+
+    # first-order saltelli indices and confidence outputs
+    s1_df = pd.DataFrame(
+        {"S1": si_matrix["S1"], "S1_conf": si_matrix.get("S1_conf", [np.nan] * n)},
+        index=param_names,
+    )
+    s1_df.index.name = "parameter"
+    s1_df.reset_index(inplace=True)
+
+    # total-order indices and confidence outputs
+    s_total_df = pd.DataFrame(
+        {"ST": si_matrix["ST"], "ST_conf": si_matrix.get("ST_conf", [np.nan] * n)},
+        index=param_names,
+    )
+    s_total_df.index.name = "parameter"
+    s_total_df.reset_index(inplace=True)
+
+    if calc_second_order:
+        # Second-order indices
+        s2_flat = si_matrix.get("S2", None)
+
+        if s2_flat is None:
+            s2_df = pd.DataFrame(np.nan, index=param_names, columns=param_names)
+
+        else:
+            s2_df = pd.DataFrame(s2_flat, index=param_names, columns=param_names)
+            s2_df.fillna(0, inplace=True)
+
+        s2_df.index.name = "parameter"
+        s2_df.reset_index(inplace=True)
+        return s1_df, s_total_df, s2_df
+    return s1_df, s_total_df, pd.DataFrame()
+
+
+class Sampler(ABC):
+    """Parent class for samplers of the parameters in pars_to_vary and the analysis of their outputs"""
+
+    subclasses = {}
+
+    @classmethod
+    def register_subclass(cls, sampler_type: str):
+        """creates decorator that automatically registers subclasses
+        To use, decorate the child class definition with @Sampler.register_subclass("[name-of-sampler]")
+        """
+
+        def decorator(subclass):
+            cls.subclasses[sampler_type] = subclass
+            return subclass
+
+        return decorator
+
+    @classmethod
+    def create(cls, sampler_type: str, problem_definition: dict, config_info: dict):
+        """Creates a new child class using the sampler_type (e.g., "morris")"""
+        if sampler_type not in cls.subclasses:
+            raise ValueError(f"Bad sampler {sampler_type}")
+        return cls.subclasses[sampler_type](problem_definition, config_info)
+
+    def __init__(self, problem_definition: dict, config_info: dict):
+        """
+        Args:
+            problem_definition: SALib problem with num_vars, names and bounds of the parameters
+            config_info: sensitivity configuration, for any options of the sampler (e.g., num_levels)
+        """
+        self.problem_definition = problem_definition
+        self.seed = config_info.get("seed")
+
+    @abstractmethod
+    def sample(self, num_samples: int) -> pd.DataFrame:
+        """parameter samples, one row per model instance and one column per parameter"""
+
+    def analyze(
+        self, parameter_samples_df: pd.DataFrame, metric: np.ndarray
+    ) -> Dict[str, pd.DataFrame]:
+        """sensitivity indices of the metric
+        Args:
+            parameter_samples_df: samples from sample (n_instances, n_params)
+            metric: (n_instances,) metric of each instance
+        Returns:
+            {name of results file: results}; none by default
+        """
+        return {}
+
+
+@Sampler.register_subclass("lhs")
+class LatinHypercubeSampler(Sampler):
+    """Latin hypercube samples, for uncertainty analysis"""
+
+    def sample(self, num_samples: int) -> pd.DataFrame:
+        logging.info(" Generating Latin hypercube parameter samples")
+        return lhs(num_samples, self.problem_definition["bounds"])
+
+
+@Sampler.register_subclass("saltelli")
+class SaltelliSampler(Sampler):
+    """Saltelli samples, for Sobol indices"""
+
+    def __init__(self, problem_definition: dict, config_info: dict):
+        super().__init__(problem_definition, config_info)
+        self.calc_second_order = config_info["calc_second_order"]
+        # an adaptive analysis fixes skip_values (at SALib's default for a power of 2) so that larger designs
+        # extend smaller ones
+        self.skip_values = None
+        if config_info.get("adaptive") is not None:
+            self.skip_values = max(config_info["num_samples"], 16)
+
+    def sample(self, num_samples: int) -> pd.DataFrame:
+        logging.info(" Generating Saltelli Sobol parameter samples")
+        return saltelli_sample(
+            num_samples,
+            self.problem_definition,
+            self.calc_second_order,
+            self.skip_values,
+        )
+
+    def analyze(
+        self, parameter_samples_df: pd.DataFrame, metric: np.ndarray
+    ) -> Dict[str, pd.DataFrame]:
+        """first-, total- (and second-) order Sobol indices with confidence intervals"""
+        si = sobol.analyze(
+            self.problem_definition,
+            metric,
+            calc_second_order=self.calc_second_order,
+        )
+        s_first_order_df, s_total_df, s_second_order_df = si_to_dataframes(
+            si, self.problem_definition["names"], self.calc_second_order
+        )
+        return {
+            "s1_results": s_first_order_df,
+            "s_total_results": s_total_df,
+            "s2_results": s_second_order_df,
+        }
+
+
+@Sampler.register_subclass("sobol")
+class ScrambledSobolSampler(Sampler):
+    """Scrambled Sobol sequence, for given-data indices"""
+
+    def __init__(self, problem_definition: dict, config_info: dict):
+        super().__init__(problem_definition, config_info)
+        self.num_slices = config_info.get("num_slices", 10)
+
+    def sample(self, num_samples: int) -> pd.DataFrame:
+        """the first 2^m >= num_samples points of a scrambled Sobol sequence (balanced only at powers of 2)"""
+        logging.info(" Generating scrambled Sobol parameter samples")
+        bounds = np.array(self.problem_definition["bounds"], dtype=float)
+        sobol_unit = qmc.Sobol(
+            d=len(bounds), scramble=True, seed=self.seed
+        ).random_base2(m=int(np.ceil(np.log2(num_samples))))
+        return pd.DataFrame(qmc.scale(sobol_unit, bounds[:, 0], bounds[:, 1]))
+
+    def analyze(
+        self, parameter_samples_df: pd.DataFrame, metric: np.ndarray
+    ) -> Dict[str, pd.DataFrame]:
+        """first-order (binned variance) and PAWN indices (see given_data.py)"""
+        indices = given_data_indices(
+            parameter_samples_df.to_numpy(), metric, self.num_slices
+        )
+        return {
+            "given_data_results": pd.DataFrame(
+                indices,
+                index=pd.Index(self.problem_definition["names"], name="parameter"),
+            ).reset_index()
+        }
+
+
+@Sampler.register_subclass("morris")
+class MorrisSampler(Sampler):
+    """Morris trajectories, for screening by elementary effects"""
+
+    def __init__(self, problem_definition: dict, config_info: dict):
+        super().__init__(problem_definition, config_info)
+        self.num_levels = config_info.get("num_levels", 4)
+
+    def sample(self, num_samples: int) -> pd.DataFrame:
+        """num_samples trajectories of d+1 runs, each moving one parameter at a time across num_levels levels"""
+        logging.info(" Generating Morris trajectories")
+        return pd.DataFrame(
+            morris_sampler.sample(
+                self.problem_definition,
+                N=num_samples,
+                num_levels=self.num_levels,
+                seed=self.seed,
+            )
+        )
+
+    def analyze(
+        self, parameter_samples_df: pd.DataFrame, metric: np.ndarray
+    ) -> Dict[str, pd.DataFrame]:
+        """mean (mu), mean absolute (mu_star, with confidence interval) and standard deviation (sigma) of
+        each parameter's elementary effects"""
+        si = morris.analyze(
+            self.problem_definition,
+            parameter_samples_df.to_numpy(),
+            metric,
+            num_levels=self.num_levels,
+            seed=self.seed,
+        )
+        return {
+            "morris_results": pd.DataFrame(
+                {name: si[name] for name in ["mu", "mu_star", "mu_star_conf", "sigma"]},
+                index=pd.Index(self.problem_definition["names"], name="parameter"),
+            ).reset_index()
+        }
+
+
+@Sampler.register_subclass("efast")
+class FastSampler(Sampler):
+    """Extended Fourier amplitude sensitivity test samples, for first- and total-order indices"""
+
+    def __init__(self, problem_definition: dict, config_info: dict):
+        super().__init__(problem_definition, config_info)
+        self.interference_factor = config_info.get("interference_factor", 4)
+
+    def sample(self, num_samples: int) -> pd.DataFrame:
+        """num_samples runs (more than 4 * interference_factor^2) along a search curve for each parameter"""
+        logging.info(" Generating eFAST parameter samples")
+        return pd.DataFrame(
+            fast_sampler.sample(
+                self.problem_definition,
+                num_samples,
+                M=self.interference_factor,
+                seed=self.seed,
+            )
+        )
+
+    def analyze(
+        self, parameter_samples_df: pd.DataFrame, metric: np.ndarray
+    ) -> Dict[str, pd.DataFrame]:
+        """first- and total-order indices with confidence intervals"""
+        si = fast.analyze(
+            self.problem_definition, metric, M=self.interference_factor, seed=self.seed
+        )
+        return {
+            "efast_results": pd.DataFrame(
+                {name: si[name] for name in ["S1", "S1_conf", "ST", "ST_conf"]},
+                index=pd.Index(self.problem_definition["names"], name="parameter"),
+            ).reset_index()
+        }
@@ -4,25 +4,63 @@ To use:
 
 > python3 [path/to/this/file] --config [path/to/sensitivity_config.yml]
 
+An interrupted run picks up where it stopped, with the same parameter samples, with
+
+> python3 [path/to/this/file] --config [path/to/sensitivity_config.yml] --resume
+
+As each chunk of instances finishes, throughput (runs/s), time spent per phase (config build, model
+construction, simulation, result collection), peak memory, and ETA are logged and appended to
+output_dir/telemetry.jsonl (or telemetry-shard-i-of-N.jsonl for a shard) as json lines.
+
+A large study can be split across machines that share output_dir: draw and save the samples once, run each
+of N shards (on any node, in any order; rerunning a shard runs only its unfinished chunks), then combine
+the shards and analyze them with merge_shards.py
+
+> python3 [path/to/this/file] --config [path/to/sensitivity_config.yml] --sample-only
+> python3 [path/to/this/file] --config [path/to/sensitivity_config.yml] --shard 0/N
+...
+> python3 [path/to/this/file] --config [path/to/sensitivity_config.yml] --shard N-1/N
+> python3 [path/to/merge_shards.py] --config [path/to/sensitivity_config.yml]
+
 """
 
+import copy
 import logging
 import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 
 import click
 import numpy as np
 import pandas as pd
 from SALib.analyze import sobol
-from SALib.sample import saltelli
-from scipy.stats import qmc
 
-from projects.iam.eslim import NestedLogitIAM
-from utils.io import yaml_to_dict
+from projects.iam.batch import batch_to_dataframe
+from projects.iam.checkpoint import (
+    checkpoint_options,
+    load_checkpoint,
+    partition_path,
+    read_metric,
+    read_partitions,
+    save_checkpoint,
+    write_partition,
+)
+from projects.iam.eslim import IAM
+from projects.iam.reducers import reducers_from_config
+from projects.iam.samplers import SaltelliSampler, Sampler
+from projects.iam.sobol_indices import indices_to_dataframes, sobol_indices
+from projects.iam.telemetry import PhaseTimer, ProgressReport, max_rss_mb
+from utils.io import dict_to_yaml, yaml_to_dict
 
 logging.basicConfig(level=logging.INFO)
 
+# largest default number of instances per chunk (see default_chunk_size)
+DEFAULT_CHUNK_SIZE = 1000
+
 
 def set_nested_value(d: dict, keys: List[str], value):
     """Sets a value in a nested dictionary using a list of keys
@@ -69,79 +107,722 @@ def update_parameters(
             )
 
 
-def lhs(num_samples: int, param_bounds: List[List[float]]):
-    """gets latin hypercube samples for parameter space
+def sobol_ci_widths(si: dict) -> Tuple[float, float]:
+    """widest 95% confidence intervals among the first-order (S1) and total-order (ST) indices of a
+    sobol.analyze result"""
+    return 2 * float(np.nanmax(si["S1_conf"])), 2 * float(np.nanmax(si["ST_conf"]))
+
+
+def _batch_models(
+    baseline_config: dict,
+    pars_to_vary: List[dict],
+    parameter_samples_df: pd.DataFrame,
+    *,
+    system_type: str,
+    batch_size: int,
+    timer: PhaseTimer,
+):
+    """yields batched models (as create_batch builds them) that each hold the next batch_size samples"""
+    for start in range(0, len(parameter_samples_df), batch_size):
+        with timer.phase("model_construction"):
+            iam = IAM.create(system_type, baseline_config)
+        with timer.phase("config_build"):
+            iam.apply_parameter_matrix(
+                pars_to_vary,
+                parameter_samples_df.iloc[start : start + batch_size].to_numpy(),
+            )
+        yield iam
+
+
+def _instance_models(
+    baseline_config: dict,
+    pars_to_vary: List[dict],
+    parameter_samples_df: pd.DataFrame,
+    *,
+    system_type: str,
+    timer: PhaseTimer,
+):
+    """yields a single-scenario model set to each sample in turn"""
+    # compile the varied key paths once into one model's arrays; each instance then writes its values
+    # there and re-simulates, rather than copying the config and building a new model
+    try:
+        with timer.phase("model_construction"):
+            iam = IAM.create(system_type, baseline_config)
+            plan = iam.compile_parameter_plan(pars_to_vary)
+    except ValueError:
+        # entries the model does not hold in arrays (e.g., n_steps)
+        plan = None
+
+    for instance_parameter_values in parameter_samples_df.to_numpy():
+        if plan is not None:
+            with timer.phase("config_build"):
+                iam.set_parameter_values(plan, instance_parameter_values)
+        else:
+            with timer.phase("config_build"):
+                instance_config = copy.deepcopy(baseline_config)
+                update_parameters(
+                    instance_config,
+                    pars_to_vary,
+                    pd.Series(
+                        instance_parameter_values, index=parameter_samples_df.columns
+                    ),
+                )
+            with timer.phase("model_construction"):
+                iam = IAM.create(system_type, instance_config)
+        yield iam
+
+
+def _simulate(iam: IAM, reducer_specs: Optional[List[dict]], timer: PhaseTimer):
+    """simulates a single-scenario or batched model, in the form in which _results_frame combines results
+    Returns:
+        with reducer_specs, {metric name: (n_scenarios,) values}; otherwise (n_scenarios, n_steps+1,
+        n_sources) shares
+    """
+    if reducer_specs is not None:
+        with timer.phase("simulation"):
+            metrics = iam.simulate(reducers=reducers_from_config(reducer_specs))
+        with timer.phase("result_collection"):
+            return {name: np.atleast_1d(value) for name, value in metrics.items()}
+    with timer.phase("simulation"):
+        shares = iam.simulate(True)
+    with timer.phase("result_collection"):
+        if isinstance(shares, pd.DataFrame):
+            # a single scenario's [energy source x timestep] shares
+            return shares.to_numpy().T[np.newaxis]
+        return shares
+
+
+def _results_frame(
+    results: list, iterations: np.ndarray, energy_sources: List[str]
+) -> pd.DataFrame:
+    """combines the results of _simulate into one dataframe (see run_instances)
     Args:
-        num_samples: number of samples to generate
-        param_bounds: a list of ranges from which to sample (currently only does uniform dist)
+        results: from _simulate, for consecutive scenarios
+        iterations: instance number of each scenario
+        energy_sources: names of the energy sources, in model order
+    """
+    if isinstance(results[0], dict):
+        df = pd.DataFrame(
+            {name: np.concatenate([r[name] for r in results]) for name in results[0]}
+        )
+        df["iteration"] = iterations
+        return df
+    df = batch_to_dataframe(np.concatenate(results), energy_sources)
+    df["iteration"] = np.repeat(iterations, len(energy_sources))
+    return df
+
+
+def run_instances(
+    baseline_config: dict,
+    pars_to_vary: List[dict],
+    parameter_samples_df: pd.DataFrame,
+    *,
+    system_type: str = "nestedlogit",
+    reducer_specs: Optional[List[dict]] = None,
+    batch_size: Optional[int] = None,
+    timer: Optional[PhaseTimer] = None,
+) -> pd.DataFrame:
+    """simulates one model instance per row of parameter_samples_df
+    Args:
+        baseline_config: model configuration dictionary that the samples modify; single-region models
+            only (a config with 'regions' raises ValueError)
+        pars_to_vary: list of dicts with par 'name' & 'key_path'; one per column of parameter_samples_df
+        parameter_samples_df: parameter samples, indexed by instance (iteration) number
+        system_type: name under which the model class is registered with IAM
+        reducer_specs: optional metric reducers (see projects/iam/reducers.py) to keep instead of shares
+        batch_size: if given, number of instances simulated together by the batched model
+        timer: optional timer (see projects/iam/telemetry.py) to which the time of each phase is added
     Returns:
-        pandas dataframe containing scaled results for use in model"""
-    # generate latin hypercube samples in [0, 1]
-    sampler = qmc.LatinHypercube(d=len(param_bounds))
-    lhs_unit = sampler.random(n=num_samples)
-
-    # scale to parameter bounds; return to user
-    return pd.DataFrame(
-        qmc.scale(
-            lhs_unit,
-            [b[0] for b in param_bounds],
-            [b[1] for b in param_bounds],
+        with reducer_specs, one row of metrics per instance; otherwise shares indexed by energy source,
+        one column per timestep; both with an 'iteration' column
+    """
+    if "regions" in baseline_config:
+        # instance results are rows of one region's shares (or metrics)
+        raise ValueError(
+            "run_instances simulates single-region models: remove 'regions' from the baseline config"
+        )
+    if timer is None:
+        timer = PhaseTimer()
+    if batch_size is not None:
+        models = _batch_models(
+            baseline_config,
+            pars_to_vary,
+            parameter_samples_df,
+            system_type=system_type,
+            batch_size=batch_size,
+            timer=timer,
+        )
+    else:
+        models = _instance_models(
+            baseline_config,
+            pars_to_vary,
+            parameter_samples_df,
+            system_type=system_type,
+            timer=timer,
+        )
+    # results are kept as arrays and become one dataframe at the end
+    results = [_simulate(iam, reducer_specs, timer) for iam in models]
+    with timer.phase("result_collection"):
+        return _results_frame(
+            results,
+            parameter_samples_df.index.to_numpy(),
+            baseline_config["energy_sources"],
         )
+
+
+# run settings (baseline config, samples, ...) held by each worker process of a parallel run
+_worker_settings = {}
+
+
+def _init_worker(run_settings: dict):
+    """stores the run settings once per worker process, so that chunks are dispatched as index ranges"""
+    _worker_settings.update(run_settings)
+
+
+def _run_chunk(chunk: Tuple[int, int]) -> dict:
+    """runs the instances in the range [first, last) of the worker's parameter samples and writes their
+    results to the run's dataset_dir as one parquet partition; returns the chunk's timing and memory use
+    (see telemetry.ProgressReport.update)"""
+    first_instance, last_instance = chunk
+    start = time.perf_counter()
+    timer = PhaseTimer()
+    settings = dict(_worker_settings)
+    dataset_dir = settings.pop("dataset_dir")
+    row_group_size = settings.pop("row_group_size", None)
+    df = run_instances(
+        **{
+            **settings,
+            "parameter_samples_df": settings["parameter_samples_df"].iloc[
+                first_instance:last_instance
+            ],
+        },
+        timer=timer,
+    )
+    with timer.phase("result_collection"):
+        if settings["reducer_specs"] is None:
+            df = df.rename_axis("energy_source").reset_index()
+        write_partition(
+            df.reset_index(drop=True), dataset_dir, first_instance, row_group_size
+        )
+    return {
+        "first_instance": first_instance,
+        "last_instance": last_instance,
+        "chunk_s": time.perf_counter() - start,
+        "phase_s": timer.seconds,
+        "max_rss_mb": max_rss_mb(),
+        "pid": os.getpid(),
+    }
+
+
+def default_chunk_size(num_instances: int, num_workers: int) -> int:
+    """instances per chunk unless the config sets chunk_size: a quarter of each worker's share of
+    num_instances, so that workers stay busy to the end, but at most DEFAULT_CHUNK_SIZE, so that the results
+    a worker holds before writing them stay the same size however many samples are drawn
+    """
+    return min(
+        DEFAULT_CHUNK_SIZE, max(int(np.ceil(num_instances / (4 * num_workers))), 1)
     )
 
 
-def saltelli_sample(
-    num_samples: int, problem_definition: dict, calc_second_order: bool
-) -> pd.DataFrame:
-    """Uses sobol sampling to get a set of parameters for model sensitivity analysis"""
+def chunk_ranges(boundaries: List[int], chunk_size: int) -> List[Tuple[int, int]]:
+    """contiguous (first, last) instance ranges of up to chunk_size instances within each part
+    [boundaries[i], boundaries[i+1]) of the samples (e.g., each round of an adaptive design)
+    """
+    return [
+        (first_instance, min(first_instance + chunk_size, part_end))
+        for part_start, part_end in zip(boundaries[:-1], boundaries[1:])
+        for first_instance in range(part_start, part_end, chunk_size)
+    ]
+
+
+def run_chunks(
+    run_settings: dict,
+    chunks: List[Tuple[int, int]],
+    num_workers: int,
+    telemetry_path: Optional[Path] = None,
+):
+    """runs chunks of instances (see _run_chunk) in a pool of worker processes, or in turn in this process
+    if num_workers is 1, reporting throughput, time per phase, memory use and ETA as each chunk finishes
+    (to the log and, if telemetry_path is given, to that json lines file)"""
+    progress = ProgressReport(
+        sum(last - first for first, last in chunks), num_workers, telemetry_path
+    )
+    if num_workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_worker,
+            initargs=(run_settings,),
+        ) as executor:
+            for future in as_completed(
+                [executor.submit(_run_chunk, chunk) for chunk in chunks]
+            ):
+                progress.update(future.result())
+    else:
+        _init_worker(run_settings)
+        for chunk in chunks:
+            progress.update(_run_chunk(chunk))
+    progress.finish()
+
+
+def write_parameters(
+    parameter_samples_df: pd.DataFrame, output_dir: Path, parquet_output: bool
+):
+    """writes out parameter samples, under the same sample ids (iteration) as the results"""
+    if parquet_output:
+        parameter_samples_df.rename_axis("iteration").reset_index().to_parquet(
+            output_dir / Path("simulation_parameters.parquet"), index=False
+        )
+    else:
+        parameter_samples_df.to_csv(
+            output_dir / Path("simulation_parameters.csv"), index=False
+        )
 
-    # generate samples, return
-    try:
-        pars = saltelli.sample(
-            problem_definition, N=num_samples, calc_second_order=calc_second_order
+
+def shard_range(shard: int, num_shards: int, num_instances: int) -> Tuple[int, int]:
+    """(first, last) range of the instances run by shard number shard (from 0) of num_shards: contiguous
+    slices of the saved samples, of sizes differing by at most one"""
+    return (
+        shard * num_instances // num_shards,
+        (shard + 1) * num_instances // num_shards,
+    )
+
+
+def shard_dir(output_dir: Path, shard: int, num_shards: int) -> Path:
+    """directory holding the partitions of one shard's results; its record (see sensitivity) is written
+    next to it, as shard-{shard}-of-{num_shards}.yml, once the shard is complete"""
+    return Path(output_dir) / Path("shards") / f"shard-{shard}-of-{num_shards}"
+
+
+def parse_shard(ctx, param, value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """click callback converting --shard i/N to (i, N)"""
+    if value is None:
+        return None
+    match = re.fullmatch(r"(\d+)/(\d+)", value)
+    if match is None or not int(match[1]) < int(match[2]):
+        raise click.BadParameter(f"expected i/N with 0 <= i < N, not {value}")
+    return int(match[1]), int(match[2])
+
+
+def output_settings(
+    config_info: dict, baseline_config: dict, saltelli_sampler: bool
+) -> Tuple[Optional[List[dict]], str, Optional[str], str]:
+    """what each instance keeps and where the analyzed metric is found in it
+    Args:
+        config_info: sensitivity analysis configuration
+        baseline_config: model configuration dictionary that the samples modify
+        saltelli_sampler: whether the samples are a saltelli design (which trajectory_indices requires)
+    Returns:
+        reducer_specs: metric reducers to keep instead of shares (None to keep shares)
+        metric_column: column of the results holding the metric
+        metric_source: for share trajectories, the energy source whose rows hold the metric
+        outputs_name: name of the results ('simulation_outputs' or 'simulation_metrics')
+    """
+    # optional metric reducers: if given, keep only per-instance metrics rather than trajectories
+    reducer_specs = config_info.get("reducers")
+    if reducer_specs is not None:
+        metric_column = config_info["metric"]
+        if metric_column not in [r.name for r in reducers_from_config(reducer_specs)]:
+            # the metric names an energy source: reduce to its final share
+            metric_column = f"final_share_{config_info['metric']}"
+            reducer_specs = reducer_specs + [
+                {"type": "final_share", "source": config_info["metric"]}
+            ]
+        metric_source = None
+    else:
+        metric_column = str(baseline_config["n_steps"])
+        metric_source = config_info["metric"]
+    outputs_name = (
+        "simulation_outputs" if reducer_specs is None else "simulation_metrics"
+    )
+    if (
+        saltelli_sampler
+        and config_info.get("trajectory_indices", False)
+        and reducer_specs is not None
+    ):
+        raise ValueError(
+            "trajectory_indices requires share trajectories: remove reducers from the config"
         )
-        return pd.DataFrame(pars)
-    except Exception as e:
-        raise RuntimeError(" Sobol sampling failed ") from e
+    return reducer_specs, metric_column, metric_source, outputs_name
 
 
-def si_to_dataframes(
-    si_matrix: np.array, param_names: List[str], calc_second_order: bool = False
+def analyze_outputs(
+    config_info: dict,
+    sampler: Sampler,
+    parameter_samples_df: pd.DataFrame,
+    dataset_dir: Path,
+    output_dir: Path,
 ):
-    """Convert SALib sobol Si matrix and parameter names into dfs."""
-    n = len(param_names)
+    """writes the analyses of a finished run: sobol indices of every share (with trajectory_indices) and the
+    sampler's analysis of the metric; with csv output, also combines the results in dataset_dir into one csv
+    (and removes dataset_dir)
+    Args:
+        config_info: sensitivity analysis configuration
+        sampler: sampler that drew parameter_samples_df
+        parameter_samples_df: parameter samples of every instance, in sample order
+        dataset_dir: directory of partitions (see write_partition) holding every instance's results
+        output_dir: directory to which results are written
+    Returns:
+        None
+    """
+    baseline_config = yaml_to_dict(config_info["baseline_model_config"])
+    system_type = config_info.get("system_type", "nestedlogit")
+    saltelli_sampler = isinstance(sampler, SaltelliSampler)
+    _, metric_column, metric_source, outputs_name = output_settings(
+        config_info, baseline_config, saltelli_sampler
+    )
+    parameter_names = list(parameter_samples_df.columns)
+
+    metric = read_metric(dataset_dir, metric_column, metric_source)
+    if saltelli_sampler and config_info.get("trajectory_indices", False):
+        # sobol indices for every energy source at every timestep, not only the metric
+        iam = IAM.create(system_type, baseline_config)
+        shares = (
+            read_partitions(dataset_dir)
+            .drop(columns=["energy_source", "iteration"])
+            .to_numpy()
+            .reshape(len(parameter_samples_df), len(iam.energy_sources), -1)
+        )
+        trajectory_df, trajectory_s2_df = indices_to_dataframes(
+            sobol_indices(
+                shares, len(parameter_names), config_info["calc_second_order"]
+            ),
+            parameter_names,
+            iam.energy_sources,
+            iam.years,
+        )
+        trajectory_df.to_csv(
+            output_dir / Path("sobol_trajectory_indices.csv"), index=False
+        )
+        if config_info["calc_second_order"]:
+            trajectory_s2_df.to_csv(
+                output_dir / Path("sobol_trajectory_s2.csv"), index=False
+            )
+    # additional analysis, as supported by the sampler's design (e.g., sobol indices for saltelli samples)
+    for results_name, results_df in sampler.analyze(
+        parameter_samples_df, metric
+    ).items():
+        results_df.to_csv(output_dir / Path(f"{results_name}.csv"), index=False)
+
+    if config_info.get("output_format", "csv").lower() != "parquet":
+        # assemble simulation outputs/results; the partitions are removed only once every analysis is written
+        read_partitions(dataset_dir).to_csv(
+            output_dir / Path(f"{outputs_name}.csv"), index=False
+        )
+        shutil.rmtree(dataset_dir)
+
 
-    # first-order saltelli indices and confidence outputs
-    s1_df = pd.DataFrame(
-        {"S1": si_matrix["S1"], "S1_conf": si_matrix.get("S1_conf", [np.nan] * n)},
-        index=param_names,
+def results_dir(config_info: dict, output_dir: Path, outputs_name: str) -> Path:
+    """directory of partitions holding the results of every instance: with parquet output, the partitions
+    are the output, so memory use does not grow with num_samples; with csv output, they are kept under
+    checkpoint until they are combined into one csv at the end"""
+    parquet_output = config_info.get("output_format", "csv").lower() == "parquet"
+    return (output_dir if parquet_output else output_dir / Path("checkpoint")) / Path(
+        f"{outputs_name}.parquet"
     )
-    s1_df.index.name = "parameter"
-    s1_df.reset_index(inplace=True)
 
-    # total-order indices and confidence outputs
-    s_total_df = pd.DataFrame(
-        {"ST": si_matrix["ST"], "ST_conf": si_matrix.get("ST_conf", [np.nan] * n)},
-        index=param_names,
+
+def _check_run_options(
+    config_info: dict,
+    adaptive: Optional[dict],
+    resume: bool,
+    sample_only: bool,
+    shard: Optional[Tuple[int, int]],
+):
+    """raises a ValueError for command-line options that cannot be combined, or for an adaptive design
+    whose num_samples cannot be doubled into a saltelli design"""
+    if adaptive is not None and config_info["num_samples"] & (
+        config_info["num_samples"] - 1
+    ):
+        raise ValueError(
+            f"adaptive analysis doubles num_samples, which must be a power of 2, not "
+            f"{config_info['num_samples']}"
+        )
+    if resume and sample_only:
+        raise ValueError(
+            "--sample-only draws new samples: it cannot be combined with --resume"
+        )
+    if shard is not None and (resume or sample_only or adaptive is not None):
+        raise ValueError(
+            "--shard runs a slice of saved samples: it cannot be combined with --resume, --sample-only "
+            "or an adaptive design"
+        )
+
+
+def _prepare_samples(
+    config_info: dict,
+    sampler: Sampler,
+    output_dir: Path,
+    *,
+    resume: bool,
+    shard: Optional[Tuple[int, int]],
+) -> Tuple[pd.DataFrame, Optional[int]]:
+    """draws and checkpoints the parameter samples of a new run, or reads those of the run being resumed
+    (or sharded)
+    Args:
+        config_info: sensitivity analysis configuration
+        sampler: sampler of the parameters in pars_to_vary
+        output_dir: output directory of the run
+        resume: whether to read the samples and chunk size of an interrupted run
+        shard: (shard, number of shards) if only a shard of saved samples is to be run
+    Returns:
+        parameter samples, and the instances per chunk (None for a shard, which chunks its own slice)
+    """
+    # samples and chunking are checkpointed before any instance runs; each finished chunk's results are
+    # saved as a parquet partition, so that --resume only runs chunks without one and an interruption loses
+    # at most chunk_size instances per worker (DEFAULT_CHUNK_SIZE by default, however large the design)
+    checkpoint_dir = output_dir / Path("checkpoint")
+    parameter_names = sampler.problem_definition["names"]
+    if shard is not None:
+        parameter_samples_df, _ = load_checkpoint(
+            checkpoint_dir, parameter_names, checkpoint_options(config_info)
+        )
+        return parameter_samples_df, None
+    if resume:
+        logging.info(" Resuming from checkpoint in %s", checkpoint_dir)
+        run_options = checkpoint_options(config_info)
+        if "chunk_size" in config_info:
+            run_options["chunk_size"] = config_info["chunk_size"]
+        return load_checkpoint(checkpoint_dir, parameter_names, run_options)
+
+    parameter_samples_df = sampler.sample(config_info["num_samples"])
+
+    # label parameter columns in  dataframe
+    parameter_samples_df.columns = parameter_names
+    chunk_size = config_info.get(
+        "chunk_size",
+        default_chunk_size(
+            len(parameter_samples_df), config_info.get("num_workers", 1)
+        ),
+    )
+    save_checkpoint(
+        checkpoint_dir,
+        parameter_samples_df,
+        chunk_size,
+        checkpoint_options(config_info),
+    )
+    write_parameters(
+        parameter_samples_df,
+        output_dir,
+        config_info.get("output_format", "csv").lower() == "parquet",
+    )
+    # shards of earlier samples would not match these
+    shutil.rmtree(output_dir / Path("shards"), ignore_errors=True)
+    return parameter_samples_df, chunk_size
+
+
+def _run_paths(
+    config_info: dict,
+    output_dir: Path,
+    outputs_name: str,
+    *,
+    resume: bool,
+    shard: Optional[Tuple[int, int]],
+) -> Tuple[Path, Path]:
+    """directory of the run's result partitions, emptied of a previous run's unless they are to be kept,
+    and the telemetry file its progress is appended to"""
+    # a shard keeps its partitions in its own directory, and always skips the chunks it has finished
+    if shard is not None:
+        dataset_dir = shard_dir(output_dir, *shard)
+    else:
+        dataset_dir = results_dir(config_info, output_dir, outputs_name)
+    os.makedirs(dataset_dir, exist_ok=True)
+    if not resume and shard is None:
+        for stale_partition in dataset_dir.glob("part-*.parquet"):
+            stale_partition.unlink()
+
+    # progress of every round (and of each shard, in its own file) is appended as json lines
+    telemetry_path = output_dir / Path("telemetry.jsonl")
+    if shard is not None:
+        telemetry_path = output_dir / Path(
+            f"telemetry-shard-{shard[0]}-of-{shard[1]}.jsonl"
+        )
+    return dataset_dir, telemetry_path
+
+
+def _shard_bounds(
+    config_info: dict, shard: Tuple[int, int], num_instances: int
+) -> Tuple[List[int], int]:
+    """first and last instance of a shard of num_instances saved samples, and the instances per chunk
+    within it"""
+    boundaries = list(shard_range(*shard, num_instances))
+    chunk_size = config_info.get(
+        "chunk_size",
+        default_chunk_size(
+            boundaries[1] - boundaries[0], config_info.get("num_workers", 1)
+        ),
+    )
+    logging.info(
+        " Shard %s of %s: instances %s to %s", *shard, boundaries[0], boundaries[1]
+    )
+    return boundaries, chunk_size
+
+
+def _run_missing_chunks(
+    run_settings: dict,
+    boundaries: List[int],
+    chunk_size: int,
+    num_workers: int,
+    telemetry_path: Path,
+):
+    """runs the chunks of run_settings["parameter_samples_df"] within boundaries (see chunk_ranges) whose
+    results are not already saved in run_settings["dataset_dir"]"""
+    logging.info(
+        "There are a total of %s instances to run.",
+        len(run_settings["parameter_samples_df"]),
     )
-    s_total_df.index.name = "parameter"
-    s_total_df.reset_index(inplace=True)
 
-    if calc_second_order:
-        # Second-order indices
-        s2_flat = si_matrix.get("S2", None)
+    # dispatch contiguous ranges of instances to worker processes (or run them here in turn),
+    # skipping chunks whose results are already saved
+    chunks = [
+        chunk
+        for chunk in chunk_ranges(boundaries, chunk_size)
+        if not partition_path(run_settings["dataset_dir"], chunk[0]).exists()
+    ]
+    logging.info(
+        " Running %s chunks of up to %s instances on %s workers",
+        len(chunks),
+        chunk_size,
+        num_workers,
+    )
+    run_chunks(run_settings, chunks, num_workers, telemetry_path)
+
+
+def _run_adaptive(
+    config_info: dict,
+    sampler: Sampler,
+    run_settings: dict,
+    *,
+    chunk_size: int,
+    telemetry_path: Path,
+    metric: Tuple[str, Optional[str]],
+    output_dir: Path,
+) -> pd.DataFrame:
+    """runs a saltelli design starting from num_samples, doubling it (keeping every run) until all S1 and
+    ST confidence intervals of the metric are narrower than the tolerance, and writes the widths of every
+    round to sobol_convergence.csv
+    Args:
+        config_info: sensitivity analysis configuration, with its adaptive settings
+        sampler: saltelli sampler of the parameters in pars_to_vary
+        run_settings: settings of the run (see _init_worker), with the samples drawn so far
+        chunk_size: instances per chunk
+        telemetry_path: file the progress of every round is appended to
+        metric: column (and energy source) of the metric in the results
+        output_dir: output directory of the run
+    Returns:
+        parameter samples of the final design
+    """
+    adaptive = config_info["adaptive"]
+    parameter_samples_df = run_settings["parameter_samples_df"]
+    instances_per_sample = (
+        2 * len(config_info["pars_to_vary"]) + 2
+        if config_info.get("calc_second_order")
+        else len(config_info["pars_to_vary"]) + 2
+    )
 
-        if s2_flat is None:
-            s2_df = pd.DataFrame(np.nan, index=param_names, columns=param_names)
+    # a resumed run continues from the last design it checkpointed
+    num_samples = config_info["num_samples"]
+    boundaries = [0, instances_per_sample * num_samples]
+    while boundaries[-1] < len(parameter_samples_df):
+        num_samples *= 2
+        boundaries.append(instances_per_sample * num_samples)
+    convergence = []
+    while True:
+        run_settings["parameter_samples_df"] = parameter_samples_df
+        _run_missing_chunks(
+            run_settings,
+            boundaries,
+            chunk_size,
+            config_info.get("num_workers", 1),
+            telemetry_path,
+        )
 
-        else:
-            s2_df = pd.DataFrame(s2_flat, index=param_names, columns=param_names)
-            s2_df.fillna(0, inplace=True)
+        si = sobol.analyze(
+            sampler.problem_definition,
+            read_metric(run_settings["dataset_dir"], *metric),
+            calc_second_order=config_info["calc_second_order"],
+        )
+        s1_width, st_width = sobol_ci_widths(si)
+        converged = max(s1_width, st_width) < adaptive["tolerance"]
+        convergence.append(
+            {
+                "num_samples": num_samples,
+                "num_instances": len(parameter_samples_df),
+                "max_s1_ci_width": s1_width,
+                "max_st_ci_width": st_width,
+                "converged": converged,
+            }
+        )
+        logging.info(
+            " N = %s: widest S1 and ST confidence intervals %s and %s",
+            num_samples,
+            s1_width,
+            st_width,
+        )
+        if converged or 2 * num_samples > adaptive.get("max_samples", 32768):
+            break
+
+        # extend the design with the samples that complete the next power of 2
+        num_samples *= 2
+        new_samples_df = sampler.sample(num_samples).iloc[len(parameter_samples_df) :]
+        new_samples_df.columns = sampler.problem_definition["names"]
+        parameter_samples_df = pd.concat([parameter_samples_df, new_samples_df])
+        boundaries.append(len(parameter_samples_df))
+        save_checkpoint(
+            output_dir / Path("checkpoint"),
+            parameter_samples_df,
+            chunk_size,
+            checkpoint_options(config_info),
+        )
+        write_parameters(
+            parameter_samples_df,
+            output_dir,
+            config_info.get("output_format", "csv").lower() == "parquet",
+        )
 
-        s2_df.index.name = "parameter"
-        s2_df.reset_index(inplace=True)
-        return s1_df, s_total_df, s2_df
-    return s1_df, s_total_df, pd.DataFrame()
+    if not converged:
+        logging.warning(
+            " Stopped at max_samples = %s before reaching tolerance %s",
+            num_samples,
+            adaptive["tolerance"],
+        )
+    pd.DataFrame(convergence).to_csv(
+        output_dir / Path("sobol_convergence.csv"), index=False
+    )
+    return parameter_samples_df
+
+
+def _write_results(
+    config_info: dict,
+    sampler: Sampler,
+    parameter_samples_df: pd.DataFrame,
+    dataset_dir: Path,
+    output_dir: Path,
+    *,
+    shard: Optional[Tuple[int, int]],
+    boundaries: List[int],
+    chunk_size: int,
+):
+    """records a finished shard for merge_shards.py, or writes the outputs and analyses of a whole run
+    (see analyze_outputs)"""
+    if shard is None:
+        analyze_outputs(
+            config_info, sampler, parameter_samples_df, dataset_dir, output_dir
+        )
+        return
+
+    # record the finished shard (under a temporary name, renamed once written)
+    temporary_path = dataset_dir.parent / f"tmp-{dataset_dir.name}.yml"
+    dict_to_yaml(
+        {
+            "shard": shard[0],
+            "num_shards": shard[1],
+            "first_instance": boundaries[0],
+            "last_instance": boundaries[1],
+            "chunk_size": chunk_size,
+        },
+        temporary_path,
+    )
+    os.replace(temporary_path, dataset_dir.with_suffix(".yml"))
 
 
 @click.command()
@@ -150,7 +831,30 @@ def si_to_dataframes(
     type=click.Path(exists=True, file_okay=True, dir_okay=False),
     required=True,
 )
-def sensitivity(config: str):
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="continue an interrupted run in output_dir, simulating only instances without saved results",
+)
+@click.option(
+    "--sample-only",
+    is_flag=True,
+    default=False,
+    help="draw and save the parameter samples without running any instance (before --shard runs)",
+)
+@click.option(
+    "--shard",
+    default=None,
+    callback=parse_shard,
+    help="i/N: run only shard i (from 0) of N contiguous slices of the saved samples; see merge_shards.py",
+)
+def sensitivity(
+    config: str,
+    resume: bool,
+    sample_only: bool,
+    shard: Optional[Tuple[int, int]],
+):
     """Implements model sensitivity analysis for the mini IAM"""
 
     # get configuration for sensitivity analysis
@@ -162,96 +866,88 @@ def sensitivity(config: str):
         output_dir = Path(config_info["output_dir"])
     os.makedirs(output_dir, exist_ok=True)
 
-    if config_info["sampler"].lower() == "saltelli":
-        logging.info(" Generating Saltelli Sobol parameter samples")
-
-        # define problem
-        problem_definition = {
+    # define problem, and the sampler of its parameters
+    sampler = Sampler.create(
+        config_info["sampler"].lower(),
+        {
             "num_vars": len(config_info["pars_to_vary"]),
             "names": [p["name"] for p in config_info["pars_to_vary"]],
             "bounds": [p["bounds"] for p in config_info["pars_to_vary"]],
-        }
-        parameter_samples_df = saltelli_sample(
-            config_info["num_samples"],
-            problem_definition,
-            config_info["calc_second_order"],
-        )
-    else:  # elif config_info["sampler"].lower() == "lhs":
-        logging.info(" Generating Latin hypercube parameter samples")
-        parameter_samples_df = lhs(
-            config_info["num_samples"],
-            [p["bounds"] for p in config_info["pars_to_vary"]],
-        )
-
-    # label parameter columns in  dataframe
-    parameter_names = [p["name"] for p in config_info["pars_to_vary"]]
-    parameter_samples_df.columns = parameter_names
+        },
+        config_info,
+    )
+    saltelli_sampler = isinstance(sampler, SaltelliSampler)
 
-    # read baseline configuration for running the model
-    baseline_config = yaml_to_dict(config_info["baseline_model_config"])
+    # optional adaptive sobol analysis: starting from num_samples, double the design (keeping every run)
+    # until all S1 and ST confidence intervals are narrower than the tolerance
+    adaptive = config_info.get("adaptive") if saltelli_sampler else None
+    _check_run_options(config_info, adaptive, resume, sample_only, shard)
 
-    # initialize list for storing outputs
-    dflist = []
-    logging.info("There are a total of %s instances to run.", len(parameter_samples_df))
-
-    # iterate through instances
-    for which_instance, instance_parameter_values in parameter_samples_df.iterrows():
-        if which_instance % 1000 == 0:
-            logging.info(
-                "completed %s instances of %s",
-                which_instance,
-                len(parameter_samples_df),
-            )
-        instance_config = baseline_config.copy()
-        update_parameters(
-            instance_config,
-            config_info["pars_to_vary"],
-            instance_parameter_values,
+    parameter_samples_df, chunk_size = _prepare_samples(
+        config_info, sampler, output_dir, resume=resume, shard=shard
+    )
+    if sample_only:
+        logging.info(
+            " Saved %s parameter samples to %s",
+            len(parameter_samples_df),
+            output_dir / Path("checkpoint"),
         )
+        return
 
-        # instantiate IAM with this config set
-        iam = NestedLogitIAM(instance_config)
-
-        # simulate
-        instance_df = iam.simulate(True)
-        instance_df["iteration"] = which_instance
-
-        dflist.append(instance_df.copy())
-
-    # assemble simulation outputs/results
-    df = pd.concat(dflist)
-    df.index.name = "energy_source"
-    df.reset_index(inplace=True)
-
-    # write out paramters and un-processed results file
-    parameter_samples_df.to_csv(
-        output_dir / Path("simulation_parameters.csv"), index=False
+    # read baseline configuration for running the model
+    baseline_config = yaml_to_dict(config_info["baseline_model_config"])
+    reducer_specs, metric_column, metric_source, outputs_name = output_settings(
+        config_info, baseline_config, saltelli_sampler
     )
-    df.to_csv(output_dir / Path("simulation_outputs.csv"), index=False)
-
-    # additional analysis
-    if config_info["sampler"] == "saltelli":
-        metric = list(
-            df.loc[
-                df["energy_source"] == config_info["metric"], baseline_config["n_steps"]
-            ]
+    dataset_dir, telemetry_path = _run_paths(
+        config_info, output_dir, outputs_name, resume=resume, shard=shard
+    )
+    run_settings = {
+        "baseline_config": baseline_config,
+        "pars_to_vary": config_info["pars_to_vary"],
+        "system_type": config_info.get("system_type", "nestedlogit"),
+        "reducer_specs": reducer_specs,
+        "batch_size": config_info.get("batch_size"),
+        "dataset_dir": dataset_dir,
+        "row_group_size": config_info.get("row_group_size", 100000),
+        "parameter_samples_df": parameter_samples_df,
+    }
+
+    # samples are run in rounds: one for a fixed design, one per doubling for an adaptive design
+    boundaries = [0, len(parameter_samples_df)]
+    if shard is not None:
+        boundaries, chunk_size = _shard_bounds(
+            config_info, shard, len(parameter_samples_df)
         )
-        # run sobol sensitivity analysis
-        si = sobol.analyze(
-            problem_definition,
-            np.array(metric),
-            calc_second_order=config_info["calc_second_order"],
+    if adaptive is not None:
+        parameter_samples_df = _run_adaptive(
+            config_info,
+            sampler,
+            run_settings,
+            chunk_size=chunk_size,
+            telemetry_path=telemetry_path,
+            metric=(metric_column, metric_source),
+            output_dir=output_dir,
         )
-
-        s_first_order_df, s_total_df, s_second_order_df = si_to_dataframes(
-            si,
-            [p["name"] for p in config_info["pars_to_vary"]],
-            config_info["calc_second_order"],
+    else:
+        _run_missing_chunks(
+            run_settings,
+            boundaries,
+            chunk_size,
+            config_info.get("num_workers", 1),
+            telemetry_path,
         )
-        s_first_order_df.to_csv(output_dir / Path("s1_results.csv"), index=False)
-        s_total_df.to_csv(output_dir / Path("s_total_results.csv"), index=False)
-        if s_second_order_df is not None:
-            s_second_order_df.to_csv(output_dir / Path("s2_results.csv"), index=False)
+
+    _write_results(
+        config_info,
+        sampler,
+        parameter_samples_df,
+        dataset_dir,
+        output_dir,
+        shard=shard,
+        boundaries=boundaries,
+        chunk_size=chunk_size,
+    )
 
 
 if __name__ == "__main__":
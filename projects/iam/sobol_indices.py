@@ -0,0 +1,178 @@
+"""Sobol sensitivity indices of many model outputs at once (e.g., every energy source's share at every
+timestep), from one Saltelli design
+
+Uses the same estimators as SALib's sobol.analyze (Saltelli et al., 2010, for first and total order;
+Saltelli, 2002, for second order) and the same bootstrap, but for an (n_evals, ...) array of outputs in one
+pass: every estimator is a mean over samples, so each bootstrap resample is a row of resample counts and all
+resamples of all outputs are one matrix product.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+
+def _resample_counts(
+    n_samples: int, num_resamples: int, seed: Optional[int] = None
+) -> np.ndarray:
+    """(num_resamples, n_samples) number of times each base sample is drawn in each bootstrap resample;
+    drawn as SALib draws its resample indices, so that a seed gives SALib's confidence intervals
+    """
+    resamples = np.random.default_rng(seed).integers(
+        n_samples, size=(n_samples, num_resamples)
+    )
+    return np.bincount(
+        (resamples + n_samples * np.arange(num_resamples)).ravel(),
+        minlength=n_samples * num_resamples,
+    ).reshape(num_resamples, n_samples)
+
+
+def _bootstrap_estimates(
+    blocks: np.ndarray,
+    num_vars: int,
+    weights: np.ndarray,
+    varies: np.ndarray,
+    calc_second_order: bool,
+) -> dict:
+    """Sobol indices of every output, for the full sample and each bootstrap resample
+    Args:
+        blocks: (n_samples, n_evals_per_sample, n_outputs) standardized outputs of each base sample, in
+            design order: A, AB_1..AB_D, (BA_1..BA_D,) B
+        num_vars: number of parameters in the design
+        weights: (num_resamples+1, n_samples) number of times each base sample is drawn in the full sample
+            (row 0, all ones) and in each resample (rows 1...)
+        varies: (n_outputs,) whether each output varies
+        calc_second_order: whether the design includes second-order indices
+    Returns:
+        dictionary with 'S1' and 'ST', each (num_resamples+1, num_vars, n_outputs); with
+        calc_second_order, also 'S2', (num_resamples+1, num_vars, num_vars, n_outputs)
+    """
+    n_samples = blocks.shape[0]
+    a = blocks[:, 0]
+    b = blocks[:, -1]
+    ab = blocks[:, 1 : num_vars + 1]
+
+    def mean(values: np.ndarray) -> np.ndarray:
+        """means over base samples for the full sample (row 0) and each resample (rows 1...)"""
+        return np.tensordot(weights, values, axes=1) / n_samples
+
+    # variance of the pooled A and B outputs
+    y_var = (mean(a**2) + mean(b**2)) / 2 - ((mean(a) + mean(b)) / 2) ** 2
+    y_var = np.where(varies & (y_var > np.finfo(float).eps), y_var, np.inf)
+
+    estimates = {
+        "S1": mean(b[:, np.newaxis] * (ab - a[:, np.newaxis])) / y_var[:, np.newaxis],
+        "ST": 0.5 * mean((a[:, np.newaxis] - ab) ** 2) / y_var[:, np.newaxis],
+    }
+    if calc_second_order:
+        s1 = estimates["S1"]
+        ba = blocks[:, num_vars + 1 : 2 * num_vars + 1]
+        s2 = np.full((len(weights), num_vars, num_vars) + s1.shape[2:], np.nan)
+        for j in range(num_vars - 1):
+            v_jk = (
+                mean(ba[:, j, np.newaxis] * ab[:, j + 1 :] - (a * b)[:, np.newaxis])
+                / y_var[:, np.newaxis]
+            )
+            s2[:, j, j + 1 :] = v_jk - s1[:, j, np.newaxis] - s1[:, j + 1 :]
+        estimates["S2"] = s2
+    return estimates
+
+
+def sobol_indices(
+    outputs: np.ndarray,
+    num_vars: int,
+    calc_second_order: bool = False,
+    *,
+    num_resamples: int = 100,
+    conf_level: float = 0.95,
+    seed: Optional[int] = None,
+) -> dict:
+    """first-, total- (and optionally second-) order Sobol indices of every output
+    Args:
+        outputs: (n_evals, ...) model outputs for the rows of a Saltelli design (see saltelli_sample)
+        num_vars: number of parameters in the design
+        calc_second_order: whether the design (and analysis) includes second-order indices
+        num_resamples: number of bootstrap resamples for the confidence intervals
+        conf_level: confidence level of the intervals
+        seed: seed for the bootstrap resampling
+    Returns:
+        dictionary with 'S1', 'S1_conf', 'ST', 'ST_conf', each (num_vars, ...); with calc_second_order,
+        also 'S2' and 'S2_conf', each (num_vars, num_vars, ...) with NaN on and below the diagonal.
+        Indices of outputs that do not vary are 0
+    """
+    outputs = np.asarray(outputs, dtype=float)
+    step = 2 * num_vars + 2 if calc_second_order else num_vars + 2
+    if len(outputs) % step:
+        raise ValueError(
+            f"{len(outputs)} outputs is not a multiple of the {step} evaluations per base sample"
+        )
+    n_samples = len(outputs) // step
+    output_shape = outputs.shape[1:]
+
+    # standardize each output, as SALib does; outputs that do not vary are left at 0
+    std = outputs.std(axis=0)
+    varies = std > np.finfo(float).eps
+    outputs = (outputs - outputs.mean(axis=0)) / np.where(varies, std, 1)
+
+    # outputs flattened to one axis, by base sample and row of the design
+    estimates = _bootstrap_estimates(
+        outputs.reshape(n_samples, step, -1),
+        num_vars,
+        np.vstack(
+            [np.ones(n_samples), _resample_counts(n_samples, num_resamples, seed)]
+        ),
+        varies.ravel(),
+        calc_second_order,
+    )
+
+    z = norm.ppf(0.5 + conf_level / 2)
+    indices = {}
+    for name, values in estimates.items():
+        shape = values.shape[1:-1] + output_shape
+        indices[name] = values[0].reshape(shape)
+        indices[f"{name}_conf"] = (z * values[1:].std(axis=0, ddof=1)).reshape(shape)
+    return indices
+
+
+def indices_to_dataframes(
+    indices: dict,
+    parameter_names: List[str],
+    energy_sources: List[str],
+    years: List[int],
+):
+    """reshapes sobol_indices of (n_evals, n_sources, n_steps+1) shares to long-format dataframes
+    Args:
+        indices: from sobol_indices
+        parameter_names: names of the parameters, in design order
+        energy_sources: names of the energy sources, in model order
+        years: year of each timestep (e.g., IAM.years)
+    Returns:
+        first- and total-order dataframe with columns parameter, energy_source, year, S1, S1_conf, ST,
+        ST_conf; and second-order dataframe with columns parameter_1, parameter_2, energy_source, year, S2,
+        S2_conf (empty without second-order indices)
+    """
+    index = pd.MultiIndex.from_product(
+        [parameter_names, energy_sources, years],
+        names=["parameter", "energy_source", "year"],
+    )
+    first_total_df = pd.DataFrame(
+        {name: indices[name].ravel() for name in ["S1", "S1_conf", "ST", "ST_conf"]},
+        index=index,
+    ).reset_index()
+    if "S2" not in indices:
+        return first_total_df, pd.DataFrame()
+
+    index = pd.MultiIndex.from_product(
+        [parameter_names, parameter_names, energy_sources, years],
+        names=["parameter_1", "parameter_2", "energy_source", "year"],
+    )
+    second_order_df = (
+        pd.DataFrame(
+            {name: indices[name].ravel() for name in ["S2", "S2_conf"]}, index=index
+        )
+        .dropna(subset=["S2"])
+        .reset_index()
+    )
+    return first_total_df, second_order_df
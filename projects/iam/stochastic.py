@@ -0,0 +1,129 @@
+"""Stochastic carbon-price paths around a model's configured price, simulated together as one batch
+
+Each path deviates from the configured price (usd_per_tco2 or price_curve) by a mean-reverting
+(Ornstein-Uhlenbeck) process, optionally with jumps (e.g., policy rollbacks or tightening) arriving at
+random; the starting price is known, and prices are floored at zero. Configure with a stochastic_price
+entry in the model config, e.g.
+
+stochastic_price:
+  n_paths: 10000
+  mean_reversion_per_yr: 0.3
+  volatility_usd_per_sqrt_yr: 15
+  jump_rate_per_yr: 0.05
+  jump_mean_usd: -40
+  jump_std_usd: 20
+  seed: 0
+"""
+
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from projects.iam.eslim import IAM
+from utils.io import yaml_to_dict
+
+
+def mean_reverting_price_paths(
+    usd_per_tco2: np.ndarray,
+    timestep_yr: float,
+    n_paths: int,
+    *,
+    mean_reversion_per_yr: float = 0.3,
+    volatility_usd_per_sqrt_yr: float = 10.0,
+    jump_rate_per_yr: float = 0.0,
+    jump_mean_usd: float = 0.0,
+    jump_std_usd: float = 0.0,
+    seed: Optional[int] = None,
+) -> np.ndarray:
+    """draws carbon-price paths that revert toward a deterministic price
+    Args:
+        usd_per_tco2: (n_steps+1,) deterministic carbon price at each timestep
+        timestep_yr: years per timestep
+        n_paths: number of paths to draw
+        mean_reversion_per_yr: rate at which deviations from usd_per_tco2 decay (0 for a random walk)
+        volatility_usd_per_sqrt_yr: standard deviation of the diffusion, USD/tCO2 per sqrt(year)
+        jump_rate_per_yr: expected number of jumps per year
+        jump_mean_usd: mean size of a jump (USD/tCO2); its effect decays like any other deviation
+        jump_std_usd: standard deviation of jump size (USD/tCO2)
+        seed: seed for the random number generator
+    Returns:
+        (n_paths, n_steps+1) carbon price along each path
+    """
+    rng = np.random.default_rng(seed)
+    usd_per_tco2 = np.asarray(usd_per_tco2, dtype=float)
+    n_steps = len(usd_per_tco2) - 1
+
+    # exact discretization of the Ornstein-Uhlenbeck deviation over one timestep
+    decay = np.exp(-mean_reversion_per_yr * timestep_yr)
+    if mean_reversion_per_yr > 0:
+        step_variance = -np.expm1(-2 * mean_reversion_per_yr * timestep_yr) / (
+            2 * mean_reversion_per_yr
+        )
+    else:
+        step_variance = timestep_yr
+    step_std = volatility_usd_per_sqrt_yr * np.sqrt(step_variance)
+
+    deviation = np.zeros((n_paths, n_steps + 1))
+    for step in range(1, n_steps + 1):
+        n_jumps = rng.poisson(jump_rate_per_yr * timestep_yr, n_paths)
+        jumps = n_jumps * jump_mean_usd + np.sqrt(n_jumps) * jump_std_usd * (
+            rng.standard_normal(n_paths)
+        )
+        deviation[:, step] = (
+            decay * deviation[:, step - 1]
+            + step_std * rng.standard_normal(n_paths)
+            + jumps
+        )
+    return np.maximum(usd_per_tco2 + deviation, 0)
+
+
+def share_quantiles(
+    shares: np.ndarray,
+    quantiles: Sequence[float],
+    energy_sources: List[str],
+    years: List[int],
+) -> pd.DataFrame:
+    """per-timestep quantiles of shares across a batch of scenarios
+    Args:
+        shares: (n_samples, n_steps+1, n_sources) shares
+        quantiles: quantiles to compute, in [0, 1]
+        energy_sources: names of the energy sources, in model order
+        years: year of each timestep (e.g., IAM.years)
+    Returns:
+        dataframe with columns quantile, year, energy_source, share
+    """
+    index = pd.MultiIndex.from_product(
+        [list(quantiles), years, energy_sources],
+        names=["quantile", "year", "energy_source"],
+    )
+    return pd.DataFrame(
+        {"share": np.quantile(shares, quantiles, axis=0).ravel()}, index=index
+    ).reset_index()
+
+
+def simulate_price_paths(
+    config_info: Union[str, dict],
+    system_type: str = "nestedlogit",
+    quantiles: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95),
+):
+    """simulates the model once per stochastic carbon-price path, all paths in one batched run
+    Args:
+        config_info: model configuration (path to yaml or dict) with a stochastic_price entry holding
+            n_paths and any other arguments of mean_reverting_price_paths
+        system_type: name under which the model class is registered with IAM
+        quantiles: share quantiles to report
+    Returns:
+        paths: (n_paths, n_steps+1) carbon price along each path
+        share_quantiles_df: share quantiles across paths (see share_quantiles)
+    """
+    if isinstance(config_info, str):
+        config_info = yaml_to_dict(config_info)
+    iam = IAM.create(system_type, config_info)
+    paths = mean_reverting_price_paths(
+        iam.usd_per_tco2, iam.timestep_yr, **config_info["stochastic_price"]
+    )
+    iam.apply_price_paths(paths)
+    return paths, share_quantiles(
+        iam.simulate(True), quantiles, iam.energy_sources, iam.years
+    )
@@ -0,0 +1,165 @@
+"""Progress and throughput telemetry for runs of many model instances (e.g., sensitivity.py)
+
+Each chunk of instances is timed by phase (config_build: writing its parameter values into a model config
+or plan; model_construction: building models; simulation; result_collection: assembling and writing
+results), and reports its peak memory. As chunks finish, a ProgressReport logs throughput, time per phase,
+memory, and the estimated time remaining, and appends the same report as one line of json to a file.
+"""
+
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+PHASES = ["config_build", "model_construction", "simulation", "result_collection"]
+
+
+def max_rss_mb() -> float:
+    """peak resident set size of this process, in MB"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS, kilobytes elsewhere
+    return max_rss / 2**20 if sys.platform == "darwin" else max_rss / 2**10
+
+
+class PhaseTimer:
+    """accumulates the wall-clock time spent in each phase of running instances"""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+
+    @contextmanager
+    def phase(self, name: str):
+        """times the enclosed block as part of phase name (one of PHASES)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+
+class ProgressReport:
+    """running totals of the chunks of one run, reported to the log and to a json lines file"""
+
+    def __init__(
+        self, num_instances: int, num_workers: int = 1, path: Optional[Path] = None
+    ):
+        """
+        Args:
+            num_instances: number of instances the run will simulate
+            num_workers: number of worker processes running chunks
+            path: optional json lines file to which each report is appended
+        """
+        self.num_instances = num_instances
+        self.num_workers = num_workers
+        self.path = path
+        self.instances_done = 0
+        self.chunks_done = 0
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self.peak_rss_mb = max_rss_mb()
+        self.start = time.perf_counter()
+        self.write({"event": "start", "num_workers": num_workers})
+
+    def write(self, record: dict):
+        """appends a record, with the time and the run's totals so far, to the json lines file"""
+        if self.path is None:
+            return
+        record = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            **record,
+            "instances_done": self.instances_done,
+            "num_instances": self.num_instances,
+            "elapsed_s": time.perf_counter() - self.start,
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def runs_per_second(self) -> float:
+        """instances finished per second of wall-clock time so far"""
+        elapsed = time.perf_counter() - self.start
+        return self.instances_done / elapsed if elapsed > 0 else 0.0
+
+    def update(self, chunk_stats: dict):
+        """adds a finished chunk to the totals, and reports progress
+        Args:
+            chunk_stats: from sensitivity._run_chunk: 'first_instance', 'last_instance', 'chunk_s'
+                (wall-clock seconds), 'phase_s' (seconds by phase), and 'max_rss_mb' and 'pid' of the
+                process that ran it
+        """
+        num_chunk_instances = (
+            chunk_stats["last_instance"] - chunk_stats["first_instance"]
+        )
+        self.instances_done += num_chunk_instances
+        self.chunks_done += 1
+        for name, seconds in chunk_stats["phase_s"].items():
+            self.phase_seconds[name] += seconds
+        self.peak_rss_mb = max(
+            self.peak_rss_mb, chunk_stats["max_rss_mb"], max_rss_mb()
+        )
+
+        runs_per_second = self.runs_per_second()
+        eta = (
+            (self.num_instances - self.instances_done) / runs_per_second
+            if runs_per_second > 0
+            else None
+        )
+        logging.info(
+            " Completed %s of %s instances: %.1f runs/s, ETA %s; %s; peak RSS %.0f MB",
+            self.instances_done,
+            self.num_instances,
+            runs_per_second,
+            "unknown" if eta is None else timedelta(seconds=round(eta)),
+            ", ".join(
+                f"{name} {seconds:.1f}s" for name, seconds in self.phase_seconds.items()
+            ),
+            self.peak_rss_mb,
+        )
+        self.write(
+            {
+                "event": "chunk",
+                **chunk_stats,
+                "chunk_runs_per_s": (
+                    num_chunk_instances / chunk_stats["chunk_s"]
+                    if chunk_stats["chunk_s"] > 0
+                    else None
+                ),
+                "runs_per_s": runs_per_second,
+                "eta_s": eta,
+                "peak_rss_mb": self.peak_rss_mb,
+            }
+        )
+
+    def finish(self):
+        """reports the run's throughput and the share of instance time spent in each phase"""
+        total_phase_seconds = sum(self.phase_seconds.values())
+        phase_fractions = {
+            name: seconds / total_phase_seconds if total_phase_seconds > 0 else 0.0
+            for name, seconds in self.phase_seconds.items()
+        }
+        logging.info(
+            " Ran %s instances in %s chunks at %.1f runs/s; time by phase: %s",
+            self.instances_done,
+            self.chunks_done,
+            self.runs_per_second(),
+            ", ".join(
+                f"{name} {100 * fraction:.0f}%"
+                for name, fraction in phase_fractions.items()
+            ),
+        )
+        self.write(
+            {
+                "event": "finish",
+                "num_workers": self.num_workers,
+                "chunks_done": self.chunks_done,
+                "runs_per_s": self.runs_per_second(),
+                "phase_s": self.phase_seconds,
+                "phase_fraction": phase_fractions,
+                "peak_rss_mb": self.peak_rss_mb,
+                "pid": os.getpid(),
+            }
+        )
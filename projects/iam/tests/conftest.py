@@ -0,0 +1,25 @@
+"""fixtures shared by the ESLiM tests"""
+
+from pathlib import Path
+
+import pytest
+
+from utils.io import yaml_to_dict
+
+
+@pytest.fixture
+def config_dir():
+    """directory of the example model and analysis configurations"""
+    return Path(__file__).parents[1] / "config"
+
+
+@pytest.fixture
+def baseline_config(config_dir):
+    """IEA/IPCC-default model configuration, read afresh for each test"""
+    return yaml_to_dict(config_dir / "eslim_baseline_config.yml")
+
+
+@pytest.fixture
+def pars_to_vary(config_dir):
+    """parameters varied in the sensitivity analysis config"""
+    return yaml_to_dict(config_dir / "sensitivity_config.yml")["pars_to_vary"]
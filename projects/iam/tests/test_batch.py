@@ -0,0 +1,109 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from projects.iam.batch import batch_to_dataframe, simulate_batch
+from projects.iam.eslim import IAM, NestedLogitIAM
+from projects.iam.samplers import lhs
+from projects.iam.sensitivity import update_parameters
+from utils.io import yaml_to_dict
+
+
+def test_batch_matches_scalar_reference(baseline_config, pars_to_vary):
+    samples_df = lhs(20, [p["bounds"] for p in pars_to_vary])
+    samples_df.columns = [p["name"] for p in pars_to_vary]
+
+    batch_shares = simulate_batch(baseline_config, pars_to_vary, samples_df.to_numpy())
+    assert batch_shares.shape == (20, baseline_config["n_steps"] + 1, 3)
+
+    for i, row in samples_df.iterrows():
+        instance_config = copy.deepcopy(baseline_config)
+        update_parameters(instance_config, pars_to_vary, row)
+        expected = NestedLogitIAM(instance_config).simulate(True)
+        np.testing.assert_allclose(batch_shares[i], expected.to_numpy().T, rtol=1e-10)
+
+
+def test_batch_to_dataframe_layout(baseline_config, pars_to_vary):
+    matrix = np.array([[p["bounds"][0] for p in pars_to_vary]] * 2)
+    df = batch_to_dataframe(
+        simulate_batch(baseline_config, pars_to_vary, matrix),
+        baseline_config["energy_sources"],
+        first_iteration=10,
+    )
+
+    assert list(df["iteration"]) == [10, 10, 10, 11, 11, 11]
+    pd.testing.assert_frame_equal(
+        df.loc[df["iteration"] == 11].drop(columns="iteration"),
+        df.loc[df["iteration"] == 10].drop(columns="iteration"),
+    )
+
+
+def test_logit_batch_matches_scalar(config_dir):
+    config = yaml_to_dict(config_dir / "eslim_config_logit.yml")
+    pars_to_vary = [
+        {"name": "exponent", "key_path": ["logit_exponent"]},
+        {"name": "co2_starting_price", "key_path": ["price_curve", "starting_price"]},
+    ]
+    matrix = np.array([[-2.0, 0.0], [-5.5, 25.0], [-9.0, 50.0]])
+
+    batch_shares = simulate_batch(config, pars_to_vary, matrix, system_type="logit")
+
+    for i, (exponent, starting_price) in enumerate(matrix):
+        instance_config = copy.deepcopy(config)
+        instance_config["logit_exponent"] = exponent
+        instance_config["price_curve"]["starting_price"] = starting_price
+        expected = IAM.create("logit", instance_config).simulate(True)
+        np.testing.assert_allclose(batch_shares[i], expected.to_numpy().T, rtol=1e-12)
+
+
+@pytest.mark.parametrize(
+    "config_name, system_type, pars",
+    [
+        ("eslim_baseline_config.yml", "nestedlogit", None),
+        (
+            "eslim_config_logit.yml",
+            "logit",
+            [
+                {
+                    "name": "exponent",
+                    "key_path": ["logit_exponent"],
+                    "bounds": [-9, -2],
+                },
+                {
+                    "name": "co2_starting_price",
+                    "key_path": ["price_curve", "starting_price"],
+                    "bounds": [0, 50],
+                },
+            ],
+        ),
+    ],
+)
+def test_reused_model_matches_model_built_from_config(
+    config_name, system_type, pars, pars_to_vary, config_dir
+):
+    config = yaml_to_dict(config_dir / config_name)
+    pars = pars or pars_to_vary
+    samples_df = lhs(5, [p["bounds"] for p in pars])
+    samples_df.columns = [p["name"] for p in pars]
+
+    iam = IAM.create(system_type, config)
+    plan = iam.compile_parameter_plan(pars)
+    for _, row in samples_df.iterrows():
+        iam.set_parameter_values(plan, row.to_numpy())
+        instance_config = copy.deepcopy(config)
+        update_parameters(instance_config, pars, row)
+        pd.testing.assert_frame_equal(
+            iam.simulate(True),
+            IAM.create(system_type, instance_config).simulate(True),
+            check_exact=True,
+        )
+    # samples never reach the config the model was built from
+    assert config == yaml_to_dict(config_dir / config_name)
+
+
+def test_parameter_plan_rejects_entries_not_held_in_arrays(baseline_config):
+    iam = IAM.create("nestedlogit", baseline_config)
+    with pytest.raises(ValueError):
+        iam.compile_parameter_plan([{"name": "steps", "key_path": ["n_steps"]}])
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from projects.iam.cache import ResultCache, config_hash
+from projects.iam.eslim import IAM
+from utils.io import yaml_to_dict
+
+
+@pytest.fixture
+def cached_config(tmp_path, config_dir):
+    config = yaml_to_dict(config_dir / "eslim_baseline_config.yml")
+    config["result_cache"] = {"directory": str(tmp_path / "cache")}
+    return config
+
+
+def test_repeated_scenario_is_read_from_cache(cached_config, monkeypatch):
+    first = IAM.create("nestedlogit", cached_config)
+    expected = first.simulate(True)
+    assert first.result_cache.misses == 1
+
+    # a second model with the same config never runs its share dynamics
+    second = IAM.create("nestedlogit", cached_config)
+    monkeypatch.setattr(
+        second, "_compute_new_shares", lambda: pytest.fail("not read from cache")
+    )
+    pd.testing.assert_frame_equal(second.simulate(True), expected)
+    assert second.result_cache.hits == 1
+    assert second.retirement_share == first.retirement_share
+
+
+def test_cache_key_covers_full_config(cached_config):
+    key = config_hash(cached_config, "NestedLogitIAM", "v")
+    changed = dict(cached_config, price_curve={"type": "line", "slope": 1})
+    assert config_hash(changed, "NestedLogitIAM", "v") != key
+    assert config_hash(cached_config, "LogitIAM", "v") != key
+    assert config_hash(cached_config, "NestedLogitIAM", "w") != key
+    # where results are cached does not change them
+    moved = dict(cached_config, result_cache={"directory": "elsewhere"})
+    assert config_hash(moved, "NestedLogitIAM", "v") == key
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(tmp_path, max_entries=2)
+    for key in ["a", "b"]:
+        cache.store(key, {"x": np.arange(10.0)})
+    cache.load("a")
+    cache.store("c", {"x": np.arange(10.0)})
+    assert sorted(p.stem for p in tmp_path.glob("*.npz")) == ["a", "c"]
+
+    ResultCache(tmp_path, max_size_mb=0).evict()
+    assert not list(tmp_path.glob("*.npz"))
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from projects.iam.batch import simulate_batch
+from projects.iam.calibration import calibrate, calibrated_config
+from projects.iam.eslim import IAM
+from utils.io import yaml_to_dict
+
+
+@pytest.fixture
+def pars_to_vary(config_dir):
+    pars = yaml_to_dict(config_dir / "calibration_config.yml")["pars_to_vary"]
+    return [p for p in pars if p["name"] != "fossil_subsector_logit_exponent"]
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_calibration_recovers_parameters(baseline_config, pars_to_vary, num_workers):
+    # synthetic observations from known parameter values
+    truth = np.array([80.0, 0.2, -4.0, 30.0])
+    iam = IAM.create("nestedlogit", baseline_config)
+    shares = simulate_batch(baseline_config, pars_to_vary, truth[np.newaxis])[0]
+    observed = pd.DataFrame(
+        [
+            {"year": year, "energy_source": source, "share": shares[step, column]}
+            for step, year in enumerate(iam.years)
+            for column, source in enumerate(iam.energy_sources)
+        ]
+    )
+
+    result = calibrate(
+        baseline_config,
+        pars_to_vary,
+        observed,
+        num_candidates=256,
+        num_restarts=2,
+        num_workers=num_workers,
+    )
+    assert len(result["restarts"]) == 2
+    assert result["loss"] < 1e-12
+    np.testing.assert_allclose(
+        [result["parameters"][p["name"]] for p in pars_to_vary], truth, rtol=1e-4
+    )
+
+    config = calibrated_config(baseline_config, pars_to_vary, result["parameters"])
+    assert config["price_curve"]["starting_price"] == pytest.approx(30.0, rel=1e-4)
+    assert baseline_config["price_curve"]["starting_price"] == 50
+
+
+def test_calibration_rejects_unknown_years(baseline_config, pars_to_vary):
+    observed = pd.DataFrame(
+        {"year": [2023], "energy_source": ["solar_pv"], "share": [0.1]}
+    )
+    with pytest.raises(ValueError):
+        calibrate(baseline_config, pars_to_vary, observed, num_workers=1)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from projects.iam.batch import simulate_batch
+from projects.iam.derivatives import jacobian_to_dataframe, share_jacobian
+
+
+def test_jacobian_matches_finite_differences(baseline_config, pars_to_vary):
+    shares, jacobian = share_jacobian(baseline_config, pars_to_vary)
+    n_params = len(pars_to_vary)
+    assert jacobian.shape == (n_params,) + shares.shape
+
+    # central differences around the baseline values of pars_to_vary
+    x0 = np.array([100, 0.4, 0.9, 0.1, 0.1, -10, -3, 50, 200], dtype=float)
+    h = 1e-6 * np.maximum(np.abs(x0), 1)
+    steps = np.diag(h)
+    upper = simulate_batch(baseline_config, pars_to_vary, x0 + steps)
+    lower = simulate_batch(baseline_config, pars_to_vary, x0 - steps)
+    finite_differences = (upper - lower) / (2 * h[:, np.newaxis, np.newaxis])
+
+    np.testing.assert_allclose(
+        shares, simulate_batch(baseline_config, pars_to_vary, x0[np.newaxis])[0]
+    )
+    np.testing.assert_allclose(jacobian, finite_differences, rtol=1e-5, atol=1e-9)
+    # shares always sum to one, so their derivatives sum to zero
+    np.testing.assert_allclose(jacobian.sum(axis=-1), 0, atol=1e-12)
+
+
+def test_jacobian_at_several_points(baseline_config, pars_to_vary):
+    points = np.array([[p["bounds"][0] for p in pars_to_vary]] * 2)
+    points[1, 0] = 90
+    shares, jacobian = share_jacobian(baseline_config, pars_to_vary, points)
+    assert jacobian.shape == (2, len(pars_to_vary)) + shares.shape[1:]
+
+    single_shares, single_jacobian = share_jacobian(
+        baseline_config, pars_to_vary, points[1]
+    )
+    np.testing.assert_allclose(jacobian[1], single_jacobian)
+
+    df = jacobian_to_dataframe(
+        single_jacobian,
+        pars_to_vary,
+        baseline_config["energy_sources"],
+        list(range(2020, 2055, 5)),
+    )
+    assert len(df) == single_jacobian.size
+    assert df.loc[
+        (df.parameter == "starting_price_solar_pv")
+        & (df.year == 2030)
+        & (df.energy_source == "solar_pv"),
+        "derivative",
+    ].item() == pytest.approx(single_jacobian[0, 2, 2])
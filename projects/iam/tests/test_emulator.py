@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from projects.iam.emulator import ShareEmulator, training_runs, validation_report
+from projects.iam.eslim import IAM
+from utils.io import yaml_to_dict
+
+
+@pytest.fixture
+def pars_to_vary(config_dir):
+    pars = yaml_to_dict(config_dir / "emulator_config.yml")["pars_to_vary"]
+    return [p for p in pars if p["name"].startswith("co2_")]
+
+
+def test_emulator_matches_held_out_runs(baseline_config, pars_to_vary, tmp_path):
+    iam = IAM.create("nestedlogit", baseline_config)
+    train_parameters, train_shares = training_runs(baseline_config, pars_to_vary, 60)
+    test_parameters, test_shares = training_runs(baseline_config, pars_to_vary, 40)
+
+    emulator = ShareEmulator(
+        pars_to_vary, iam.energy_sources, iam.years, n_restarts_optimizer=0
+    ).fit(train_parameters, train_shares)
+    report = validation_report(emulator, test_parameters, test_shares)
+    assert len(report) == len(iam.years) * len(iam.energy_sources)
+    assert report["max_abs_error"].max() < 1e-2
+
+    # persisted emulator gives the same answers
+    emulator.save(tmp_path / "emulator.pkl")
+    mean, std = ShareEmulator.load(tmp_path / "emulator.pkl").predict_share(
+        test_parameters, "fossil_fuels_with_CCS", 2050
+    )
+    assert mean.shape == std.shape == (len(test_parameters),)
+    np.testing.assert_allclose(mean, test_shares[:, -1, 1], atol=1e-2)
+
+
+def test_saltelli_training_runs(baseline_config, pars_to_vary):
+    parameters, shares = training_runs(baseline_config, pars_to_vary, 8, "saltelli")
+    assert parameters.shape == (8 * (len(pars_to_vary) + 2), len(pars_to_vary))
+    assert shares.shape == (len(parameters), 7, 3)
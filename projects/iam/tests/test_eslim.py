@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from projects.iam.eslim import IAM
+from utils.io import yaml_to_dict
+
+# final-step shares for eslim_baseline_config.yml from the original dict/DataFrame implementation
+BASELINE_FINAL_SHARES = {
+    "fossil_fuels": 0.38469055209723996,
+    "fossil_fuels_with_CCS": 0.1785033455288753,
+    "solar_pv": 0.43680610237388473,
+}
+
+
+def test_nestedlogit_matches_reference(baseline_config):
+    iam = IAM.create("nestedlogit", baseline_config)
+    df = iam.simulate(True)
+
+    assert list(df.columns) == list(range(baseline_config["n_steps"] + 1))
+    for source, expected in BASELINE_FINAL_SHARES.items():
+        assert df.loc[source, baseline_config["n_steps"]] == pytest.approx(expected)
+    assert df.sum().to_numpy() == pytest.approx(np.ones(len(df.columns)))
+
+
+def test_dict_views_match_arrays(baseline_config):
+    iam = IAM.create("nestedlogit", baseline_config)
+    iam.simulate()
+
+    assert len(iam.shares) == baseline_config["n_steps"] + 1
+    assert len(iam.share_of_new) == baseline_config["n_steps"]
+    assert iam.usd_per_mwh[3]["solar_pv"] == pytest.approx(100 * 0.9**3 + 0.001 * 125)
+    assert iam.price_of_cdr_usd_per_mwh[2]["fossil_fuels_with_CCS"] == pytest.approx(
+        0.4 * 60 * 0.9**2
+    )
+
+
+def test_pass_through_nest_level_leaves_shares_unchanged(baseline_config):
+    expected = IAM.create("nestedlogit", baseline_config).simulate(True)
+
+    # add a bottom level in which every energy source is alone in its nest
+    baseline_config["nest_levels"] = ["technology", "subsector", "sector"]
+    baseline_config["logit_exponents"]["technology"] = {
+        e: -2.0 for e in baseline_config["energy_sources"]
+    }
+    baseline_config["parameters"]["technology"] = {
+        e: e for e in baseline_config["energy_sources"]
+    }
+    df = IAM.create("nestedlogit", baseline_config).simulate(True)
+
+    np.testing.assert_allclose(df.to_numpy(), expected.to_numpy(), rtol=1e-12)
+
+
+def test_multiple_sectors(config_dir):
+    config = yaml_to_dict(config_dir / "eslim_config_multiple_sectors.yml")
+    df = IAM.create("nestedlogit", config).simulate(True)
+    assert df.sum().to_numpy() == pytest.approx(np.ones(len(df.columns)))
+
+    del config["root_logit_exponent"]
+    with pytest.raises(ValueError):
+        IAM.create("nestedlogit", config)
+
+    # a subsector may not be split across sectors
+    config["root_logit_exponent"] = -3
+    config["parameters"]["sector"]["fossil_fuels_with_CCS"] = "fossil_energy"
+    config["parameters"]["subsector"]["fossil_fuels_with_CCS"] = "renewables"
+    with pytest.raises(ValueError):
+        IAM.create("nestedlogit", config)
+
+
+def test_logit_matches_single_nest(config_dir):
+    config = yaml_to_dict(config_dir / "eslim_config_logit.yml")
+    df = IAM.create("logit", config).simulate(True)
+
+    # one nest holding every energy source is a plain (non-nested) logit
+    config["nest_levels"] = ["subsector"]
+    config["logit_exponents"] = {"subsector": {"all": config["logit_exponent"]}}
+    config["parameters"]["subsector"] = {e: "all" for e in config["energy_sources"]}
+    expected = IAM.create("nestedlogit", config).simulate(True)
+
+    np.testing.assert_allclose(df.to_numpy(), expected.to_numpy(), rtol=1e-12)
+
+    del config["logit_exponent"]
+    with pytest.raises(ValueError):
+        IAM.create("logit", config)
+
+
+def test_vintage_retirement_follows_cohorts(baseline_config):
+    baseline_config["n_steps"] = 40
+    baseline_config["vintage_tracking"] = True
+    iam = IAM.create("nestedlogit", baseline_config)
+    iam.simulate()
+
+    # rebuild retirements from an explicit list of (build step, capacity) cohorts; capacity built
+    # during a step is in service for the following lifespan steps
+    growth = 1 + baseline_config["energy_demand_growth_rate_per_timestep"]
+    for j, source in enumerate(iam.energy_sources):
+        lifespan = round(iam.parameter("lifespan_yr")[j] / iam.timestep_yr)
+        retire_timestep = iam.parameter("retire_timestep")[j]
+        cohorts = []
+        for step in range(iam.n_steps):
+            retired = sum(c for built, c in cohorts if step - built == lifespan)
+            if 0 <= step - retire_timestep < lifespan:
+                retired += iam.parameter("starting_share")[j] / lifespan
+            assert iam.retirement_share[step][source] == pytest.approx(
+                retired / growth**step, abs=1e-15
+            )
+            cohorts.append(
+                (
+                    step,
+                    iam.frac_for_allocation[step]
+                    * iam.share_of_new[step][source]
+                    * growth ** (step + 1),
+                )
+            )
+
+    assert np.sum(iam._shares, axis=1) == pytest.approx(np.ones(iam.n_steps + 1))
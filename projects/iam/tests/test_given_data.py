@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+from SALib.analyze import pawn
+
+from projects.iam.batch import simulate_batch
+from projects.iam.given_data import given_data, given_data_indices, slice_labels
+from projects.iam.samplers import lhs
+from projects.iam.sensitivity import sensitivity
+from utils.io import dict_to_yaml, yaml_to_dict
+
+
+def test_slices_hold_equal_counts():
+    values = np.random.default_rng(0).uniform(size=(1000, 2))
+    labels = slice_labels(values, 8)
+    for p in range(2):
+        assert list(np.bincount(labels[:, p])) == [125] * 8
+        # slices follow parameter values
+        assert np.all(np.diff(labels[np.argsort(values[:, p]), p]) >= 0)
+
+
+def test_first_order_indices_of_linear_model():
+    values = np.random.default_rng(0).uniform(-1, 1, size=(100000, 3))
+    outputs = np.stack([values @ [3, 1, 0], values @ [0, 1, 1]], axis=-1)
+    indices = given_data_indices(values, outputs, num_slices=50)
+    np.testing.assert_allclose(
+        indices["S1"], [[0.9, 0], [0.1, 0.5], [0, 0.5]], atol=0.01
+    )
+    # an output does not depend on a parameter: its distribution is the same in every slice
+    assert indices["PAWN_median"][2, 0] < 0.05 < indices["PAWN_median"][0, 0]
+
+
+def test_pawn_matches_salib(config_dir):
+    pars_to_vary = yaml_to_dict(config_dir / "lhs_config.yml")["pars_to_vary"]
+    values = lhs(2000, [p["bounds"] for p in pars_to_vary]).to_numpy()
+    shares = simulate_batch(
+        str(config_dir / "eslim_baseline_config.yml"), pars_to_vary, values
+    )
+    indices = given_data_indices(values, shares, num_slices=10)
+
+    problem_definition = {
+        "num_vars": len(pars_to_vary),
+        "names": [p["name"] for p in pars_to_vary],
+        "bounds": [p["bounds"] for p in pars_to_vary],
+    }
+    si = pawn.analyze(problem_definition, values, shares[:, -1, 1], S=10)
+    # SALib leaves each parameter's largest sample out of its slices
+    np.testing.assert_allclose(
+        indices["PAWN_median"][:, -1, 1], si["median"], atol=2 / 200
+    )
+    np.testing.assert_allclose(
+        indices["PAWN_max"][:, -1, 1], si["maximum"], atol=2 / 200
+    )
+    assert np.all(indices["S1"][:, 0] == 0)
+
+
+@pytest.mark.parametrize("settings", [{}, {"output_format": "parquet"}])
+def test_given_data_reads_lhs_study(tmp_path, settings, config_dir):
+    config_info = yaml_to_dict(config_dir / "lhs_config.yml")
+    config_info.update(
+        baseline_model_config=str(config_dir / "eslim_baseline_config.yml"),
+        num_samples=200,
+        chunk_size=64,
+        output_dir=str(tmp_path / "study"),
+        **settings,
+    )
+    dict_to_yaml(config_info, tmp_path / "study.yml")
+    for command in [sensitivity, given_data]:
+        result = CliRunner().invoke(command, ["--config", str(tmp_path / "study.yml")])
+        assert result.exit_code == 0, result.output
+
+    indices_df = pd.read_csv(tmp_path / "study" / "given_data_indices.csv")
+    assert len(indices_df) == len(config_info["pars_to_vary"]) * 3 * 7
+    assert list(indices_df.columns) == [
+        "parameter",
+        "energy_source",
+        "year",
+        "S1",
+        "PAWN_median",
+        "PAWN_mean",
+        "PAWN_max",
+    ]
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from projects.iam.price_solver import (
+    SearchOptions,
+    evaluate_price_curves,
+    solve_price_curve,
+)
+
+
+def test_solver_finds_cheapest_price_increase(baseline_config):
+    result = solve_price_curve(
+        baseline_config,
+        "fossil_fuels_with_CCS",
+        0.2,
+        2040,
+        {"total_increase_in_price": [0, 2000]},
+    )
+    assert result["share"] >= 0.2
+
+    # any cheaper curve misses the target
+    increase = result["parameters"]["total_increase_in_price"]
+    shares, costs = evaluate_price_curves(
+        baseline_config,
+        ["total_increase_in_price"],
+        np.array([[increase * (1 - 1e-5)], [increase]]),
+        "fossil_fuels_with_CCS",
+        2040,
+    )
+    assert shares[0] < 0.2 <= shares[1]
+    assert costs[1] == pytest.approx(result["cost"])
+
+
+def test_solver_with_several_free_parameters(baseline_config):
+    result = solve_price_curve(
+        baseline_config,
+        "fossil_fuels",
+        0.3,
+        2050,
+        {"starting_price": [0, 500], "total_increase_in_price": [0, 1000]},
+        below=True,
+        options=SearchOptions(n_candidates=128),
+    )
+    assert result["share"] <= 0.3
+    assert (
+        result["cost"]
+        < evaluate_price_curves(
+            baseline_config,
+            ["starting_price", "total_increase_in_price"],
+            np.array([[500, 1000]]),
+            "fossil_fuels",
+            2050,
+        )[1][0]
+    )
+
+
+def test_solver_rejects_unreachable_target(baseline_config):
+    with pytest.raises(ValueError):
+        solve_price_curve(
+            baseline_config,
+            "fossil_fuels_with_CCS",
+            0.9,
+            2040,
+            {"total_increase_in_price": [0, 2000]},
+        )
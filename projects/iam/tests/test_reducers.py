@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from projects.iam.batch import create_batch
+from projects.iam.eslim import IAM
+from projects.iam.reducers import reducers_from_config
+from utils.io import yaml_to_dict
+
+REDUCER_SPECS = [
+    {"type": "final_share", "source": "fossil_fuels_with_CCS"},
+    {"type": "cumulative_emissions"},
+    {"type": "threshold_year", "source": "solar_pv", "threshold": 0.3},
+    {"type": "threshold_year", "source": "solar_pv", "threshold": 0.99},
+    {"type": "peak_price", "source": "fossil_fuels", "name": "fossil_peak"},
+]
+
+
+def test_reducers_match_full_trajectories(config_dir):
+    config = yaml_to_dict(config_dir / "eslim_baseline_config.yml")
+    metrics = IAM.create("nestedlogit", config).simulate(
+        reducers=reducers_from_config(REDUCER_SPECS)
+    )
+
+    iam = IAM.create("nestedlogit", config)
+    df = iam.simulate(True)
+    growth = 1 + config["energy_demand_growth_rate_per_timestep"]
+    emissions = iam.parameter("co2_per_mwh") * (1 - iam.parameter("capture_fraction"))
+
+    assert metrics["final_share_fossil_fuels_with_CCS"] == pytest.approx(
+        df.loc["fossil_fuels_with_CCS", config["n_steps"]]
+    )
+    assert metrics["cumulative_emissions"] == pytest.approx(
+        sum(
+            iam.timestep_yr * growth**t * np.dot(df[t].to_numpy(), emissions)
+            for t in range(config["n_steps"])
+        )
+    )
+    assert (
+        metrics["year_solar_pv_above_0.3"]
+        == iam.years[int(np.argmax(df.loc["solar_pv"].to_numpy() >= 0.3))]
+    )
+    assert np.isnan(metrics["year_solar_pv_above_0.99"])
+    assert metrics["fossil_peak"] == pytest.approx(
+        max(p["fossil_fuels"] for p in iam.usd_per_mwh.values())
+    )
+
+
+def test_reducers_on_batch(config_dir):
+    config = yaml_to_dict(config_dir / "eslim_baseline_config.yml")
+    pars_to_vary = [{"name": "price", "key_path": ["price_curve", "starting_price"]}]
+    matrix = np.array([[0.0], [50.0]])
+
+    metrics = create_batch("nestedlogit", config, pars_to_vary, matrix).simulate(
+        reducers=reducers_from_config(REDUCER_SPECS)
+    )
+
+    for i, starting_price in enumerate(matrix[:, 0]):
+        config["price_curve"]["starting_price"] = starting_price
+        expected = IAM.create("nestedlogit", config).simulate(
+            reducers=reducers_from_config(REDUCER_SPECS)
+        )
+        for name, value in expected.items():
+            np.testing.assert_allclose(metrics[name][i], value)
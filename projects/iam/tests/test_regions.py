@@ -0,0 +1,107 @@
+import copy
+
+import numpy as np
+import pytest
+
+from projects.iam.eslim import IAM
+from utils.io import yaml_to_dict
+
+
+@pytest.fixture
+def regions_config(config_dir):
+    return yaml_to_dict(config_dir / "eslim_config_multiple_regions.yml")
+
+
+def single_region_config(config: dict, region: str) -> dict:
+    """the multi-region config reduced to one region, with its overrides applied"""
+    overrides = config["regions"][region]
+    single = copy.deepcopy(config)
+    del single["regions"]
+    for name, values in overrides.get("parameters", {}).items():
+        single["parameters"][name].update(values)
+    for key in ["energy_demand_growth_rate_per_timestep", "usd_per_tco2"]:
+        if key in overrides:
+            single[key] = overrides[key]
+    if "price_curve" in overrides:
+        single["price_curve"] = overrides["price_curve"]
+    return single
+
+
+@pytest.mark.parametrize("system_type", ["nestedlogit", "logit"])
+def test_independent_regions_match_single_region_runs(regions_config, system_type):
+    regions_config["shared_learning"] = False
+    regions_config["logit_exponent"] = -5
+    shares = IAM.create(system_type, regions_config).simulate(True)
+    assert shares.shape == (3, 7, 3)
+    for r, region in enumerate(regions_config["regions"]):
+        expected = IAM.create(
+            system_type, single_region_config(regions_config, region)
+        ).simulate(True)
+        np.testing.assert_allclose(
+            shares[r], expected.loc[regions_config["energy_sources"]].T, atol=1e-14
+        )
+
+
+def test_shared_learning_follows_global_deployment(regions_config):
+    iam = IAM.create("nestedlogit", regions_config)
+    iam.simulate()
+
+    generation = np.stack([iam._deployment(step) for step in range(iam.n_steps + 1)])
+    expected_generation = np.einsum(
+        "r,rt,rts->ts",
+        [1.0, 1.5, 0.5],
+        (1 + np.array([0.02, 0.15, 0.25]))[:, np.newaxis] ** np.arange(7),
+        iam._shares,
+    )
+    np.testing.assert_allclose(generation, expected_generation)
+    np.testing.assert_allclose(
+        iam.global_shares(), generation / generation.sum(-1, keepdims=True)
+    )
+
+    # solar prices fall by 10% per doubling of peak global solar deployment, in every region
+    experience = np.maximum.accumulate(generation[:, 2] / generation[0, 2])
+    np.testing.assert_allclose(
+        iam._price_of_energy_generation[..., 2],
+        np.broadcast_to(100 * 0.9 ** np.log2(experience), (3, 7)),
+    )
+    # sources without learning keep their starting price
+    assert np.all(iam._price_of_energy_generation[..., 0] == 60)
+
+
+def test_shared_learning_couples_regions(regions_config):
+    alone = single_region_config(regions_config, "high_income")
+    alone["regions"] = {"high_income": regions_config["regions"]["high_income"]}
+    alone_iam = IAM.create("nestedlogit", alone)
+    alone_iam.simulate()
+    together_iam = IAM.create("nestedlogit", regions_config)
+    together_iam.simulate()
+    # fast-growing regions deploy more solar, so high-income solar gets cheaper than on its own
+    assert (
+        together_iam._price_of_energy_generation[0, -1, 2]
+        < alone_iam._price_of_energy_generation[0, -1, 2]
+    )
+
+
+@pytest.mark.parametrize("regions", [True, False])
+def test_shared_learning_prices_are_restored_from_cache(
+    regions_config, regions, tmp_path
+):
+    config = (
+        regions_config
+        if regions
+        else single_region_config(regions_config, "high_income")
+    )
+    config["shared_learning"] = True
+    config["result_cache"] = {"directory": str(tmp_path / "cache")}
+    computed = IAM.create("nestedlogit", config)
+    computed.simulate()
+    cached = IAM.create("nestedlogit", config)
+    cached.simulate()
+    assert cached.result_cache.hits == 1
+
+    np.testing.assert_array_equal(cached._shares, computed._shares)
+    np.testing.assert_array_equal(cached._experience, computed._experience)
+    np.testing.assert_array_equal(cached._usd_per_mwh, computed._usd_per_mwh)
+    np.testing.assert_array_equal(
+        cached._price_of_energy_generation, computed._price_of_energy_generation
+    )
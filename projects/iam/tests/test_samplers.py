@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+from projects.iam.samplers import Sampler
+from projects.iam.sensitivity import sensitivity
+from utils.io import dict_to_yaml, yaml_to_dict
+
+PROBLEM_DEFINITION = {
+    "num_vars": 3,
+    "names": ["a", "b", "c"],
+    "bounds": [[-1, 1], [-1, 1], [0, 2]],
+}
+
+
+def linear_metric(parameter_samples_df: pd.DataFrame) -> np.ndarray:
+    """metric with first-order indices 0.9, 0.1, 0 for PROBLEM_DEFINITION"""
+    return parameter_samples_df.to_numpy() @ [3, 1, 0]
+
+
+@pytest.mark.parametrize(
+    "sampler_type, num_samples, num_instances",
+    [
+        ("lhs", 100, 100),
+        ("saltelli", 64, 64 * 5),
+        ("sobol", 100, 128),
+        ("morris", 10, 10 * 4),
+        ("efast", 65, 65 * 3),
+    ],
+)
+def test_samples_within_bounds(sampler_type, num_samples, num_instances):
+    sampler = Sampler.create(
+        sampler_type, PROBLEM_DEFINITION, {"calc_second_order": False, "seed": 1}
+    )
+    samples = sampler.sample(num_samples).to_numpy()
+    assert samples.shape == (num_instances, 3)
+    bounds = np.array(PROBLEM_DEFINITION["bounds"])
+    assert np.all((samples >= bounds[:, 0]) & (samples <= bounds[:, 1]))
+
+
+def test_unknown_sampler():
+    with pytest.raises(ValueError, match="Bad sampler"):
+        Sampler.create("grid", PROBLEM_DEFINITION, {})
+
+
+@pytest.mark.parametrize(
+    "sampler_type, results_name, index_name, num_samples, atol",
+    [
+        ("saltelli", "s1_results", "S1", 1024, 0.05),
+        ("sobol", "given_data_results", "S1", 4096, 0.02),
+        ("efast", "efast_results", "S1", 1000, 0.02),
+    ],
+)
+def test_first_order_indices_of_linear_metric(
+    sampler_type, results_name, index_name, num_samples, atol
+):
+    sampler = Sampler.create(
+        sampler_type, PROBLEM_DEFINITION, {"calc_second_order": False, "seed": 1}
+    )
+    parameter_samples_df = sampler.sample(num_samples)
+    results_df = sampler.analyze(
+        parameter_samples_df, linear_metric(parameter_samples_df)
+    )[results_name]
+    assert list(results_df["parameter"]) == PROBLEM_DEFINITION["names"]
+    np.testing.assert_allclose(results_df[index_name], [0.9, 0.1, 0], atol=atol)
+
+
+def test_morris_screens_out_parameter_without_effect():
+    sampler = Sampler.create("morris", PROBLEM_DEFINITION, {"seed": 1})
+    parameter_samples_df = sampler.sample(10)
+    results_df = sampler.analyze(
+        parameter_samples_df, linear_metric(parameter_samples_df)
+    )["morris_results"]
+    # elementary effects of a linear metric are its coefficients (per unit of each parameter's range)
+    np.testing.assert_allclose(results_df["mu_star"], [3 * 2, 1 * 2, 0], atol=1e-12)
+    np.testing.assert_allclose(results_df["sigma"], 0, atol=1e-12)
+
+
+@pytest.mark.parametrize(
+    "sampler_type, results_name",
+    [("morris", "morris_results"), ("efast", "efast_results")],
+)
+def test_sensitivity_with_sampler(tmp_path, sampler_type, results_name, config_dir):
+    config_info = yaml_to_dict(config_dir / "sensitivity_config.yml")
+    config_info.update(
+        baseline_model_config=str(config_dir / "eslim_baseline_config.yml"),
+        sampler=sampler_type,
+        num_samples=10 if sampler_type == "morris" else 65,
+        output_dir=str(tmp_path / "study"),
+    )
+    dict_to_yaml(config_info, tmp_path / "study.yml")
+    result = CliRunner().invoke(sensitivity, ["--config", str(tmp_path / "study.yml")])
+    assert result.exit_code == 0, result.output
+
+    results_df = pd.read_csv(tmp_path / "study" / f"{results_name}.csv")
+    assert list(results_df["parameter"]) == [
+        p["name"] for p in config_info["pars_to_vary"]
+    ]
+    assert not (tmp_path / "study" / "s1_results.csv").exists()
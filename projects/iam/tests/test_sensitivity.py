@@ -0,0 +1,330 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+from projects.iam.merge_shards import merge_shards
+from projects.iam.samplers import SaltelliSampler, lhs
+from projects.iam.sensitivity import run_instances, sensitivity
+from utils.io import dict_to_yaml, yaml_to_dict
+
+
+@pytest.fixture
+def run_sensitivity(tmp_path, config_dir):
+    """runs (or resumes, ...) a small saltelli study in tmp_path with the given command-line options and
+    settings, returning its output directory"""
+
+    def run(name: str, *options: str, **settings) -> Path:
+        config_info = yaml_to_dict(config_dir / "sensitivity_config.yml")
+        config_info.update(
+            baseline_model_config=str(config_dir / "eslim_baseline_config.yml"),
+            num_samples=16,
+            output_dir=str(tmp_path / name),
+        )
+        config_info.update(settings)
+        dict_to_yaml(config_info, tmp_path / f"{name}.yml")
+        result = CliRunner().invoke(
+            sensitivity,
+            ["--config", str(tmp_path / f"{name}.yml"), *options],
+        )
+        assert result.exit_code == 0, result.output
+        return tmp_path / name
+
+    return run
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [{}, {"batch_size": 50}, {"reducers": [{"type": "cumulative_emissions"}]}],
+)
+def test_parallel_run_matches_serial_run(settings, run_sensitivity):
+    serial_dir = run_sensitivity("serial", **settings)
+    parallel_dir = run_sensitivity("parallel", num_workers=2, chunk_size=30, **settings)
+    for csv in ["simulation_parameters.csv", "s1_results.csv"]:
+        pd.testing.assert_frame_equal(
+            pd.read_csv(serial_dir / csv).filter(regex="^(?!.*_conf)"),
+            pd.read_csv(parallel_dir / csv).filter(regex="^(?!.*_conf)"),
+        )
+    outputs = (
+        "simulation_metrics.csv" if "reducers" in settings else "simulation_outputs.csv"
+    )
+    pd.testing.assert_frame_equal(
+        pd.read_csv(serial_dir / outputs), pd.read_csv(parallel_dir / outputs)
+    )
+
+
+@pytest.mark.parametrize("reducers", [None, [{"type": "cumulative_emissions"}]])
+def test_parquet_output_matches_csv_output(reducers, run_sensitivity):
+    settings = {} if reducers is None else {"reducers": reducers}
+    csv_dir = run_sensitivity("csv", **settings)
+    parquet_dir = run_sensitivity(
+        "parquet",
+        output_format="parquet",
+        num_workers=2,
+        chunk_size=30,
+        row_group_size=20,
+        **settings,
+    )
+    parameters_df = pd.read_parquet(parquet_dir / "simulation_parameters.parquet")
+    assert list(parameters_df["iteration"]) == list(range(len(parameters_df)))
+    pd.testing.assert_frame_equal(
+        parameters_df.drop(columns="iteration"),
+        pd.read_csv(csv_dir / "simulation_parameters.csv"),
+    )
+
+    outputs = "simulation_outputs" if reducers is None else "simulation_metrics"
+    # one file per chunk of 30 instances
+    assert len(list((parquet_dir / f"{outputs}.parquet").glob("*.parquet"))) == int(
+        np.ceil(len(parameters_df) / 30)
+    )
+    csv_df = pd.read_csv(csv_dir / f"{outputs}.csv")
+    csv_df.columns = [str(c) for c in csv_df.columns]
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(parquet_dir / f"{outputs}.parquet"), csv_df
+    )
+    pd.testing.assert_frame_equal(
+        pd.read_csv(parquet_dir / "s1_results.csv").filter(regex="^(?!.*_conf)"),
+        pd.read_csv(csv_dir / "s1_results.csv").filter(regex="^(?!.*_conf)"),
+    )
+
+
+def test_resume_runs_only_missing_chunks(run_sensitivity):
+    settings = {"output_format": "parquet", "chunk_size": 30}
+    output_dir = run_sensitivity("study", **settings)
+    dataset_dir = output_dir / "simulation_outputs.parquet"
+    complete_df = pd.read_parquet(dataset_dir)
+    s1_df = pd.read_csv(output_dir / "s1_results.csv")
+
+    # as if interrupted before the second and last chunks finished
+    parts = sorted(dataset_dir.glob("*.parquet"))
+    for part in [parts[1], parts[-1]]:
+        part.unlink()
+    kept_mtimes = {part: part.stat().st_mtime_ns for part in parts[2:-1]}
+
+    run_sensitivity("study", "--resume", **settings)
+    assert sorted(dataset_dir.glob("*.parquet")) == parts
+    assert {part: part.stat().st_mtime_ns for part in kept_mtimes} == kept_mtimes
+    pd.testing.assert_frame_equal(pd.read_parquet(dataset_dir), complete_df)
+    pd.testing.assert_frame_equal(
+        pd.read_csv(output_dir / "s1_results.csv").filter(regex="^(?!.*_conf)"),
+        s1_df.filter(regex="^(?!.*_conf)"),
+    )
+
+
+@pytest.mark.parametrize(
+    "changed",
+    [
+        {"chunk_size": 20},
+        {"output_format": "parquet"},
+        {"reducers": [{"type": "cumulative_emissions"}]},
+    ],
+)
+def test_resume_rejects_changed_run_settings(tmp_path, changed, run_sensitivity):
+    output_dir = run_sensitivity("study", chunk_size=30)
+    config_info = yaml_to_dict(tmp_path / "study.yml")
+    config_info.update(changed)
+    dict_to_yaml(config_info, tmp_path / "study.yml")
+    result = CliRunner().invoke(
+        sensitivity, ["--config", str(tmp_path / "study.yml"), "--resume"]
+    )
+    assert isinstance(result.exception, ValueError)
+    assert list(changed)[0] in str(result.exception)
+    assert not (output_dir / "simulation_metrics.csv").exists()
+
+
+def test_resume_requires_checkpoint(tmp_path, config_dir):
+    config_info = yaml_to_dict(config_dir / "sensitivity_config.yml")
+    config_info.update(output_dir=str(tmp_path / "study"))
+    dict_to_yaml(config_info, tmp_path / "study.yml")
+    result = CliRunner().invoke(
+        sensitivity, ["--config", str(tmp_path / "study.yml"), "--resume"]
+    )
+    assert isinstance(result.exception, FileNotFoundError)
+
+
+def test_merged_shards_match_unsharded_run(tmp_path, run_sensitivity):
+    whole_dir = run_sensitivity("whole", chunk_size=30)
+    sharded_dir = run_sensitivity("sharded", "--sample-only", chunk_size=30)
+    assert not (sharded_dir / "simulation_outputs.csv").exists()
+    for shard in ["2/3", "0/3", "1/3"]:
+        run_sensitivity("sharded", "--shard", shard, chunk_size=30)
+    result = CliRunner().invoke(
+        merge_shards, ["--config", str(tmp_path / "sharded.yml")]
+    )
+    assert result.exit_code == 0, result.output
+
+    assert not (sharded_dir / "shards").exists()
+    pd.testing.assert_frame_equal(
+        pd.read_csv(sharded_dir / "simulation_outputs.csv"),
+        pd.read_csv(whole_dir / "simulation_outputs.csv"),
+    )
+    pd.testing.assert_frame_equal(
+        pd.read_csv(sharded_dir / "s1_results.csv").filter(regex="^(?!.*_conf)"),
+        pd.read_csv(whole_dir / "s1_results.csv").filter(regex="^(?!.*_conf)"),
+    )
+
+
+def test_merge_requires_every_shard(tmp_path, run_sensitivity):
+    output_dir = run_sensitivity("study", "--sample-only")
+    for shard in ["0/3", "2/3"]:
+        run_sensitivity("study", "--shard", shard)
+    result = CliRunner().invoke(merge_shards, ["--config", str(tmp_path / "study.yml")])
+    assert isinstance(result.exception, ValueError)
+    assert "[1]" in str(result.exception)
+
+    # nothing is moved until every shard is complete
+    assert len(list((output_dir / "shards").glob("*.yml"))) == 2
+    assert not (output_dir / "s1_results.csv").exists()
+
+
+def test_merge_rejects_shard_rerun_with_another_chunking(tmp_path, run_sensitivity):
+    run_sensitivity("study", "--sample-only")
+    for shard in ["0/2", "1/2"]:
+        run_sensitivity("study", "--shard", shard, chunk_size=20)
+    # leaves the chunks of 20 next to chunks of 30 that overlap them
+    run_sensitivity("study", "--shard", "1/2", chunk_size=30)
+    result = CliRunner().invoke(merge_shards, ["--config", str(tmp_path / "study.yml")])
+    assert isinstance(result.exception, ValueError)
+    assert "chunks of 30 instances" in str(result.exception)
+
+
+def test_failed_merge_can_be_rerun(tmp_path, monkeypatch, run_sensitivity):
+    output_dir = run_sensitivity("study", "--sample-only", chunk_size=30)
+    for shard in ["0/2", "1/2"]:
+        run_sensitivity("study", "--shard", shard, chunk_size=30)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("analysis failed")
+
+    monkeypatch.setattr(SaltelliSampler, "analyze", fail)
+    result = CliRunner().invoke(merge_shards, ["--config", str(tmp_path / "study.yml")])
+    assert isinstance(result.exception, RuntimeError)
+    assert len(list((output_dir / "shards").glob("*.yml"))) == 2
+
+    monkeypatch.undo()
+    result = CliRunner().invoke(merge_shards, ["--config", str(tmp_path / "study.yml")])
+    assert result.exit_code == 0, result.output
+    assert not (output_dir / "shards").exists()
+    assert pd.read_csv(output_dir / "simulation_outputs.csv")[
+        "iteration"
+    ].unique().tolist() == list(
+        range(len(pd.read_csv(output_dir / "simulation_parameters.csv")))
+    )
+    assert (output_dir / "s1_results.csv").exists()
+
+
+def test_run_writes_telemetry_per_chunk(run_sensitivity):
+    output_dir = run_sensitivity("study", chunk_size=30)
+    records = [
+        json.loads(line)
+        for line in (output_dir / "telemetry.jsonl").read_text().splitlines()
+    ]
+    num_instances = len(pd.read_csv(output_dir / "simulation_parameters.csv"))
+    assert [r["event"] for r in records] == ["start"] + ["chunk"] * int(
+        np.ceil(num_instances / 30)
+    ) + ["finish"]
+    assert records[-1]["instances_done"] == num_instances
+    assert records[-1]["runs_per_s"] > 0
+    assert records[-1]["phase_s"]["simulation"] > 0
+
+
+@pytest.mark.parametrize("num_samples", [16, 32])
+def test_default_chunks_are_capped(num_samples, monkeypatch, run_sensitivity):
+    # chunks, and so checkpoints, land every DEFAULT_CHUNK_SIZE instances however many samples are drawn
+    monkeypatch.setattr("projects.iam.sensitivity.DEFAULT_CHUNK_SIZE", 20)
+    output_dir = run_sensitivity("study", num_samples=num_samples)
+    assert (
+        yaml_to_dict(output_dir / "checkpoint" / "checkpoint.yml")["chunk_size"] == 20
+    )
+    records = [
+        json.loads(line)
+        for line in (output_dir / "telemetry.jsonl").read_text().splitlines()
+    ]
+    num_instances = len(pd.read_csv(output_dir / "simulation_parameters.csv"))
+    assert [r["instances_done"] for r in records if r["event"] == "chunk"] == list(
+        range(20, num_instances, 20)
+    ) + [num_instances]
+
+
+def test_run_instances_leaves_baseline_config_unchanged(config_dir):
+    baseline_config = yaml_to_dict(config_dir / "eslim_baseline_config.yml")
+    pars_to_vary = yaml_to_dict(config_dir / "sensitivity_config.yml")["pars_to_vary"]
+    samples_df = lhs(4, [p["bounds"] for p in pars_to_vary])
+    samples_df.columns = [p["name"] for p in pars_to_vary]
+
+    run_instances(baseline_config, pars_to_vary, samples_df)
+    assert baseline_config == yaml_to_dict(config_dir / "eslim_baseline_config.yml")
+
+
+@pytest.mark.parametrize("batch_size", [None, 2])
+def test_run_instances_rejects_multi_region_models(batch_size, config_dir):
+    baseline_config = yaml_to_dict(config_dir / "eslim_config_multiple_regions.yml")
+    pars_to_vary = yaml_to_dict(config_dir / "sensitivity_config.yml")["pars_to_vary"]
+    samples_df = lhs(4, [p["bounds"] for p in pars_to_vary])
+    samples_df.columns = [p["name"] for p in pars_to_vary]
+
+    with pytest.raises(ValueError, match="regions"):
+        run_instances(baseline_config, pars_to_vary, samples_df, batch_size=batch_size)
+
+
+def test_adaptive_run_extends_design_with_every_earlier_run(run_sensitivity):
+    fixed_dir = run_sensitivity("fixed")
+    adaptive_dir = run_sensitivity(
+        "adaptive",
+        chunk_size=30,
+        adaptive={"tolerance": 0, "max_samples": 64},
+    )
+    convergence_df = pd.read_csv(adaptive_dir / "sobol_convergence.csv")
+    assert list(convergence_df["num_samples"]) == [16, 32, 64]
+    assert not convergence_df["converged"].any()
+
+    # the first round is the fixed design, and later rounds extend it
+    fixed_df = pd.read_csv(fixed_dir / "simulation_parameters.csv")
+    adaptive_df = pd.read_csv(adaptive_dir / "simulation_parameters.csv")
+    assert len(adaptive_df) == 4 * len(fixed_df)
+    pd.testing.assert_frame_equal(adaptive_df.iloc[: len(fixed_df)], fixed_df)
+    outputs_df = pd.read_csv(fixed_dir / "simulation_outputs.csv")
+    pd.testing.assert_frame_equal(
+        pd.read_csv(adaptive_dir / "simulation_outputs.csv").iloc[: len(outputs_df)],
+        outputs_df,
+    )
+
+
+def test_adaptive_run_stops_once_converged(run_sensitivity):
+    fixed_dir = run_sensitivity("fixed")
+    adaptive_dir = run_sensitivity(
+        "adaptive", adaptive={"tolerance": 1e6, "max_samples": 64}
+    )
+    convergence_df = pd.read_csv(adaptive_dir / "sobol_convergence.csv")
+    assert list(convergence_df["num_samples"]) == [16]
+    assert convergence_df["converged"].all()
+    for csv in ["simulation_parameters.csv", "s1_results.csv"]:
+        pd.testing.assert_frame_equal(
+            pd.read_csv(adaptive_dir / csv).filter(regex="^(?!.*_conf)"),
+            pd.read_csv(fixed_dir / csv).filter(regex="^(?!.*_conf)"),
+        )
+
+
+def test_adaptive_run_requires_power_of_two(tmp_path, config_dir):
+    config_info = yaml_to_dict(config_dir / "sensitivity_config.yml")
+    config_info.update(
+        num_samples=24, adaptive={"tolerance": 0.1}, output_dir=str(tmp_path / "study")
+    )
+    dict_to_yaml(config_info, tmp_path / "study.yml")
+    result = CliRunner().invoke(sensitivity, ["--config", str(tmp_path / "study.yml")])
+    assert isinstance(result.exception, ValueError)
+
+
+def test_trajectory_indices_include_metric_indices(run_sensitivity):
+    output_dir = run_sensitivity("study", trajectory_indices=True)
+    trajectory_df = pd.read_csv(output_dir / "sobol_trajectory_indices.csv")
+    metric_df = trajectory_df[
+        (trajectory_df["energy_source"] == "fossil_fuels_with_CCS")
+        & (trajectory_df["year"] == trajectory_df["year"].max())
+    ]
+    s1_df = pd.read_csv(output_dir / "s1_results.csv")
+    np.testing.assert_allclose(metric_df["S1"], s1_df["S1"], atol=1e-12)
+    assert list(metric_df["parameter"]) == list(s1_df["parameter"])
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from SALib.analyze import sobol
+
+from projects.iam.batch import simulate_batch
+from projects.iam.samplers import saltelli_sample
+from projects.iam.sobol_indices import indices_to_dataframes, sobol_indices
+
+
+@pytest.mark.parametrize("calc_second_order", [False, True])
+def test_indices_match_salib_for_every_output(
+    pars_to_vary, calc_second_order, config_dir
+):
+    problem_definition = {
+        "num_vars": len(pars_to_vary),
+        "names": [p["name"] for p in pars_to_vary],
+        "bounds": [p["bounds"] for p in pars_to_vary],
+    }
+    samples = saltelli_sample(32, problem_definition, calc_second_order).to_numpy()
+    shares = simulate_batch(
+        str(config_dir / "eslim_baseline_config.yml"), pars_to_vary, samples
+    )
+
+    indices = sobol_indices(shares, len(pars_to_vary), calc_second_order, seed=3)
+    # starting shares do not vary
+    assert np.all(indices["S1"][:, 0] == 0) and np.all(indices["ST_conf"][:, 0] == 0)
+    for step in range(1, shares.shape[1]):
+        for source in range(shares.shape[2]):
+            si = sobol.analyze(
+                problem_definition,
+                shares[:, step, source],
+                calc_second_order=calc_second_order,
+                seed=3,
+            )
+            for name, values in indices.items():
+                np.testing.assert_allclose(
+                    values[..., step, source], si[name], atol=1e-12
+                )
+
+
+def test_indices_to_dataframes_layout():
+    outputs = np.random.default_rng(0).normal(size=(8 * 10, 2, 4))
+    first_total_df, second_order_df = indices_to_dataframes(
+        sobol_indices(outputs, 3, calc_second_order=True),
+        ["a", "b", "c"],
+        ["coal", "solar"],
+        [2020, 2030, 2040, 2050],
+    )
+    assert len(first_total_df) == 3 * 2 * 4
+    assert list(first_total_df.columns[:3]) == ["parameter", "energy_source", "year"]
+    # one row per pair of parameters
+    assert len(second_order_df) == 3 * 2 * 4
+    assert set(zip(second_order_df["parameter_1"], second_order_df["parameter_2"])) == {
+        ("a", "b"),
+        ("a", "c"),
+        ("b", "c"),
+    }
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from projects.iam.eslim import IAM
+from projects.iam.stochastic import mean_reverting_price_paths, simulate_price_paths
+
+
+def test_paths_without_noise_reproduce_deterministic_run(baseline_config):
+    expected = IAM.create("nestedlogit", baseline_config).simulate(True)
+    baseline_config["stochastic_price"] = {
+        "n_paths": 3,
+        "volatility_usd_per_sqrt_yr": 0,
+    }
+    paths, quantiles_df = simulate_price_paths(baseline_config, quantiles=[0.1, 0.9])
+    np.testing.assert_allclose(
+        paths, np.broadcast_to([50, 75, 100, 125, 150, 175, 200], (3, 7))
+    )
+    for _, quantile_df in quantiles_df.groupby("quantile"):
+        shares = quantile_df.pivot(
+            index="energy_source", columns="year", values="share"
+        )
+        np.testing.assert_allclose(
+            shares.loc[expected.index].to_numpy(), expected.to_numpy(), atol=1e-14
+        )
+
+
+def test_mean_reverting_paths_have_stationary_spread():
+    curve = np.full(41, 100.0)
+    paths = mean_reverting_price_paths(
+        curve,
+        1,
+        20000,
+        mean_reversion_per_yr=0.5,
+        volatility_usd_per_sqrt_yr=10,
+        seed=1,
+    )
+    assert np.all(paths[:, 0] == 100)
+    # stationary standard deviation of an Ornstein-Uhlenbeck process is sigma / sqrt(2 theta)
+    assert paths[:, -1].std() == pytest.approx(10, rel=0.05)
+    assert paths[:, -1].mean() == pytest.approx(100, abs=0.5)
+
+
+def test_jumps_shift_prices(baseline_config):
+    baseline_config["stochastic_price"] = {
+        "n_paths": 2000,
+        "volatility_usd_per_sqrt_yr": 5,
+        "jump_rate_per_yr": 0.1,
+        "jump_mean_usd": -40,
+        "seed": 0,
+    }
+    paths, quantiles_df = simulate_price_paths(baseline_config)
+    assert paths[:, 1:].mean() < np.mean([75, 100, 125, 150, 175, 200]) - 10
+    assert np.all(paths >= 0)
+    ccs_2050 = quantiles_df[
+        (quantiles_df["year"] == 2050)
+        & (quantiles_df["energy_source"] == "fossil_fuels_with_CCS")
+    ]["share"]
+    assert np.all(np.diff(ccs_2050) >= 0)
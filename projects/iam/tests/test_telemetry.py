@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from projects.iam.telemetry import PHASES, PhaseTimer, ProgressReport
+
+
+def test_phase_timer_accumulates_each_phase():
+    timer = PhaseTimer()
+    for _ in range(3):
+        with timer.phase("simulation"):
+            sum(range(10000))
+    with pytest.raises(RuntimeError):
+        with timer.phase("config_build"):
+            raise RuntimeError
+    assert set(timer.seconds) == set(PHASES)
+    assert timer.seconds["simulation"] > 0
+    assert timer.seconds["config_build"] > 0
+    assert timer.seconds["model_construction"] == 0
+
+
+def test_progress_report_writes_json_lines(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    progress = ProgressReport(10, path=path)
+    for first, last in [(0, 4), (4, 10)]:
+        progress.update(
+            {
+                "first_instance": first,
+                "last_instance": last,
+                "chunk_s": 0.5,
+                "phase_s": {"simulation": 0.3, "result_collection": 0.1},
+                "max_rss_mb": 100.0,
+                "pid": 1,
+            }
+        )
+    progress.finish()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["event"] for r in records] == ["start", "chunk", "chunk", "finish"]
+    assert [r["instances_done"] for r in records] == [0, 4, 10, 10]
+    assert records[1]["chunk_runs_per_s"] == pytest.approx(8)
+    assert records[2]["eta_s"] == 0
+    assert records[-1]["phase_s"]["simulation"] == pytest.approx(0.6)
+    assert records[-1]["phase_fraction"]["simulation"] == pytest.approx(0.75)
+    assert records[-1]["peak_rss_mb"] >= 100
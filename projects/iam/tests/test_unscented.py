@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from projects.iam.unscented import monte_carlo_check, sigma_points, unscented_transform
+from utils.io import yaml_to_dict
+
+
+@pytest.fixture
+def pars_to_vary(config_dir):
+    return yaml_to_dict(config_dir / "lhs_config.yml")["pars_to_vary"]
+
+
+def test_sigma_points_match_uniform_moments(pars_to_vary):
+    points, weights = sigma_points(pars_to_vary)
+    bounds = np.array([p["bounds"] for p in pars_to_vary], dtype=float)
+    assert points.shape == (2 * len(bounds) + 1, len(bounds))
+    assert np.all((points >= bounds[:, 0]) & (points <= bounds[:, 1]))
+
+    mean = weights @ points
+    deviations = points - mean
+    variance = (bounds[:, 1] - bounds[:, 0]) ** 2 / 12
+    np.testing.assert_allclose(mean, bounds.mean(axis=1))
+    np.testing.assert_allclose(
+        np.einsum("n,ni,nj->ij", weights, deviations, deviations),
+        np.diag(variance),
+        atol=1e-12,
+    )
+    # fourth moment of a uniform distribution is 1.8 variance**2
+    np.testing.assert_allclose(weights @ deviations**4, 1.8 * variance**2)
+
+
+def test_unscented_moments_near_monte_carlo(baseline_config, pars_to_vary):
+    # a few weakly interacting parameters, for which 2d+1 runs should suffice
+    pars = [p for p in pars_to_vary if p["key_path"][0] == "price_curve"]
+    mean, covariance = unscented_transform(baseline_config, pars)
+    assert mean.shape == (7, 3)
+    assert covariance.shape == (7, 3, 7, 3)
+    np.testing.assert_allclose(mean.sum(axis=-1), 1)
+
+    check_df = monte_carlo_check(baseline_config, pars, num_samples=4000)
+    assert np.max(np.abs(check_df["ut_mean"] - check_df["mc_mean"])) < 2e-3
+    np.testing.assert_allclose(check_df["ut_std"], check_df["mc_std"], atol=3e-3)
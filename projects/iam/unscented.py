@@ -0,0 +1,203 @@
+"""This command-line script propagates parameter uncertainty through ESLiM with the unscented transform
+
+To use:
+
+> python3 [path/to/this/file] --config [path/to/lhs_config.yml]
+
+Each parameter in pars_to_vary is taken as independent and uniform on its bounds. Rather than sampling,
+the model is run at 2d+1 deterministic sigma points (d = number of parameters): the mean, and the mean
+plus and minus sqrt(d + kappa) standard deviations along each parameter. Weighted sums over the sigma
+point runs approximate the mean and covariance of the share trajectories; they are exact for outputs that
+are quadratic in the parameters. kappa defaults to kurtosis - d (Julier & Uhlmann, 1997), which also
+matches the fourth moment of each uniform parameter and keeps every sigma point within its bounds.
+n.b.: see Julier & Uhlmann (2004), https://doi.org/10.1109/JPROC.2003.823141
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import click
+import numpy as np
+import pandas as pd
+
+from projects.iam.batch import simulate_batch
+from projects.iam.eslim import IAM
+from projects.iam.samplers import lhs
+from utils.io import yaml_to_dict
+
+logging.basicConfig(level=logging.INFO)
+
+UNIFORM_KURTOSIS = 1.8
+
+
+def sigma_points(
+    pars_to_vary: List[dict], kappa: Optional[float] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """sigma points and weights for independent parameters, uniform on their bounds
+    Args:
+        pars_to_vary: list of dicts with 'bounds' (as in the sensitivity configs)
+        kappa: spread of the sigma points; defaults to UNIFORM_KURTOSIS - d
+    Returns:
+        points: (2d+1, d) parameter values, the mean first
+        weights: (2d+1,) weights (summing to 1; the first may be negative)
+    """
+    bounds = np.array([p["bounds"] for p in pars_to_vary], dtype=float)
+    n_params = len(bounds)
+    if kappa is None:
+        kappa = UNIFORM_KURTOSIS - n_params
+    mean = bounds.mean(axis=1)
+    std = (bounds[:, 1] - bounds[:, 0]) / np.sqrt(12)
+
+    offsets = np.sqrt(n_params + kappa) * np.diag(std)
+    points = np.concatenate([mean[np.newaxis], mean + offsets, mean - offsets])
+    weights = np.full(2 * n_params + 1, 1 / (2 * (n_params + kappa)))
+    weights[0] = kappa / (n_params + kappa)
+    return points, weights
+
+
+def unscented_transform(
+    config_info: Union[str, dict],
+    pars_to_vary: List[dict],
+    system_type: str = "nestedlogit",
+    kappa: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """approximate mean and covariance of shares from one batched run of the 2d+1 sigma points
+    Args:
+        config_info: baseline model configuration (path to yaml or dict)
+        pars_to_vary: list of dicts with 'key_path' and 'bounds'
+        system_type: name under which the model class is registered with IAM
+        kappa: spread of the sigma points (see sigma_points)
+    Returns:
+        mean: (n_steps+1, n_sources) mean shares
+        covariance: (n_steps+1, n_sources, n_steps+1, n_sources) covariance between shares
+    """
+    points, weights = sigma_points(pars_to_vary, kappa)
+    shares = simulate_batch(config_info, pars_to_vary, points, system_type)
+    mean = np.tensordot(weights, shares, axes=1)
+    deviations = shares - mean
+    covariance = np.einsum("n,nij,nkl->ijkl", weights, deviations, deviations)
+    return mean, covariance
+
+
+def moments_to_dataframe(
+    mean: np.ndarray,
+    covariance: np.ndarray,
+    energy_sources: List[str],
+    years: List[int],
+) -> pd.DataFrame:
+    """reshapes unscented_transform outputs to a long-format dataframe of means and standard deviations
+    Returns:
+        dataframe with columns year, energy_source, mean, std
+    """
+    n_steps, n_sources = mean.shape
+    variance = np.diagonal(covariance.reshape(n_steps * n_sources, -1))
+    index = pd.MultiIndex.from_product(
+        [years, energy_sources], names=["year", "energy_source"]
+    )
+    return pd.DataFrame(
+        {"mean": mean.ravel(), "std": np.sqrt(np.maximum(variance, 0))},
+        index=index,
+    ).reset_index()
+
+
+def monte_carlo_check(
+    config_info: Union[str, dict],
+    pars_to_vary: List[dict],
+    num_samples: int = 1000,
+    system_type: str = "nestedlogit",
+    kappa: Optional[float] = None,
+) -> pd.DataFrame:
+    """compares unscented-transform moments with those of a small Latin hypercube ensemble
+    Args:
+        config_info: baseline model configuration (path to yaml or dict)
+        pars_to_vary: list of dicts with 'key_path' and 'bounds'
+        num_samples: size of the Monte Carlo (LHS) ensemble
+        system_type: name under which the model class is registered with IAM
+        kappa: spread of the sigma points (see sigma_points)
+    Returns:
+        dataframe with columns year, energy_source, ut_mean, mc_mean, ut_std, mc_std, and
+        mean_error_in_se (difference of the means in Monte Carlo standard errors)
+    """
+    iam = IAM.create(system_type, config_info)
+    ut_df = moments_to_dataframe(
+        *unscented_transform(config_info, pars_to_vary, system_type, kappa),
+        iam.energy_sources,
+        iam.years,
+    )
+    samples = lhs(num_samples, [p["bounds"] for p in pars_to_vary]).to_numpy()
+    shares = simulate_batch(config_info, pars_to_vary, samples, system_type)
+
+    mc_mean = shares.mean(axis=0).ravel()
+    mc_std = shares.std(axis=0, ddof=1).ravel()
+    standard_error = mc_std / np.sqrt(num_samples)
+    return pd.DataFrame(
+        {
+            "year": ut_df["year"],
+            "energy_source": ut_df["energy_source"],
+            "ut_mean": ut_df["mean"],
+            "mc_mean": mc_mean,
+            "ut_std": ut_df["std"],
+            "mc_std": mc_std,
+            "mean_error_in_se": np.divide(
+                ut_df["mean"] - mc_mean,
+                standard_error,
+                out=np.zeros_like(mc_mean),
+                where=standard_error > 0,
+            ),
+        }
+    )
+
+
+@click.command()
+@click.option(
+    "--config",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    required=True,
+)
+def unscented(config: str):
+    """Propagates parameter uncertainty through the mini IAM with the unscented transform"""
+
+    # get configuration (same format as for sensitivity.py)
+    config_info = yaml_to_dict(config)
+    output_dir = Path(".")
+    if "output_dir" in config_info:
+        output_dir = Path(config_info["output_dir"])
+    os.makedirs(output_dir, exist_ok=True)
+
+    baseline_config = yaml_to_dict(config_info["baseline_model_config"])
+    system_type = config_info.get("system_type", "nestedlogit")
+    pars_to_vary = config_info["pars_to_vary"]
+
+    logging.info(
+        " Running %s sigma points for %s parameters",
+        2 * len(pars_to_vary) + 1,
+        len(pars_to_vary),
+    )
+    mean, covariance = unscented_transform(baseline_config, pars_to_vary, system_type)
+    iam = IAM.create(system_type, baseline_config)
+    moments_to_dataframe(mean, covariance, iam.energy_sources, iam.years).to_csv(
+        output_dir / Path("unscented_moments.csv"), index=False
+    )
+    np.save(output_dir / Path("unscented_covariance.npy"), covariance)
+
+    # optional diagnostic against a small Monte Carlo ensemble
+    if "monte_carlo_check_samples" in config_info:
+        check_df = monte_carlo_check(
+            baseline_config,
+            pars_to_vary,
+            config_info["monte_carlo_check_samples"],
+            system_type,
+        )
+        logging.info(
+            " Largest differences from Monte Carlo: mean %s (%s standard errors), std %s",
+            np.max(np.abs(check_df["ut_mean"] - check_df["mc_mean"])),
+            np.max(np.abs(check_df["mean_error_in_se"])),
+            np.max(np.abs(check_df["ut_std"] - check_df["mc_std"])),
+        )
+        check_df.to_csv(output_dir / Path("unscented_check.csv"), index=False)
+
+
+if __name__ == "__main__":
+    unscented()